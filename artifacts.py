@@ -0,0 +1,238 @@
+"""
+Artifact Writer
+Content-addressed, atomic output for the CSV and JSON artifacts the analyses and
+the dashboard read.
+
+Each frame is hashed before it is serialized. An artifact whose frame hash, file
+size and modification time match the directory's manifest is skipped without
+serializing; otherwise the new bytes are compared with the file on disk and
+only written when they differ. Writes go to a temporary file in the same
+directory, are flushed to disk and then renamed over the target, so a reader
+never sees a half-written file. Independent artifacts are serialized and
+written on a thread pool.
+
+Every output directory keeps a manifest (.artifacts.json) with each artifact's
+frame hash, content SHA-256, row count and size. A writer created with
+manifest=False keeps none (for directories served as-is); its unchanged
+artifacts are still found by comparing bytes, after serializing.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+MANIFEST_FILE = '.artifacts.json'
+# Threads serializing and writing artifacts; most of a write is waiting on the disk
+MAX_WRITERS = 4
+
+# Read once: os.umask can only be read by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def frame_digest(frame: pd.DataFrame, index: bool = False, kind: str = 'csv') -> str:
+    """
+    SHA-256 of a frame's contents, column names, dtypes and (optionally) index.
+
+    Args:
+        frame: Table to hash
+        index: Include the index (for artifacts written with it)
+        kind: Serialization the artifact uses; part of the hash so a format change rewrites it
+    """
+    digest = hashlib.sha256()
+    header = {
+        'kind': kind,
+        'index': list(map(str, frame.index.names)) if index else None,
+        'columns': list(map(str, frame.columns)),
+        'dtypes': list(map(str, frame.dtypes)),
+    }
+    digest.update(json.dumps(header).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=index).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def write_atomic(path: str, payload: bytes):
+    """
+    Write payload to path through a synced temporary file and an atomic rename.
+
+    The file keeps the target's permissions, or gets the usual 0666 less the umask
+    when it is new (mkstemp alone would leave it readable by its owner only).
+    """
+    directory = os.path.dirname(path) or '.'
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as temp:
+            temp.write(payload)
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_if_changed(path: str, payload: bytes) -> bool:
+    """Write payload atomically unless the file already holds it; returns whether it was written"""
+    if os.path.exists(path) and os.path.getsize(path) == len(payload):
+        with open(path, 'rb') as handle:
+            if handle.read() == payload:
+                return False
+    write_atomic(path, payload)
+    return True
+
+
+def load_manifest(directory: str) -> Dict[str, Dict]:
+    """Artifact entries recorded in a directory's manifest (empty when there is none)"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as handle:
+            return json.load(handle)['artifacts']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """SHA-256 of a file's bytes (None when it does not exist)"""
+    try:
+        with open(path, 'rb') as handle:
+            return hashlib.sha256(handle.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def artifact_hashes(paths: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Content SHA-256 of each artifact as it is on disk now (None when missing).
+
+    Taken from the directory's manifest when the file's size and modification time
+    still match its entry; a file changed or written without the manifest is hashed.
+    """
+    manifests: Dict[str, Dict[str, Dict]] = {}
+    hashes = {}
+    for path in paths:
+        directory = os.path.dirname(path) or '.'
+        if directory not in manifests:
+            manifests[directory] = load_manifest(directory)
+        entry = manifests[directory].get(os.path.basename(path))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            hashes[path] = None
+            continue
+        if entry and stat.st_size == entry['bytes'] and stat.st_mtime_ns == entry['mtime_ns']:
+            hashes[path] = entry['sha256']
+        else:
+            hashes[path] = file_sha256(path)
+    return hashes
+
+
+class ArtifactWriter:
+    """
+    Collects artifacts and writes the changed ones concurrently.
+
+    Args:
+        max_workers: Thread pool size (1 writes in the calling thread)
+        manifest: Read and update each directory's .artifacts.json
+    """
+
+    def __init__(self, max_workers: int = MAX_WRITERS, manifest: bool = True):
+        self.max_workers = max_workers
+        self.manifest = manifest
+        self._pending: Dict[str, Tuple[pd.DataFrame, str, Callable[[pd.DataFrame], bytes], bool]] = {}
+
+    def add(self, path: str, frame: pd.DataFrame, index: bool = False, kind: str = 'csv',
+            serialize: Optional[Callable[[pd.DataFrame], bytes]] = None) -> str:
+        """
+        Queue a frame for writing (a later add to the same path replaces it).
+
+        Args:
+            path: Target file
+            frame: Table to write
+            index: Write (and hash) the index, as to_csv(index=True)
+            kind: Name of the serialization, recorded in the frame hash
+            serialize: Frame -> bytes; CSV via to_csv by default
+
+        Returns:
+            The path, for collecting the written artifacts
+        """
+        if serialize is None:
+            def serialize(table: pd.DataFrame) -> bytes:
+                return table.to_csv(index=index).encode()
+        self._pending[path] = (frame, kind, serialize, index)
+        return path
+
+    @staticmethod
+    def _write_one(path: str, frame: pd.DataFrame, kind: str, serialize: Callable[[pd.DataFrame], bytes],
+                   index: bool, previous: Optional[Dict]) -> Dict:
+        digest = frame_digest(frame, index, kind)
+        if previous and previous.get('digest') == digest and os.path.exists(path):
+            stat = os.stat(path)
+            if stat.st_size == previous['bytes'] and stat.st_mtime_ns == previous['mtime_ns']:
+                return {**previous, 'written': False}
+
+        payload = serialize(frame)
+        written = write_if_changed(path, payload)
+        return {
+            'digest': digest,
+            'sha256': hashlib.sha256(payload).hexdigest(),
+            'rows': len(frame),
+            'bytes': len(payload),
+            'mtime_ns': os.stat(path).st_mtime_ns,
+            'written': written,
+        }
+
+    def write(self) -> Dict[str, Dict]:
+        """
+        Write every queued artifact whose content changed, then update the manifests.
+
+        Returns:
+            Path -> manifest entry (digest, sha256, rows, bytes, mtime_ns) plus
+            'written' (False when the artifact was already up to date)
+        """
+        pending, self._pending = self._pending, {}
+        directories = {os.path.dirname(path) or '.' for path in pending}
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        manifests = {directory: load_manifest(directory) if self.manifest else {} for directory in directories}
+
+        def task(path: str) -> Dict:
+            directory = os.path.dirname(path) or '.'
+            return self._write_one(path, *pending[path], manifests[directory].get(os.path.basename(path)))
+
+        if self.max_workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = dict(zip(pending, pool.map(task, pending)))
+        else:
+            results = {path: task(path) for path in pending}
+
+        if not self.manifest:
+            return results
+        for path, entry in results.items():
+            directory = os.path.dirname(path) or '.'
+            manifests[directory][os.path.basename(path)] = {key: value for key, value in entry.items()
+                                                             if key != 'written'}
+        for directory, artifacts in manifests.items():
+            payload = json.dumps({'artifacts': artifacts}, indent=2, sort_keys=True).encode() + b'\n'
+            write_if_changed(os.path.join(directory, MANIFEST_FILE), payload)
+        return results
+
+
+def write_frames(frames: Dict[str, pd.DataFrame], index: bool = False,
+                 max_workers: int = MAX_WRITERS) -> List[str]:
+    """Write several frames as CSVs (path -> frame) through one ArtifactWriter; returns the paths"""
+    writer = ArtifactWriter(max_workers)
+    for path, frame in frames.items():
+        writer.add(path, frame, index=index)
+    return list(writer.write())
@@ -0,0 +1,313 @@
+"""
+Aggregation Backends
+Pluggable execution engines for the aggregation stages: scope x subcontractor
+sums and distinct contract counts, HHI, LBE shares per scope and the
+competitive-scope filter.
+
+The pandas backend runs the in-memory implementations. The DuckDB backend runs
+the same logic as SQL in an embedded, multithreaded engine that spills to disk
+when a memory limit is reached, and can scan record files (CSV/Parquet, globs
+included) without loading them into pandas first. DuckDB is optional
+(pip install duckdb); the pandas backend needs nothing extra.
+"""
+
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from bid_data import CACHE_DIR, compact_dtypes
+from firm_resolution import FirmResolver, firm_mapping_from_counts
+from lbe_analysis import competitive_scopes, lbe_breakdown, lbe_rates
+from market_concentration import (HIGHLY_CONCENTRATED_ABOVE, UNCONCENTRATED_BELOW, aggregate_scope_subcontractors,
+                                  concentration_tables)
+from scope_consolidation import ScopeMatcher
+
+
+BACKENDS = ['pandas', 'duckdb']
+
+# Where DuckDB spills intermediate results once its memory limit is reached
+DUCKDB_TEMP_DIR = os.path.join(CACHE_DIR, 'duckdb_tmp')
+
+# A frame in memory, or a CSV/Parquet path or glob of record files
+Source = Union[pd.DataFrame, str]
+Keys = Union[str, Sequence[str]]
+
+
+def _as_list(keys: Keys) -> List[str]:
+    return [keys] if isinstance(keys, str) else list(keys)
+
+
+def read_source(source: Source) -> pd.DataFrame:
+    """Load a Source into pandas (Parquet by extension, CSV otherwise)"""
+    if isinstance(source, pd.DataFrame):
+        return source
+    if source.endswith('.parquet'):
+        return compact_dtypes(pd.read_parquet(source))
+    return compact_dtypes(pd.read_csv(source))
+
+
+def _apply_mapping(records: pd.DataFrame, mapping: Optional[pd.DataFrame], column: str,
+                   original_col: str = 'OriginalScope', mapped_col: str = 'ScopeOfWork') -> pd.DataFrame:
+    """Replace column with the mapping's mapped_col for each original_col value"""
+    if mapping is None:
+        return records
+    lookup = pd.Series(mapping[mapped_col].to_numpy(), index=mapping[original_col].to_numpy())
+    original = records[column].astype(object)
+    return records.assign(**{column: original.map(lookup).astype('category')})
+
+
+def _original(column: str) -> str:
+    """Column holding the raw values of a resolved firm name column (see firm_resolution)"""
+    return f"Original{column.replace(' ', '')}"
+
+
+class PandasBackend:
+    """In-memory execution with the repo's pandas implementations"""
+
+    name = 'pandas'
+
+    def distinct(self, source: Source, column: str) -> pd.Series:
+        """Distinct values of a column (missing values included)"""
+        return pd.Series(read_source(source)[column].astype(object).unique(), dtype=object)
+
+    def value_counts(self, source: Source, column: str) -> pd.Series:
+        """Rows per distinct value of a column, as text and in sorted order (missing values excluded)"""
+        return read_source(source)[column].dropna().astype(str).value_counts().sort_index()
+
+    def aggregate_scope_subcontractors(self, source: Source, keys: Keys = 'ScopeOfWork',
+                                       firm_col: str = 'SubcontractorName', amount_col: str = 'SubAmount',
+                                       contract_col: str = 'ContractID',
+                                       scope_mapping: Optional[pd.DataFrame] = None,
+                                       firm_mapping: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        See market_concentration.aggregate_scope_subcontractors; scope_mapping
+        consolidates keys[0] and firm_mapping ('Original' + firm_col -> firm_col)
+        resolves firm names first
+        """
+        records = _apply_mapping(read_source(source), scope_mapping, _as_list(keys)[0])
+        records = _apply_mapping(records, firm_mapping, firm_col, _original(firm_col), firm_col)
+        return aggregate_scope_subcontractors(records, keys, firm_col, amount_col, contract_col)
+
+    def concentration_tables(self, agg: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                             amount_col: str = 'TotalSubAmount') -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """See market_concentration.concentration_tables"""
+        return concentration_tables(agg, keys, amount_col)
+
+    def lbe_breakdown(self, source: Source, by: str = 'Scope of Work', amount_col: str = 'SUB $$ ') -> pd.DataFrame:
+        """lbe_analysis.lbe_breakdown, indexed by group in sorted order"""
+        return lbe_breakdown(read_source(source), by, amount_col).sort_index()
+
+    def competitive_scopes(self, breakdown: pd.DataFrame, min_value: float = 100000) -> pd.DataFrame:
+        """See lbe_analysis.competitive_scopes (ties in value keep scope order)"""
+        competitive = competitive_scopes(breakdown, min_value)
+        return competitive.sort_values('Total_Value', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+class DuckDBBackend:
+    """
+    Embedded DuckDB execution.
+
+    Args:
+        threads: Worker threads (defaults to DuckDB's choice, all cores)
+        memory_limit: e.g. '4GB'; beyond it intermediate results spill to temp_directory
+        temp_directory: Spill directory
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, threads: Optional[int] = None, memory_limit: Optional[str] = None,
+                 temp_directory: str = DUCKDB_TEMP_DIR):
+        try:
+            import duckdb
+        except ImportError as error:
+            raise ImportError("The duckdb backend needs the duckdb package (pip install duckdb)") from error
+        os.makedirs(temp_directory, exist_ok=True)
+        self.con = duckdb.connect()
+        self.con.execute(f"SET temp_directory = '{temp_directory}'")
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = '{memory_limit}'")
+
+    def _relation(self, source: Source, name: str) -> str:
+        """SQL table expression for a Source (frames are registered as views, replacing any of that name)"""
+        if isinstance(source, pd.DataFrame):
+            self.con.register(name, source)
+            return name
+        path = source.replace("'", "''")
+        if source.endswith('.parquet'):
+            return f"read_parquet('{path}')"
+        return f"read_csv_auto('{path}')"
+
+    def _query(self, sql: str) -> pd.DataFrame:
+        return self.con.execute(sql).df()
+
+    def distinct(self, source: Source, column: str) -> pd.Series:
+        """Distinct values of a column (missing values included)"""
+        values = self._query(f"SELECT DISTINCT CAST({_quote(column)} AS VARCHAR) AS v FROM {self._relation(source, 'records')}")
+        return pd.Series(values['v'].to_numpy(dtype=object), dtype=object)
+
+    def value_counts(self, source: Source, column: str) -> pd.Series:
+        """Rows per distinct value of a column, as text and in sorted order (missing values excluded)"""
+        counts = self._query(f"""
+            SELECT CAST({_quote(column)} AS VARCHAR) AS v, COUNT(*) AS n
+            FROM {self._relation(source, 'records')}
+            WHERE v IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """)
+        return pd.Series(counts['n'].to_numpy(dtype=np.int64), index=pd.Index(counts['v'].to_numpy(dtype=object)))
+
+    def aggregate_scope_subcontractors(self, source: Source, keys: Keys = 'ScopeOfWork',
+                                       firm_col: str = 'SubcontractorName', amount_col: str = 'SubAmount',
+                                       contract_col: str = 'ContractID',
+                                       scope_mapping: Optional[pd.DataFrame] = None,
+                                       firm_mapping: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        See market_concentration.aggregate_scope_subcontractors; scope_mapping
+        consolidates keys[0] and firm_mapping ('Original' + firm_col -> firm_col)
+        resolves firm names first
+        """
+        keys = _as_list(keys)
+        relation = self._relation(source, 'records')
+        # Categoricals arrive as ENUMs, which sort by category order; compare as text
+        key_exprs = [f"CAST(r.{_quote(key)} AS VARCHAR)" for key in keys]
+        firm_expr = f"CAST(r.{_quote(firm_col)} AS VARCHAR)"
+        join = ''
+        if scope_mapping is not None:
+            mapping = self._relation(scope_mapping[['OriginalScope', 'ScopeOfWork']].astype(object), 'mapping')
+            join = f"LEFT JOIN {mapping} m ON {key_exprs[0]} IS NOT DISTINCT FROM m.OriginalScope"
+            key_exprs[0] = 'm.ScopeOfWork'
+        if firm_mapping is not None:
+            original = _original(firm_col)
+            firms = self._relation(firm_mapping[[original, firm_col]].astype(object), 'firms')
+            join += f" LEFT JOIN {firms} f ON {firm_expr} = f.{_quote(original)}"
+            firm_expr = f"f.{_quote(firm_col)}"
+        group_exprs = key_exprs + [firm_expr]
+        selected = ', '.join(f"{expr} AS {_quote(name)}" for expr, name in zip(group_exprs, keys + [firm_col]))
+        not_null = ' AND '.join(f"{expr} IS NOT NULL" for expr in group_exprs)
+
+        agg = self._query(f"""
+            SELECT {selected},
+                   COALESCE(fsum(r.{_quote(amount_col)}), 0.0) AS TotalSubAmount,
+                   COUNT(DISTINCT r.{_quote(contract_col)}) AS ContractsCount
+            FROM {relation} r {join}
+            WHERE {not_null}
+            GROUP BY ALL
+            ORDER BY ALL
+        """)
+        return agg.astype({'TotalSubAmount': 'float64', 'ContractsCount': 'int64'})
+
+    def concentration_tables(self, agg: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                             amount_col: str = 'TotalSubAmount') -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """See market_concentration.concentration_tables"""
+        keys = _as_list(keys)
+        relation = self._relation(agg.assign(_row=np.arange(len(agg))), 'agg')
+        partition = ', '.join(_quote(key) for key in keys)
+        amount = _quote(amount_col)
+
+        # Shares are NULL (NaN) in a market with no dollars, whose HHI is 0 as in pandas
+        with_shares = self._query(f"""
+            SELECT * EXCLUDE (_row, _total),
+                   _total AS ScopeTotalSub,
+                   CASE WHEN _total > 0 THEN {amount} / _total END AS ShareOfScope
+            FROM (SELECT *, fsum({amount}) OVER (PARTITION BY {partition}) AS _total FROM {relation})
+            ORDER BY _row
+        """)
+        with_shares = with_shares.astype({col: agg[col].dtype for col in agg.columns})
+
+        shares = self._relation(with_shares, 'shares')
+        order = ', '.join(f"{_quote(key)} NULLS LAST" for key in keys)
+        concentration = self._query(f"""
+            SELECT {partition},
+                   COALESCE(fsum(ShareOfScope * ShareOfScope), 0.0) * 10000 AS ScopeHHI,
+                   COUNT(*) AS NumSubcontractors,
+                   fsum({amount}) AS ScopeTotalSub
+            FROM {shares}
+            GROUP BY {partition}
+            ORDER BY {order}
+        """)
+        concentration['ConcentrationLevel'] = self._query(f"""
+            SELECT CASE WHEN ScopeHHI < {UNCONCENTRATED_BELOW} THEN 'Unconcentrated'
+                        WHEN ScopeHHI <= {HIGHLY_CONCENTRATED_ABOVE} THEN 'Moderately Concentrated'
+                        ELSE 'Highly Concentrated' END AS level
+            FROM {self._relation(concentration, 'concentration')}
+        """)['level'].to_numpy(dtype=object)
+        return with_shares, concentration.astype({'NumSubcontractors': 'int64'})
+
+    def lbe_breakdown(self, source: Source, by: str = 'Scope of Work', amount_col: str = 'SUB $$ ') -> pd.DataFrame:
+        """lbe_analysis.lbe_breakdown, indexed by group in sorted order"""
+        group = f"CAST({_quote(by)} AS VARCHAR)"
+        amount = _quote(amount_col)
+        breakdown = self._query(f"""
+            SELECT {group} AS {_quote(by)},
+                   CAST(SUM(CAST(is_lbe AS INTEGER)) AS BIGINT) AS LBE_Count,
+                   COUNT(*) AS Total_Subs,
+                   COALESCE(fsum({amount}), 0.0) AS Total_Dollars,
+                   COALESCE(fsum(CASE WHEN is_lbe THEN {amount} ELSE 0.0 END), 0.0) AS LBE_Dollars
+            FROM {self._relation(source, 'records')}
+            WHERE {group} IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """).set_index(by)
+        return lbe_rates(breakdown.astype({'LBE_Count': 'int64', 'Total_Subs': 'int64'}))
+
+    def competitive_scopes(self, breakdown: pd.DataFrame, min_value: float = 100000) -> pd.DataFrame:
+        """See lbe_analysis.competitive_scopes (ties in value keep scope order)"""
+        relation = self._relation(breakdown.rename_axis('Scope').reset_index().assign(_row=np.arange(len(breakdown))),
+                                  'breakdown')
+        return self._query(f"""
+            SELECT Scope, Total_Dollars AS Total_Value, LBE_Dollar_Share AS LBE_Share, LBE_Count, NonLBE_Count
+            FROM {relation}
+            WHERE Has_LBE AND Has_NonLBE AND Total_Dollars > {float(min_value)}
+            ORDER BY Total_Value DESC, _row
+        """)
+
+
+def get_backend(name: str = 'pandas', **options):
+    """
+    Create an aggregation backend by name.
+
+    Args:
+        name: 'pandas' or 'duckdb'
+        options: Backend settings (DuckDB: threads, memory_limit, temp_directory)
+    """
+    if name == 'pandas':
+        return PandasBackend()
+    if name == 'duckdb':
+        return DuckDBBackend(**options)
+    raise ValueError(f"Unknown backend '{name}'; expected one of {BACKENDS}")
+
+
+def consolidated_aggregation(backend, source: Source, matcher: ScopeMatcher,
+                             scope_col: str = 'ScopeOfWork', resolver: Optional[FirmResolver] = None,
+                             firm_col: str = 'SubcontractorName') -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Consolidate and aggregate subcontractor records without materializing them.
+
+    Only the distinct scopes are pulled into Python and classified; the backend
+    joins that mapping back onto the records while aggregating, so a DuckDB
+    backend can process record files larger than memory. With a resolver the
+    firm names are resolved the same way, from the rows counted per spelling.
+
+    Args:
+        resolver: Firm name resolver; None aggregates the names as they are
+
+    Returns:
+        Tuple of (scope x subcontractor aggregation with TotalSubAmount and
+        ContractsCount, OriginalScope -> ScopeOfWork mapping)
+    """
+    scopes = backend.distinct(source, scope_col)
+    mapping = pd.DataFrame({'OriginalScope': scopes, 'ScopeOfWork': matcher.classify(scopes).to_numpy(dtype=object)})
+    firms = None
+    if resolver is not None:
+        firms = firm_mapping_from_counts(backend.value_counts(source, firm_col), firm_col, resolver)
+    agg = backend.aggregate_scope_subcontractors(source, scope_col, firm_col=firm_col, scope_mapping=mapping,
+                                                 firm_mapping=firms)
+    return agg, mapping
@@ -0,0 +1,1100 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the bid analysis pipeline.
+Each comparison benchmark checks the optimized path against the original
+implementation before timing it, so a speedup never hides a behaviour change.
+The stage benchmark times every pipeline stage on synthetic Contract Info sheets
+of configurable size; --output/--baseline record and compare runs. The firm
+benchmark measures how many true variant pairs the blocked name resolution
+finds compared with comparing every pair.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from artifacts import ArtifactWriter
+from backends import PandasBackend, consolidated_aggregation, get_backend
+from bid_data import (CACHE_DIR, CURRENCY_COLUMNS, _to_columnar, clean_contract_info, clean_currency, clean_currency_series,
+                      subcontractor_records)
+from consolidate_lbe_data import consolidate_lbe_data
+from contract_facts import contract_facts
+from firm_network import FirmNetwork
+from firm_resolution import FirmResolver, normalize_firm_name
+from lbe_analysis import lbe_breakdown, lbe_subcontracts, lbe_tables
+from market_concentration import (aggregate_scope_subcontractors, bootstrap_concentration, classify_concentration,
+                                  concentration_tables, dominance_sweep, dominant_subcontractors, rank_within_markets)
+from scenarios import ScenarioEngine
+from scope_consolidation import ScopeMatcher, classify_scope, load_rules
+from trends import rolling_concentration
+
+
+# A stage more than this many times slower than the baseline is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def _best_time(func: Callable, repeat: int = 3) -> float:
+    """Return the best wall time in seconds over several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_currency_column(rows: int, seed: int = 0) -> pd.Series:
+    """
+    Build a raw 'SUB $$ '-style column mixing the cell formats seen in bid workbooks.
+
+    Roughly 70% plain numbers, the rest formatted strings ('$1,234', '(5,000)',
+    '12%'), free text ('Not listed.', ranges) and blanks.
+    """
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1_000, 5_000_000, size=rows)
+    kind = rng.random(rows)
+
+    values = pd.Series(amounts, dtype=object)
+    formatted = kind >= 0.70
+    values[formatted] = [f"${a:,}" for a in amounts[formatted]]
+    negative = kind >= 0.85
+    values[negative] = [f"({a:,})" for a in amounts[negative]]
+    percent = kind >= 0.90
+    values[percent] = [f"{a % 100}%" for a in amounts[percent]]
+    text = kind >= 0.95
+    values[text] = np.where(amounts[text] % 2 == 0, 'Not listed.', '$ 130,000,000-150,000,000')
+    values[kind >= 0.98] = np.nan
+    return values
+
+
+def bench_currency(rows: int) -> Dict[str, Dict[str, float]]:
+    """
+    Compare the row-wise and vectorized currency parsers on a synthetic column.
+
+    Timed twice: as the mixed object column read_excel returns, and as the string
+    column served by the columnar cache.
+    """
+    raw = make_currency_column(rows)
+    layouts = {
+        'excel_object': raw,
+        'cached_string': _to_columnar(raw.to_frame('SUB $$ '))['SUB $$ '],
+    }
+
+    results = {}
+    for layout, values in layouts.items():
+        expected = values.apply(clean_currency)
+        actual = clean_currency_series(values)
+        pd.testing.assert_series_equal(actual, expected.astype('float64'), check_names=False)
+
+        rowwise = _best_time(lambda: values.apply(clean_currency))
+        vectorized = _best_time(lambda: clean_currency_series(values))
+        results[layout] = {
+            'rows': rows,
+            'rowwise_rows_per_sec': rows / rowwise,
+            'vectorized_rows_per_sec': rows / vectorized,
+            'speedup': rowwise / vectorized,
+        }
+    return results
+
+
+def make_scope_vocabulary(seed: int = 0) -> np.ndarray:
+    """
+    Build a scope vocabulary with the case and wording variants seen in the workbook.
+
+    Starts from the original scopes recorded in the consolidation mapping and adds
+    lower/upper-case and padded variants of each, plus missing values.
+    """
+    mapping_file = 'consolidated_analysis/scope_consolidation_mapping.csv'
+    if os.path.exists(mapping_file):
+        base = pd.read_csv(mapping_file)['OriginalScope'].dropna().unique().tolist()
+    else:
+        base = ['AC Paving', 'Concrete', 'Traffic Control', 'Trucking', 'Electrical', 'Survey']
+
+    rng = np.random.default_rng(seed)
+    variants = []
+    for scope in base:
+        variants.extend([scope, scope.lower(), scope.upper(), f" {scope} "])
+    vocabulary = np.array(variants + [np.nan], dtype=object)
+    rng.shuffle(vocabulary)
+    return vocabulary
+
+
+def bench_scope_consolidation(rows: int, reference_rows: int = 200_000) -> Dict[str, float]:
+    """
+    Compare row-wise rule evaluation with the compiled ScopeMatcher.
+
+    Parity is checked on every vocabulary entry (the matcher classifies distinct
+    strings, so that covers all rows). The row-wise path is timed on a sample since
+    it is far too slow to run on the full frame.
+    """
+    vocabulary = make_scope_vocabulary()
+    rng = np.random.default_rng(1)
+    scopes = pd.Series(vocabulary[rng.integers(0, len(vocabulary), size=rows)], dtype=object)
+
+    rules, _ = load_rules()
+    vocab_series = pd.Series(vocabulary, dtype=object)
+    expected = vocab_series.apply(classify_scope, rules=rules)
+    actual = ScopeMatcher(rules).classify(vocab_series)
+    pd.testing.assert_series_equal(actual, expected, check_names=False, check_dtype=False)
+
+    sample = scopes.iloc[:reference_rows]
+    rowwise = _best_time(lambda: sample.apply(classify_scope, rules=rules), repeat=1)
+    # A fresh matcher each run so the memo doesn't turn this into a lookup benchmark
+    compiled = _best_time(lambda: ScopeMatcher(rules).classify(scopes), repeat=1)
+    return {
+        'rows': rows,
+        'unique_scopes': len(vocabulary),
+        'rowwise_rows_per_sec': len(sample) / rowwise,
+        'compiled_rows_per_sec': rows / compiled,
+        'speedup': (rows / compiled) / (len(sample) / rowwise),
+    }
+
+
+def make_scope_sub_aggregation(rows: int, n_scopes: int = 2_000, seed: int = 2) -> pd.DataFrame:
+    """
+    Build a synthetic scope x subcontractor aggregation (one row per pair).
+
+    Market sizes are skewed so a few scopes hold many firms, as in the real data.
+    """
+    rng = np.random.default_rng(seed)
+    scope_ids = np.minimum(rng.zipf(1.3, size=rows) - 1, n_scopes - 1)
+    firm_ids = rng.integers(0, max(rows // 4, 1), size=rows)
+    agg = pd.DataFrame({
+        'ScopeOfWork': pd.Series(scope_ids).map(lambda i: f"Scope {i:05d}"),
+        'SubcontractorName': pd.Series(firm_ids).map(lambda i: f"Firm {i:07d}"),
+        'TotalSubAmount': rng.lognormal(12, 1.5, size=rows).round(2),
+    }).drop_duplicates(['ScopeOfWork', 'SubcontractorName'])
+    agg['ContractsCount'] = rng.integers(1, 5, size=len(agg))
+    return agg.sort_values(['ScopeOfWork', 'SubcontractorName']).reset_index(drop=True)
+
+
+def _reference_concentration(agg: pd.DataFrame):
+    """The original merge + groupby().apply(calc_hhi) path from analyze_with_consolidation"""
+    scope_totals = agg.groupby('ScopeOfWork')['TotalSubAmount'].sum().reset_index()
+    scope_totals = scope_totals.rename(columns={'TotalSubAmount': 'ScopeTotalSub'})
+    agg = agg.merge(scope_totals, on='ScopeOfWork')
+    agg['ShareOfScope'] = agg['TotalSubAmount'] / agg['ScopeTotalSub']
+
+    def calc_hhi(group):
+        shares = group['ShareOfScope']
+        return (shares ** 2).sum() * 10000
+
+    hhi = agg.groupby('ScopeOfWork').apply(calc_hhi, include_groups=False).reset_index()
+    hhi.columns = ['ScopeOfWork', 'ScopeHHI']
+    stats = agg.groupby('ScopeOfWork').agg({
+        'SubcontractorName': 'nunique',
+        'TotalSubAmount': 'sum'
+    }).reset_index()
+    stats.columns = ['ScopeOfWork', 'NumSubcontractors', 'ScopeTotalSub']
+    hhi = hhi.merge(stats, on='ScopeOfWork')
+    hhi['ConcentrationLevel'] = hhi['ScopeHHI'].apply(classify_concentration)
+    return agg, hhi
+
+
+def bench_hhi(rows: int) -> Dict[str, float]:
+    """Compare the original HHI path with concentration_tables on a synthetic aggregation"""
+    agg = make_scope_sub_aggregation(rows)
+
+    expected_shares, expected_hhi = _reference_concentration(agg)
+    actual_shares, actual_hhi = concentration_tables(agg, 'ScopeOfWork')
+    pd.testing.assert_frame_equal(actual_shares, expected_shares, check_dtype=False, check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(actual_hhi, expected_hhi, check_dtype=False, check_exact=False, rtol=1e-12)
+
+    reference = _best_time(lambda: _reference_concentration(agg), repeat=1)
+    vectorized = _best_time(lambda: concentration_tables(agg, 'ScopeOfWork'))
+    return {
+        'rows': len(agg),
+        'scopes': len(actual_hhi),
+        'reference_sec': reference,
+        'vectorized_sec': vectorized,
+        'speedup': reference / vectorized,
+    }
+
+
+def make_contract_info(rows: int, lbe_ratio: float = 0.64, sub_ratio: float = 0.85,
+                       seed: int = 3) -> pd.DataFrame:
+    """
+    Build a synthetic raw "Contract Info" sheet, as load_contract_info returns it.
+
+    Contracts average 20 rows. Scopes are drawn from make_scope_vocabulary (case
+    and wording variants included) with a skewed frequency, firm sizes are skewed
+    too, each firm has a fixed LBE status, and currency cells mix the formats
+    seen in bid workbooks. String cells are drawn from small pools, so even very
+    large frames stay within memory.
+
+    Args:
+        rows: Number of rows
+        lbe_ratio: Share of firms that are LBEs
+        sub_ratio: Share of rows listing a subcontractor (the rest are primes)
+        seed: Random seed
+
+    Returns:
+        DataFrame with the workbook columns the analysis reads
+    """
+    rng = np.random.default_rng(seed)
+    n_contracts = max(rows // 20, 1)
+    n_firms = max(rows // 50, 20)
+
+    contract_ids = np.sort(rng.integers(0, n_contracts, size=rows))
+    contract_names = np.array([f"WW-{i:06d}" for i in range(n_contracts)], dtype=object)
+    awards = rng.lognormal(15, 1.2, size=n_contracts).round(0)
+    requirements = rng.choice([0.2, 0.1, 0.08, 0.11, 0.15, 0.14, 0.03, np.nan], size=n_contracts)
+
+    vocabulary = make_scope_vocabulary()
+    scope_ids = np.minimum(rng.zipf(1.5, size=rows) - 1, len(vocabulary) - 1)
+
+    firm_ids = np.minimum(rng.zipf(1.4, size=rows) - 1, n_firms - 1)
+    firm_names = np.array([f"Firm {i:06d} Construction" for i in range(n_firms)], dtype=object)
+    firm_lbe = np.array(['Non-LBE', 'Y', 'Y '], dtype=object)[
+        np.where(rng.random(n_firms) < lbe_ratio, rng.choice([1, 2], size=n_firms, p=[0.99, 0.01]), 0)
+    ]
+
+    is_sub = rng.random(rows) < sub_ratio
+    roles = np.where(is_sub, 'Sub', np.where(rng.random(rows) < 0.8, 'Prime', 'Prime '))
+
+    # Currency cells are drawn from a pool of formatted values
+    pool_size = min(rows, 100_000)
+    sub_pool = make_currency_column(pool_size, seed=seed).to_numpy()
+    sub_amounts = sub_pool[rng.integers(0, pool_size, size=rows)]
+    sub_amounts[~is_sub] = np.nan
+    estimate_pool = make_currency_column(min(n_contracts, 100_000), seed=seed + 1).to_numpy()
+    estimates = estimate_pool[np.arange(n_contracts) % len(estimate_pool)]
+
+    # The first prime row of each contract won it with a bid equal to the award;
+    # the other primes bid up to 40% more
+    is_prime = ~is_sub
+    first_prime = is_prime & ~pd.Series(np.where(is_prime, contract_ids, -1)).duplicated().to_numpy()
+    awarded = np.where(first_prime, 'Y', np.where(is_prime, 'N', None)).astype(object)
+    bids = np.where(first_prime, awards[contract_ids],
+                    (awards[contract_ids] * (1 + rng.random(rows) * 0.4)).round(0))
+    bids[is_sub] = np.nan
+
+    return pd.DataFrame({
+        'Year': np.where(rng.random(rows) < 0.9, 2020, 2021),
+        'Contract': contract_names[contract_ids],
+        'LBE Requirement': requirements[contract_ids],
+        'Contractor Name': firm_names[firm_ids],
+        'Sub/Prime': roles.astype(object),
+        'Scope of Work': vocabulary[scope_ids],
+        'Contract Award Amount (Awarded)': awards[contract_ids],
+        'SUB $$ ': sub_amounts,
+        'Engineers Estimate': estimates[contract_ids],
+        'LBE? ': firm_lbe[firm_ids],
+        'Contract Amount Bid': bids,
+        'Awarded Contract?': awarded,
+    })
+
+
+def bench_stages(rows: int, repeat: int = 1) -> Dict[str, Dict[str, float]]:
+    """
+    Time every pipeline stage on a synthetic Contract Info frame.
+
+    Stages run in pipeline order, each on the previous stage's output; the time
+    reported is the best of `repeat` runs of that stage alone.
+
+    Returns:
+        Mapping of stage name to seconds, input rows and rows per second
+    """
+    raw = make_contract_info(rows)
+    rules, _ = load_rules()
+    results = {}
+
+    def timed(name: str, func: Callable, input_rows: int):
+        start = time.perf_counter()
+        output = func()
+        seconds = time.perf_counter() - start
+        if repeat > 1:
+            seconds = min(seconds, _best_time(func, repeat - 1))
+        results[name] = {'seconds': seconds, 'rows': input_rows, 'rows_per_sec': input_rows / seconds}
+        return output
+
+    timed('currency_cleaning', lambda: {col: clean_currency_series(raw[col]) for col in CURRENCY_COLUMNS}, rows)
+    df = timed('clean', lambda: clean_contract_info(raw.copy()), rows)
+    records = timed('records', lambda: subcontractor_records(df), rows)
+
+    def consolidate():
+        # A fresh matcher each run so the memo doesn't turn this into a lookup benchmark
+        consolidated = records.assign(OriginalScope=records['ScopeOfWork'])
+        consolidated['ScopeOfWork'] = ScopeMatcher(rules).classify(consolidated['OriginalScope']).astype('category')
+        return consolidated
+    consolidated = timed('scope_consolidation', consolidate, len(records))
+
+    agg = timed('scope_sub_aggregation', lambda: aggregate_scope_subcontractors(consolidated, 'ScopeOfWork'),
+                len(consolidated))
+    with_shares, _ = timed('hhi', lambda: concentration_tables(agg, 'ScopeOfWork'), len(agg))
+    timed('dominant', lambda: dominant_subcontractors(with_shares, 'ScopeOfWork'), len(with_shares))
+
+    subs = lbe_subcontracts(df)
+    timed('lbe_per_scope', lambda: lbe_breakdown(subs, 'Scope of Work'), len(subs))
+    timed('lbe_firm', lambda: lbe_breakdown(subs, 'Contractor Name', extra={
+        'Is_LBE': ('is_lbe', 'first'),
+        'Scope_Count': ('Scope of Work', 'nunique')
+    }), len(subs))
+    timed('lbe_tables', lambda: lbe_tables(df), rows)
+    timed('lbe_consolidated', lambda: consolidate_lbe_data(df, ScopeMatcher(rules)), rows)
+    return results
+
+
+def _comparable(frame: pd.DataFrame) -> pd.DataFrame:
+    """Frame with categorical/text columns and index as plain objects, for cross-backend comparison"""
+    frame = frame.copy()
+    for col in frame.columns:
+        if not (pd.api.types.is_numeric_dtype(frame[col]) or pd.api.types.is_bool_dtype(frame[col])):
+            frame[col] = frame[col].astype(object)
+    if not isinstance(frame.index, pd.RangeIndex):
+        frame.index = frame.index.astype(object)
+    return frame
+
+
+def bench_backends(rows: int, backend: str = 'duckdb') -> Dict[str, Dict[str, float]]:
+    """
+    Check an aggregation backend against the pandas backend, then time both.
+
+    Keys, firm names, counts and row order must match exactly; dollar sums, shares
+    and HHI may differ only by floating-point summation order (rtol 1e-12). The
+    file-scan path (records read from Parquet by the engine, firm names resolved)
+    is checked as well.
+
+    Returns:
+        Mapping of operation to pandas/backend seconds and speedup
+    """
+    raw = make_contract_info(rows)
+    df = clean_contract_info(raw)
+    records = subcontractor_records(df)
+    rules, _ = load_rules()
+    matcher = ScopeMatcher(rules)
+    consolidated = records.assign(OriginalScope=records['ScopeOfWork'])
+    consolidated['ScopeOfWork'] = matcher.classify(consolidated['OriginalScope']).astype('category')
+    subs = lbe_subcontracts(df)
+
+    reference, engine = PandasBackend(), get_backend(backend)
+    # The file-scan path also resolves firm names through the backend
+    resolver = FirmResolver()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    records_file = os.path.join(CACHE_DIR, 'benchmark_records.parquet')
+    records.to_parquet(records_file, index=False)
+
+    agg = reference.aggregate_scope_subcontractors(consolidated)
+    breakdown = reference.lbe_breakdown(subs)
+    operations = {
+        'scope_sub_aggregation': lambda impl: impl.aggregate_scope_subcontractors(consolidated),
+        'hhi': lambda impl: impl.concentration_tables(agg),
+        'lbe_per_scope': lambda impl: impl.lbe_breakdown(subs),
+        'competitive_scopes': lambda impl: impl.competitive_scopes(breakdown),
+        'records_file': lambda impl: consolidated_aggregation(impl, records_file, matcher, resolver=resolver),
+    }
+
+    results = {}
+    try:
+        for name, operation in operations.items():
+            expected, actual = operation(reference), operation(engine)
+            for left, right in zip(expected if isinstance(expected, tuple) else [expected],
+                                   actual if isinstance(actual, tuple) else [actual]):
+                if name == 'records_file' and 'OriginalScope' in left:
+                    # Mappings come back in scan order; compare as sets of pairs
+                    left = left.sort_values('OriginalScope', na_position='first').reset_index(drop=True)
+                    right = right.sort_values('OriginalScope', na_position='first').reset_index(drop=True)
+                pd.testing.assert_frame_equal(_comparable(right), _comparable(left), check_dtype=False,
+                                              check_exact=False, rtol=1e-12)
+            pandas_time = _best_time(lambda: operation(reference))
+            engine_time = _best_time(lambda: operation(engine))
+            results[name] = {'pandas_sec': pandas_time, f'{backend}_sec': engine_time,
+                             'speedup': pandas_time / engine_time}
+    finally:
+        os.remove(records_file)
+    return results
+
+
+FIRM_WORDS = ['Bay', 'Pacific', 'Golden', 'Gate', 'Mission', 'Sierra', 'Coast', 'Valley', 'Summit', 'Harbor',
+              'Redwood', 'Marin', 'Delta', 'Sunset', 'Twin', 'Peak', 'Iron', 'Granite', 'Cedar', 'Oak']
+FIRM_TRADES = ['Construction', 'Electric', 'Plumbing', 'Trucking', 'Engineering', 'Paving', 'Concrete',
+               'Painting', 'Steel', 'Traffic Control', 'Excavation', 'Roofing']
+FIRM_SUFFIXES = ['', ' Inc.', ' Inc', ', Inc.', ' LLC', ' Co.', ' Corporation', ' Company']
+
+
+def make_firm_names(n_firms: int, variant_ratio: float = 0.3, seed: int = 4) -> pd.DataFrame:
+    """
+    Build distinct firm names plus spelling variants of some of them.
+
+    Base names combine a surname-like token, one or two place words and a
+    trade. A variant changes case, legal suffix, padding or '&'/'and', or drops
+    one letter (a typo).
+
+    Returns:
+        DataFrame with Name and Firm (the id of the base firm each name spells)
+    """
+    rng = np.random.default_rng(seed)
+    names, firms, seen = [], [], set()
+    while len(seen) < n_firms:
+        stem = ''.join(rng.choice(list('bcdfghjklmnprstvwz'), 1)) + ''.join(rng.choice(list('aeiou'), 1)) + \
+            ''.join(rng.choice(list('bcdfghklmnprstvz'), 2)) + ''.join(rng.choice(list('aeiouy'), 1))
+        words = rng.choice(FIRM_WORDS, size=rng.integers(0, 3), replace=False).tolist()
+        base = ' '.join([stem.capitalize()] + words + [str(rng.choice(FIRM_TRADES))])
+        if base.lower() in seen:
+            continue
+        seen.add(base.lower())
+        names.append(base + str(rng.choice(FIRM_SUFFIXES)))
+        firms.append(len(seen) - 1)
+        if rng.random() < variant_ratio:
+            kind = rng.integers(0, 4)
+            if kind == 0:
+                variant = base.upper() + str(rng.choice(FIRM_SUFFIXES))
+            elif kind == 1:
+                variant = f"The {base}{rng.choice(FIRM_SUFFIXES)}  "
+            elif kind == 2:
+                variant = base.replace(' and ', ' & ') if ' and ' in base else base + ' Co'
+            else:
+                drop = rng.integers(1, len(base) - 1)
+                variant = base[:drop] + base[drop + 1:]
+            names.append(variant)
+            firms.append(len(seen) - 1)
+    return pd.DataFrame({'Name': names, 'Firm': firms})
+
+
+def _cluster_pairs(labels: pd.Series) -> set:
+    """Unordered pairs of positions sharing a label"""
+    pairs = set()
+    for positions in labels.groupby(labels.to_numpy()).indices.values():
+        pairs.update((a, b) for i, a in enumerate(positions) for b in positions[i + 1:])
+    return pairs
+
+
+def bench_firm_resolution(n_firms: int, reference_firms: int = 2_000, new_names: int = 1_000) -> Dict[str, float]:
+    """
+    Time blocked firm-name resolution and compare it with an all-pairs reference.
+
+    The reference joins every pair of a sample at the same similarity
+    threshold without blocking. Recall is the share of true variant pairs each
+    method merges; precision is the share of merged pairs that are true.
+    An incremental run then adds unseen names to the warm resolver.
+    """
+    frame = make_firm_names(n_firms)
+    names = frame['Name']
+
+    resolver = FirmResolver()
+    start = time.perf_counter()
+    resolved = resolver.resolve(names)
+    cold = time.perf_counter() - start
+    comparisons = resolver.comparisons
+
+    extra = make_firm_names(new_names, seed=5)['Name']
+    start = time.perf_counter()
+    resolver.resolve(extra)
+    incremental = time.perf_counter() - start
+
+    sample = frame[frame['Firm'] < reference_firms].reset_index(drop=True)
+    keys = [normalize_firm_name(name) for name in sample['Name']]
+    grams = [frozenset(f"  {key.replace(' ', '')} "[i:i + 3] for i in range(len(key.replace(' ', '')) + 1))
+             for key in keys]
+    parent = list(range(len(sample)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    threshold = resolver.threshold
+    for i in range(len(sample)):
+        for j in range(i + 1, len(sample)):
+            if keys[i] == keys[j] or len(grams[i] & grams[j]) >= threshold * len(grams[i] | grams[j]):
+                parent[find(j)] = find(i)
+    truth = _cluster_pairs(sample['Firm'])
+    all_pairs = _cluster_pairs(pd.Series([find(i) for i in range(len(sample))]))
+    blocked = _cluster_pairs(resolved[frame['Firm'] < reference_firms].reset_index(drop=True).str.lower())
+
+    return {
+        'names': len(names),
+        'firms': n_firms,
+        'cold_sec': cold,
+        'names_per_sec': len(names) / cold,
+        'comparisons': comparisons,
+        'all_pairs_comparisons': len(names) * (len(names) - 1) // 2,
+        'incremental_names': len(extra),
+        'incremental_sec': incremental,
+        'blocked_recall': len(blocked & truth) / max(len(truth), 1),
+        'blocked_precision': len(blocked & truth) / max(len(blocked), 1),
+        'all_pairs_recall': len(all_pairs & truth) / max(len(truth), 1),
+    }
+
+
+def bench_bootstrap(rows: int, n_resamples: int = 2000, workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    Time bootstrap HHI intervals on the consolidated records of a synthetic sheet.
+
+    Runs in-process and on a process pool, and checks both give identical
+    intervals (each scope has its own random stream).
+    """
+    df = clean_contract_info(make_contract_info(rows))
+    records = subcontractor_records(df)
+    rules, _ = load_rules()
+    consolidated = records.assign(ScopeOfWork=ScopeMatcher(rules).classify(records['ScopeOfWork']).astype('category'))
+
+    start = time.perf_counter()
+    serial = bootstrap_concentration(consolidated, n_resamples=n_resamples, max_workers=1)
+    serial_time = time.perf_counter() - start
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    pooled = bootstrap_concentration(consolidated, n_resamples=n_resamples, max_workers=workers)
+    pooled_time = time.perf_counter() - start
+    pd.testing.assert_frame_equal(pooled, serial)
+
+    return {
+        'rows': rows,
+        'records': len(consolidated),
+        'scopes': len(serial),
+        'resamples': n_resamples,
+        'workers': workers,
+        'serial_sec': serial_time,
+        'pool_sec': pooled_time,
+        'speedup': serial_time / pooled_time,
+    }
+
+
+def bench_trends(rows: int, months: int = 120, window: int = 12) -> Dict[str, float]:
+    """
+    Compare the sliding-window trend engine with recomputing every window from scratch.
+
+    Contracts of a synthetic sheet get random bid months; windows are a trailing
+    `window` months stepped monthly. Totals, firm counts and HHI must match the
+    from-scratch concentration_tables result for every window (rtol 1e-9).
+    """
+    df = clean_contract_info(make_contract_info(rows))
+    records = subcontractor_records(df)
+    rng = np.random.default_rng(6)
+    contract_month = pd.Series(rng.integers(0, months, size=len(records['ContractID'].cat.categories)),
+                               index=records['ContractID'].cat.categories)
+    periods = records['ContractID'].astype(object).map(contract_month).astype('Int64')
+
+    def from_scratch():
+        tables = []
+        for end in range(window - 1, months):
+            in_window = ((periods > end - window) & (periods <= end)).to_numpy(dtype=bool)
+            _, hhi = concentration_tables(aggregate_scope_subcontractors(records[in_window]))
+            tables.append(hhi)
+        return tables
+
+    start = time.perf_counter()
+    expected = from_scratch()
+    scratch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    trends = rolling_concentration(records, periods, window)
+    sliding_time = time.perf_counter() - start
+
+    actual = [group for _, group in trends.groupby('WindowEnd', sort=False)]
+    assert len(actual) == len(expected)
+    for hhi, window_rows in zip(expected, actual):
+        assert (window_rows['ScopeOfWork'].astype(str).to_numpy() == hhi['ScopeOfWork'].astype(str).to_numpy()).all()
+        assert (window_rows['NumSubcontractors'].to_numpy() == hhi['NumSubcontractors'].to_numpy()).all()
+        np.testing.assert_allclose(window_rows['TotalSubAmount'], hhi['ScopeTotalSub'], rtol=1e-9)
+        np.testing.assert_allclose(window_rows['ScopeHHI'], hhi['ScopeHHI'], rtol=1e-9)
+
+    return {
+        'rows': rows,
+        'records': len(records),
+        'windows': len(expected),
+        'from_scratch_sec': scratch_time,
+        'sliding_sec': sliding_time,
+        'speedup': scratch_time / sliding_time,
+    }
+
+
+def bench_dominance(rows: int, n_thresholds: int = 20, max_ratio: int = 8) -> Dict[str, float]:
+    """
+    Compare one sort + dominance_sweep with re-running dominant_subcontractors per
+    threshold and a groupby nlargest per CR-k.
+
+    Dominant counts and ranks at every threshold and every CR-k must match (rtol 1e-9).
+    """
+    agg = make_scope_sub_aggregation(rows)
+    with_shares, _ = concentration_tables(agg)
+    thresholds = list(np.round(np.linspace(0.05, 0.95, n_thresholds), 4))
+    ratios = list(range(1, max_ratio + 1))
+
+    def reruns():
+        dominant = {threshold: dominant_subcontractors(with_shares, threshold=threshold) for threshold in thresholds}
+        grouped = with_shares.groupby('ScopeOfWork')['ShareOfScope']
+        ratio_tables = {k: grouped.nlargest(k).groupby(level=0).sum() for k in ratios}
+        return dominant, ratio_tables
+
+    start = time.perf_counter()
+    dominant, ratio_tables = reruns()
+    rerun_time = time.perf_counter() - start
+    start = time.perf_counter()
+    ranked = rank_within_markets(with_shares)
+    sweep = dominance_sweep(ranked, thresholds=thresholds, ratios=ratios).set_index('ScopeOfWork')
+    sweep_time = time.perf_counter() - start
+
+    for threshold, expected in dominant.items():
+        label = f"{threshold * 100:g}".replace('.', '_')
+        counts = expected.groupby('ScopeOfWork').size().reindex(sweep.index, fill_value=0)
+        assert (sweep[f"Dominant_{label}"] == counts).all()
+    for k, expected in ratio_tables.items():
+        np.testing.assert_allclose(sweep[f"CR{k}"], expected.reindex(sweep.index), rtol=1e-9)
+    expected = dominant[thresholds[0]].set_index(['ScopeOfWork', 'SubcontractorName'])['RankInScope']
+    actual = ranked.set_index(['ScopeOfWork', 'SubcontractorName'])['RankInScope'].reindex(expected.index)
+    assert (actual.to_numpy() == expected.to_numpy()).all()
+
+    return {
+        'pairs': len(with_shares),
+        'thresholds': len(thresholds),
+        'ratios': len(ratios),
+        'rerun_sec': rerun_time,
+        'sweep_sec': sweep_time,
+        'speedup': rerun_time / sweep_time,
+    }
+
+
+def bench_scenarios(rows: int, n_scenarios: int = 10_000, reference_scenarios: int = 100) -> Dict[str, float]:
+    """
+    Compare the scenario engine with editing the aggregation and rerunning concentration_tables.
+
+    Scenarios move random fractions of a scope's top firm (or a random firm) to its
+    LBE firms or a new LBE entrant. The first `reference_scenarios` are rerun the
+    edit-and-recompute way and must match (rtol 1e-9); that path's per-scenario
+    time is extrapolated to the full sweep.
+    """
+    agg = make_scope_sub_aggregation(rows)
+    rng = np.random.default_rng(7)
+    firms = agg['SubcontractorName'].unique()
+    firm_lbe = pd.Series(rng.random(len(firms)) < 0.4, index=firms)
+    picks = rng.integers(0, len(agg), size=n_scenarios)
+    scenarios = pd.DataFrame({
+        'ScopeOfWork': agg['ScopeOfWork'].to_numpy()[picks],
+        'Fraction': rng.random(n_scenarios),
+        'Destination': rng.choice(['lbe', 'new_lbe'], size=n_scenarios),
+        'SourceFirm': np.where(rng.random(n_scenarios) < 0.5, agg['SubcontractorName'].to_numpy()[picks], None),
+    })
+
+    start = time.perf_counter()
+    engine = ScenarioEngine(agg, firm_lbe)
+    results = engine.evaluate(scenarios)
+    engine_time = time.perf_counter() - start
+
+    def rerun(scenario) -> Dict[str, float]:
+        scope = agg[agg['ScopeOfWork'] == scenario.ScopeOfWork].copy()
+        is_lbe = scope['SubcontractorName'].map(firm_lbe).to_numpy()
+        amounts = scope['TotalSubAmount'].to_numpy().copy()
+        source = (int(np.flatnonzero(scope['SubcontractorName'].to_numpy() == scenario.SourceFirm)[0])
+                  if isinstance(scenario.SourceFirm, str) else int(amounts.argmax()))
+        moved = scenario.Fraction * amounts[source]
+        receivers = is_lbe.copy()
+        receivers[source] = False
+        amounts[source] -= moved
+        if scenario.Destination == 'lbe' and amounts[receivers].sum() > 0:
+            amounts[receivers] += moved * amounts[receivers] / amounts[receivers].sum()
+        else:
+            amounts = np.append(amounts, moved)
+            is_lbe = np.append(is_lbe, True)
+        edited = pd.DataFrame({'ScopeOfWork': scenario.ScopeOfWork, 'TotalSubAmount': amounts})
+        _, hhi = concentration_tables(edited)
+        return {'ScenarioHHI': hhi['ScopeHHI'].iloc[0], 'ScenarioLBEShare': amounts[is_lbe].sum() / amounts.sum()}
+
+    start = time.perf_counter()
+    expected = pd.DataFrame([rerun(scenario) for scenario in scenarios.head(reference_scenarios).itertuples()])
+    reference_time = (time.perf_counter() - start) / reference_scenarios * n_scenarios
+    for col in ['ScenarioHHI', 'ScenarioLBEShare']:
+        np.testing.assert_allclose(results[col].head(reference_scenarios), expected[col], rtol=1e-9, atol=1e-12)
+
+    return {
+        'pairs': len(agg),
+        'scenarios': n_scenarios,
+        'rerun_sec_estimated': reference_time,
+        'engine_sec': engine_time,
+        'speedup': reference_time / engine_time,
+    }
+
+
+def make_bid_links(pairs: int, n_primes: int = 5_000, n_subs: int = 100_000, seed: int = 8) -> pd.DataFrame:
+    """Synthetic prime -> sub subcontract links (see firm_network.bid_links), skewed toward a few large firms"""
+    rng = np.random.default_rng(seed)
+    primes = np.minimum(rng.zipf(1.5, size=pairs) - 1, n_primes - 1)
+    subs = np.minimum(rng.zipf(1.2, size=pairs) - 1, n_subs - 1)
+    return pd.DataFrame({
+        'ContractID': pd.Series(rng.integers(0, pairs // 5, size=pairs)).map(lambda i: f"C-{i:06d}"),
+        'PrimeName': pd.Series(primes).map(lambda i: f"Prime {i:05d}"),
+        'Awarded': rng.random(pairs) < 0.3,
+        'SubcontractorName': pd.Series(subs).map(lambda i: f"Sub {i:06d}"),
+        'ScopeOfWork': pd.Series(rng.integers(0, 200, size=pairs)).map(lambda i: f"Scope {i:03d}"),
+        'SubAmount': rng.lognormal(11, 1.5, size=pairs).round(2),
+        'is_lbe': (subs % 5) < 2,
+    })
+
+
+def bench_network(pairs: int, queries: int = 1_000) -> Dict[str, float]:
+    """
+    Compare FirmNetwork's sparse queries with the equivalent pandas groupby / filter code.
+
+    Per-prime HHI and LBE share and per-sub exclusivity must match pandas
+    (rtol 1e-9); partner lookups are timed against boolean-mask filtering.
+    """
+    links = make_bid_links(pairs)
+    start = time.perf_counter()
+    network = FirmNetwork(links)
+    build_time = time.perf_counter() - start
+
+    def pandas_tables():
+        pair = links.groupby(['PrimeName', 'SubcontractorName'])['SubAmount'].sum()
+        prime_total = pair.groupby(level=0).sum()
+        hhi = ((pair / pair.groupby(level=0).transform('sum')) ** 2).groupby(level=0).sum() * 10000
+        lbe = links[links['is_lbe']].groupby('PrimeName')['SubAmount'].sum().reindex(prime_total.index, fill_value=0)
+        by_sub = pair.swaplevel().sort_index()
+        exclusivity = by_sub.groupby(level=0).max() / by_sub.groupby(level=0).sum()
+        return hhi, lbe / prime_total, exclusivity
+
+    start = time.perf_counter()
+    hhi, lbe_share, exclusivity = pandas_tables()
+    pandas_table_time = time.perf_counter() - start
+    start = time.perf_counter()
+    primes = network.prime_concentration().set_index('PrimeName')
+    subs = network.sub_exclusivity().set_index('SubcontractorName')
+    sparse_table_time = time.perf_counter() - start
+    np.testing.assert_allclose(primes['PartnerHHI'].reindex(hhi.index), hhi, rtol=1e-9)
+    np.testing.assert_allclose(primes['LBEDollarShare'].reindex(lbe_share.index), lbe_share, rtol=1e-9)
+    np.testing.assert_allclose(subs['ExclusivityRatio'].reindex(exclusivity.index), exclusivity, rtol=1e-9)
+
+    firms = np.random.default_rng(9).choice(network.primes, size=queries)
+    start = time.perf_counter()
+    for firm in firms:
+        links[links['PrimeName'] == firm].groupby('SubcontractorName')['SubAmount'].sum().nlargest(10)
+    pandas_query_time = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    for firm in firms:
+        network.top_partners(firm)
+    sparse_query_time = (time.perf_counter() - start) / queries
+
+    return {
+        'links': pairs,
+        'pairs': network.prime_sub.nnz,
+        'build_sec': build_time,
+        'pandas_tables_sec': pandas_table_time,
+        'sparse_tables_sec': sparse_table_time,
+        'pandas_query_ms': pandas_query_time * 1000,
+        'sparse_query_ms': sparse_query_time * 1000,
+    }
+
+
+def bench_artifacts(rows: int, n_tables: int = 12) -> Dict[str, float]:
+    """
+    Compare plain to_csv exports with ArtifactWriter on a first write, an unchanged
+    rerun and a rerun where one table changed.
+
+    The writer's files must be byte-identical to to_csv's.
+    """
+    tables = {f"table_{i:02d}.csv": make_scope_sub_aggregation(rows // n_tables, seed=10 + i) for i in range(n_tables)}
+    with tempfile.TemporaryDirectory() as plain_dir, tempfile.TemporaryDirectory() as writer_dir:
+        def plain():
+            for name, table in tables.items():
+                table.to_csv(os.path.join(plain_dir, name), index=False)
+
+        def write(max_workers: int) -> Dict[str, Dict]:
+            writer = ArtifactWriter(max_workers)
+            for name, table in tables.items():
+                writer.add(os.path.join(writer_dir, name), table)
+            return writer.write()
+
+        plain_time = _best_time(plain, repeat=1)
+        start = time.perf_counter()
+        write(max_workers=4)
+        first_time = time.perf_counter() - start
+        for name in tables:
+            with open(os.path.join(plain_dir, name), 'rb') as a, open(os.path.join(writer_dir, name), 'rb') as b:
+                assert a.read() == b.read()
+
+        start = time.perf_counter()
+        results = write(max_workers=4)
+        unchanged_time = time.perf_counter() - start
+        assert not any(entry['written'] for entry in results.values())
+
+        tables['table_00.csv'] = tables['table_00.csv'].assign(TotalSubAmount=lambda df: df['TotalSubAmount'] + 1)
+        start = time.perf_counter()
+        results = write(max_workers=4)
+        one_changed_time = time.perf_counter() - start
+        assert sum(entry['written'] for entry in results.values()) == 1
+
+    return {
+        'rows': sum(len(table) for table in tables.values()),
+        'tables': n_tables,
+        'to_csv_sec': plain_time,
+        'first_write_sec': first_time,
+        'unchanged_sec': unchanged_time,
+        'one_changed_sec': one_changed_time,
+    }
+
+
+def bench_contract_facts(rows: int, reference_contracts: int = 100, lookups: int = 200) -> Dict[str, float]:
+    """
+    Compare the contract fact tables with per-contract boolean scans of the bid rows.
+
+    The scan finds a contract's rows, its awarded prime and the subs listed under
+    that prime's bid, as analysis code without a contract-level table does. It is
+    timed on a sample of contracts and extrapolated; the sample's award vs
+    estimate, subcontracted share and LBE attainment must match the fact table.
+    Single-contract lookups are timed on the sorted index against a boolean mask.
+    """
+    df = clean_contract_info(make_contract_info(rows))
+    start = time.perf_counter()
+    contracts, _ = contract_facts(df)
+    facts_time = time.perf_counter() - start
+
+    contract = df['Contract'].astype(object)
+
+    def scan(contract_id: str) -> Dict[str, float]:
+        rows = df[contract == contract_id]
+        bid_number = rows['is_prime'].cumsum()
+        awarded = rows['is_prime'] & rows['Awarded Contract?'].astype(str).str.strip().str.upper().eq('Y')
+        winner = bid_number[awarded].iloc[0]
+        subs = rows[(bid_number == winner) & rows['is_sub'] & (rows['SUB $$ '] > 0) & rows['Contractor Name'].notna()]
+        award = rows['Contract Award Amount (Awarded)'].iloc[0]
+        return {
+            'AwardVsEstimate': award / rows['Engineers Estimate'].iloc[0] - 1,
+            'SubShareOfAward': subs['SUB $$ '].sum() / award,
+            'LBEAttainment': subs.loc[subs['is_lbe'], 'SUB $$ '].sum() / award,
+        }
+
+    # Only contracts that were awarded have a winning bid to scan
+    awarded_ids = contracts.index[contracts['WinningPrime'].notna()]
+    sample = np.random.default_rng(11).choice(awarded_ids, size=min(reference_contracts, len(awarded_ids)),
+                                              replace=False)
+    start = time.perf_counter()
+    reference = pd.DataFrame([scan(contract_id) for contract_id in sample], index=sample)
+    scan_time = (time.perf_counter() - start) / len(sample) * len(contracts)
+    for col in reference.columns:
+        np.testing.assert_allclose(contracts.loc[sample, col].to_numpy(dtype=float), reference[col], rtol=1e-9)
+
+    queries = np.random.default_rng(12).choice(contracts.index, size=lookups)
+    start = time.perf_counter()
+    for contract_id in queries:
+        df.loc[contract == contract_id, 'Contract Award Amount (Awarded)'].iloc[0]
+    mask_lookup = (time.perf_counter() - start) / lookups
+    start = time.perf_counter()
+    for contract_id in queries:
+        contracts.loc[contract_id, 'AwardAmount']
+    index_lookup = (time.perf_counter() - start) / lookups
+
+    return {
+        'rows': rows,
+        'contracts': len(contracts),
+        'scan_sec_estimated': scan_time,
+        'facts_sec': facts_time,
+        'speedup': scan_time / facts_time,
+        'mask_lookup_ms': mask_lookup * 1000,
+        'index_lookup_ms': index_lookup * 1000,
+    }
+
+
+def environment_info() -> Dict[str, str]:
+    """Versions recorded with benchmark results, so runs can be compared across changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def find_regressions(results: Dict, baseline: Dict, ratio: float = REGRESSION_RATIO) -> List[str]:
+    """
+    Stages that got slower than `ratio` times their baseline time at the same scale.
+
+    Both arguments are benchmark result files as written by main().
+    """
+    previous = {scale['rows']: scale['stages'] for scale in baseline.get('stages', [])}
+    regressions = []
+    for scale in results.get('stages', []):
+        for name, stage in scale['stages'].items():
+            before = previous.get(scale['rows'], {}).get(name)
+            if before and stage['seconds'] > before['seconds'] * ratio:
+                regressions.append(f"{name} @ {scale['rows']:,} rows: "
+                                   f"{before['seconds']:.3f}s -> {stage['seconds']:.3f}s "
+                                   f"({stage['seconds'] / before['seconds']:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bench', choices=['all', 'currency', 'scopes', 'hhi', 'stages', 'backends', 'firms', 'bootstrap', 'trends', 'scenarios', 'network', 'dominance', 'artifacts', 'contracts'], default='all',
+                        help='Benchmark to run')
+    parser.add_argument('--rows', type=int, default=500_000, help='Rows in the synthetic currency column')
+    parser.add_argument('--scope-rows', type=int, default=10_000_000, help='Rows in the synthetic scope frame')
+    parser.add_argument('--hhi-rows', type=int, default=1_000_000, help='Scope x subcontractor pairs for the HHI benchmark')
+    parser.add_argument('--scales', default='10000,100000,1000000',
+                        help='Comma-separated Contract Info sizes for the per-stage benchmark')
+    parser.add_argument('--backend-rows', type=int, default=1_000_000,
+                        help='Contract Info rows for the backend parity benchmark')
+    parser.add_argument('--backend', default='duckdb', help='Backend compared against pandas')
+    parser.add_argument('--firms', type=int, default=20_000, help='Distinct firms for the name resolution benchmark')
+    parser.add_argument('--bootstrap-rows', type=int, default=1_000_000,
+                        help='Contract Info rows for the bootstrap HHI benchmark')
+    parser.add_argument('--trend-rows', type=int, default=1_000_000,
+                        help='Contract Info rows for the rolling trend and contract fact benchmarks')
+    parser.add_argument('--scenarios', type=int, default=10_000, help='Scenarios in the counterfactual sweep benchmark')
+    parser.add_argument('--links', type=int, default=1_000_000, help='Subcontract links for the network benchmark')
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size for the bootstrap benchmark')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per stage (best time is kept)')
+    parser.add_argument('--output', default=None, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', default=None,
+                        help='Earlier --output file; stages more than %.1fx slower are reported' % REGRESSION_RATIO)
+    args = parser.parse_args()
+
+    results: Dict = {'environment': environment_info()}
+
+    if args.bench in ('all', 'currency'):
+        print("=== CURRENCY CLEANING BENCHMARK ===\n")
+        print(f"Rows: {args.rows:,} (parity with clean_currency verified)")
+        results['currency'] = bench_currency(args.rows)
+        for layout, result in results['currency'].items():
+            print(f"\n{layout}:")
+            print(f"  Row-wise apply:  {result['rowwise_rows_per_sec']:>14,.0f} rows/sec")
+            print(f"  Vectorized:      {result['vectorized_rows_per_sec']:>14,.0f} rows/sec")
+            print(f"  Speedup:         {result['speedup']:>14.1f}x")
+
+    if args.bench in ('all', 'scopes'):
+        print("\n=== SCOPE CONSOLIDATION BENCHMARK ===\n")
+        result = results['scopes'] = bench_scope_consolidation(args.scope_rows)
+        print(f"Rows: {result['rows']:,} over {result['unique_scopes']} distinct scopes "
+              f"(parity with classify_scope verified)")
+        print(f"  Row-wise rules:  {result['rowwise_rows_per_sec']:>14,.0f} rows/sec")
+        print(f"  Compiled:        {result['compiled_rows_per_sec']:>14,.0f} rows/sec")
+        print(f"  Speedup:         {result['speedup']:>14.1f}x")
+
+
+    if args.bench in ('all', 'hhi'):
+        print("\n=== MARKET CONCENTRATION (HHI) BENCHMARK ===\n")
+        result = results['hhi'] = bench_hhi(args.hhi_rows)
+        print(f"Pairs: {result['rows']:,} across {result['scopes']:,} scopes "
+              f"(parity with the merge + apply path verified)")
+        print(f"  groupby().apply: {result['reference_sec']:>14.3f} s")
+        print(f"  Vectorized:      {result['vectorized_sec']:>14.3f} s")
+        print(f"  Speedup:         {result['speedup']:>14.1f}x")
+
+    if args.bench in ('all', 'stages'):
+        print("\n=== PIPELINE STAGE BENCHMARK ===")
+        results['stages'] = []
+        for rows in [int(scale) for scale in args.scales.split(',')]:
+            stages = bench_stages(rows, args.repeat)
+            results['stages'].append({'rows': rows, 'stages': stages})
+            print(f"\nContract Info rows: {rows:,}")
+            for name, stage in stages.items():
+                print(f"  {name:<22} {stage['seconds']:>9.3f} s  {stage['rows_per_sec']:>14,.0f} rows/sec")
+
+    if args.bench in ('all', 'backends'):
+        print(f"\n=== AGGREGATION BACKEND BENCHMARK ({args.backend} vs pandas) ===\n")
+        try:
+            results['backends'] = bench_backends(args.backend_rows, args.backend)
+        except ImportError as error:
+            print(f"  Skipped: {error}")
+        else:
+            print(f"Contract Info rows: {args.backend_rows:,} (parity with the pandas backend verified)")
+            for name, result in results['backends'].items():
+                print(f"  {name:<22} pandas {result['pandas_sec']:>8.3f} s  {args.backend} "
+                      f"{result[args.backend + '_sec']:>8.3f} s  ({result['speedup']:.1f}x)")
+
+    if args.bench in ('all', 'firms'):
+        print("\n=== FIRM NAME RESOLUTION BENCHMARK ===\n")
+        result = results['firms'] = bench_firm_resolution(args.firms)
+        print(f"Names: {result['names']:,} spelling {result['firms']:,} firms")
+        print(f"  Cold resolution: {result['cold_sec']:>10.3f} s  ({result['names_per_sec']:,.0f} names/sec)")
+        print(f"  Comparisons:     {result['comparisons']:>10,} (all pairs: {result['all_pairs_comparisons']:,})")
+        print(f"  Incremental:     {result['incremental_sec']:>10.3f} s  for {result['incremental_names']:,} new names")
+        print(f"  Variant pairs found: blocked {result['blocked_recall']:.1%} "
+              f"(precision {result['blocked_precision']:.1%}), all pairs {result['all_pairs_recall']:.1%}")
+
+    if args.bench in ('all', 'bootstrap'):
+        print("\n=== BOOTSTRAP HHI BENCHMARK ===\n")
+        result = results['bootstrap'] = bench_bootstrap(args.bootstrap_rows, workers=args.workers)
+        print(f"Contract Info rows: {result['rows']:,} ({result['records']:,} subcontracts, {result['scopes']} scopes, "
+              f"{result['resamples']:,} resamples; pool and in-process results identical)")
+        print(f"  In-process:      {result['serial_sec']:>10.3f} s")
+        print(f"  Process pool:    {result['pool_sec']:>10.3f} s  ({result['workers']} workers, {result['speedup']:.1f}x)")
+
+    if args.bench in ('all', 'trends'):
+        print("\n=== ROLLING TREND BENCHMARK ===\n")
+        result = results['trends'] = bench_trends(args.trend_rows)
+        print(f"Contract Info rows: {result['rows']:,} ({result['records']:,} subcontracts, "
+              f"{result['windows']} trailing 12-month windows; parity with per-window recomputation verified)")
+        print(f"  From scratch:    {result['from_scratch_sec']:>10.3f} s")
+        print(f"  Sliding window:  {result['sliding_sec']:>10.3f} s")
+        print(f"  Speedup:         {result['speedup']:>10.1f}x")
+
+    if args.bench in ('all', 'scenarios'):
+        print("\n=== SCENARIO SWEEP BENCHMARK ===\n")
+        result = results['scenarios'] = bench_scenarios(args.hhi_rows, args.scenarios)
+        print(f"Scope x subcontractor pairs: {result['pairs']:,}, {result['scenarios']:,} scenarios "
+              f"(parity with edit-and-rerun verified on a sample)")
+        print(f"  Edit and rerun:  {result['rerun_sec_estimated']:>10.3f} s (extrapolated)")
+        print(f"  Scenario engine: {result['engine_sec']:>10.3f} s")
+        print(f"  Speedup:         {result['speedup']:>10.1f}x")
+
+    if args.bench in ('all', 'dominance'):
+        print("\n=== DOMINANCE SWEEP BENCHMARK ===\n")
+        result = results['dominance'] = bench_dominance(args.hhi_rows)
+        print(f"Scope x subcontractor pairs: {result['pairs']:,}, {result['thresholds']} thresholds, "
+              f"CR1-CR{result['ratios']} (parity with per-threshold reruns verified)")
+        print(f"  Per-threshold reruns: {result['rerun_sec']:>8.3f} s")
+        print(f"  One sort + sweep:     {result['sweep_sec']:>8.3f} s")
+        print(f"  Speedup:              {result['speedup']:>8.1f}x")
+
+    if args.bench in ('all', 'network'):
+        print("\n=== PRIME-SUB NETWORK BENCHMARK ===\n")
+        result = results['network'] = bench_network(args.links)
+        print(f"Subcontract links: {result['links']:,} ({result['pairs']:,} prime-sub pairs; "
+              f"parity with pandas verified)")
+        print(f"  Build sparse graph:   {result['build_sec']:>8.3f} s")
+        print(f"  Prime/sub tables:     {result['pandas_tables_sec']:>8.3f} s pandas, "
+              f"{result['sparse_tables_sec']:.3f} s sparse")
+        print(f"  Top partners query:   {result['pandas_query_ms']:>8.2f} ms pandas, "
+              f"{result['sparse_query_ms']:.2f} ms sparse")
+
+    if args.bench in ('all', 'artifacts'):
+        print("\n=== ARTIFACT WRITER BENCHMARK ===\n")
+        result = results['artifacts'] = bench_artifacts(args.hhi_rows)
+        print(f"{result['tables']} tables, {result['rows']:,} rows (byte-identical to to_csv)")
+        print(f"  Plain to_csv:         {result['to_csv_sec']:>8.3f} s")
+        print(f"  Writer, first write:  {result['first_write_sec']:>8.3f} s")
+        print(f"  Writer, unchanged:    {result['unchanged_sec']:>8.3f} s")
+        print(f"  Writer, one changed:  {result['one_changed_sec']:>8.3f} s")
+
+    if args.bench in ('all', 'contracts'):
+        print("\n=== CONTRACT FACT TABLE BENCHMARK ===\n")
+        result = results['contracts'] = bench_contract_facts(args.trend_rows)
+        print(f"Contract Info rows: {result['rows']:,} ({result['contracts']:,} contracts; "
+              f"parity with per-contract scans verified on a sample)")
+        print(f"  Per-contract scans:   {result['scan_sec_estimated']:>8.3f} s (extrapolated)")
+        print(f"  Fact tables:          {result['facts_sec']:>8.3f} s")
+        print(f"  Speedup:              {result['speedup']:>8.1f}x")
+        print(f"  Contract lookup:      {result['mask_lookup_ms']:>8.3f} ms boolean mask, "
+              f"{result['index_lookup_ms']:.3f} ms sorted index")
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = find_regressions(results, json.load(handle))
+        print(f"\nRegressions against {args.baseline}: {len(regressions) or 'none'}")
+        for line in regressions:
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Bid Data Ingestion
+Converts the "Contract Info" sheet of a bid workbook into a typed columnar cache
+so that repeated runs skip the (slow) openpyxl parse.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+CONTRACT_INFO_SHEET = 'Contract Info'
+CACHE_DIR = '.bid_cache'
+
+# Bump when the on-disk layout of the cache changes so stale entries are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+CURRENCY_COLUMNS = ['Contract Award Amount (Awarded)', 'SUB $$ ', 'Engineers Estimate']
+
+# Low-cardinality text columns stored as categoricals once loaded (see compact_dtypes)
+CATEGORY_COLUMNS = [
+    'Contract', 'Title', 'Contractor Name', 'Sub/Prime', 'Scope of Work', 'Awarded Contract?',
+    'LBE? ', 'Micro/Small', ' M/W/OBE', 'Ethnicity', 'LBE Discount Available?', 'Amount Applied',
+    'ContractID', 'ScopeOfWork', 'OriginalScope', 'SubcontractorName', 'SourceFile', 'OriginalContractorName',
+]
+# Whole-number columns downcast to the smallest integer type that holds them
+INTEGER_COLUMNS = ['Year', 'Total # of bidders', 'SourceYear', 'ContractsCount']
+
+# Cells clean_currency converts with float() directly rather than as text
+_NUMBER_TYPES = [int, float, bool, np.float64]
+# Cleaned strings that can be cast in bulk (anything else goes through float())
+_PLAIN_NUMBER = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+
+
+def _file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(file_path: str, sheet_name: str, cache_dir: str):
+    """Return the (data, metadata) paths of the cache entry for a workbook sheet"""
+    source = os.path.abspath(file_path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    sheet_slug = re.sub(r'[^0-9A-Za-z]+', '_', sheet_name).strip('_').lower()
+    # Different workbooks may share a file name, so key on the full path too
+    path_key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]
+    base = os.path.join(cache_dir, f"{stem}-{sheet_slug}-{path_key}")
+    return f"{base}.parquet", f"{base}.json"
+
+
+def _to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give every column a single physical type so the frame can be stored column-wise.
+
+    Excel columns such as 'SUB $$ ' mix numbers with free text ('Not listed.',
+    '$ 130,000,000-150,000,000'). Purely numeric object columns become numeric;
+    mixed columns are stored as strings, which the currency cleaning parses the
+    same way as the original cells.
+    """
+    typed = df.copy()
+    for col in typed.columns:
+        if typed[col].dtype != object:
+            continue
+        values = typed[col]
+        non_null = values.dropna()
+        is_number = non_null.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+        if is_number.all():
+            typed[col] = pd.to_numeric(values)
+        else:
+            typed[col] = values.map(lambda v: v if pd.isna(v) else str(v)).astype('string')
+    return typed
+
+
+def load_contract_info(file_path: str, sheet_name: str = CONTRACT_INFO_SHEET,
+                       cache_dir: str = CACHE_DIR, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a workbook sheet, converting it once into a Parquet cache.
+
+    The cache entry is keyed on the workbook's modification time and size for a
+    cheap hit check, falling back to a SHA-256 content hash when the mtime changed
+    (e.g. after a checkout or copy) so identical contents are never re-parsed.
+
+    Args:
+        file_path: Path to the bid workbook
+        sheet_name: Sheet to load
+        cache_dir: Directory holding the cached sheets
+        use_cache: Set False to always parse the workbook
+
+    Returns:
+        DataFrame with the sheet contents
+    """
+    if not use_cache:
+        return pd.read_excel(file_path, sheet_name=sheet_name)
+
+    data_path, meta_path = _cache_paths(file_path, sheet_name, cache_dir)
+    stat = os.stat(file_path)
+
+    meta = None
+    if os.path.exists(meta_path) and os.path.exists(data_path):
+        with open(meta_path) as handle:
+            meta = json.load(handle)
+        if meta.get('format_version') != CACHE_FORMAT_VERSION:
+            meta = None
+
+    if meta is not None:
+        if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return pd.read_parquet(data_path)
+
+        content_hash = _file_digest(file_path)
+        if meta['sha256'] == content_hash:
+            # Same contents under a new mtime: refresh the key, keep the data
+            meta.update({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size})
+            with open(meta_path, 'w') as handle:
+                json.dump(meta, handle, indent=2)
+            return pd.read_parquet(data_path)
+    else:
+        content_hash = _file_digest(file_path)
+
+    print(f"Parsing {file_path} [{sheet_name}] (no valid cache entry)...")
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+
+    try:
+        typed = _to_columnar(df)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{data_path}.tmp"
+        typed.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, data_path)
+    except ImportError as e:
+        # Parquet needs pyarrow (or fastparquet); run uncached without it
+        print(f"  Columnar cache disabled: {e}")
+        return df
+
+    with open(meta_path, 'w') as handle:
+        json.dump({
+            'format_version': CACHE_FORMAT_VERSION,
+            'source': os.path.abspath(file_path),
+            'sheet_name': sheet_name,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': content_hash,
+            'rows': len(typed),
+        }, handle, indent=2)
+
+    return typed
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a bid record frame in place: text columns in CATEGORY_COLUMNS become
+    categoricals and INTEGER_COLUMNS are downcast.
+
+    Dollar amounts stay float64: float32 cannot represent contract-sized amounts
+    to the cent. The is_* flags are already one-byte NumPy booleans.
+
+    Returns:
+        The same DataFrame, for chaining
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in INTEGER_COLUMNS:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().all():
+            values = df[col].to_numpy()
+            if np.array_equal(values, np.round(values)):
+                df[col] = pd.to_numeric(df[col].astype('int64'), downcast='integer')
+    return df
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bytes used per column by two versions of a frame (e.g. before/after compact_dtypes).
+
+    Returns:
+        DataFrame indexed by column with BeforeBytes, AfterBytes, BeforeDtype,
+        AfterDtype and Reduction (before / after), plus a TOTAL row
+    """
+    report = pd.DataFrame({
+        'BeforeBytes': before.memory_usage(index=False, deep=True),
+        'AfterBytes': after.memory_usage(index=False, deep=True),
+    }).fillna(0).astype('int64')
+    report.loc['TOTAL'] = report.sum()
+    report['BeforeDtype'] = before.dtypes.astype(str)
+    report['AfterDtype'] = after.dtypes.astype(str)
+    report['Reduction'] = (report['BeforeBytes'] / report['AfterBytes']).round(1)
+    return report
+
+
+def clean_contract_info(df: pd.DataFrame, compact: bool = True) -> pd.DataFrame:
+    """
+    Clean a raw "Contract Info" frame in place: parse the monetary columns and add
+    the is_prime, is_sub, is_lbe and lbe_requirement fields.
+
+    Args:
+        df: Raw sheet (output of load_contract_info)
+        compact: Downcast the columns with compact_dtypes (off for memory comparisons)
+
+    Returns:
+        The same DataFrame, for chaining
+    """
+    for col in CURRENCY_COLUMNS:
+        if col in df.columns:
+            df[col] = clean_currency_series(df[col])
+
+    # Create role flags
+    df['is_prime'] = df['Sub/Prime'].str.contains('Prime', case=False, na=False)
+    df['is_sub'] = df['Sub/Prime'].str.contains('Sub', case=False, na=False)
+
+    # Clean LBE status
+    df['is_lbe'] = df['LBE? '].str.contains('Y', case=False, na=False)
+    df['lbe_requirement'] = pd.to_numeric(df['LBE Requirement'], errors='coerce')
+    return compact_dtypes(df) if compact else df
+
+
+def subcontractor_records(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extract one record per listed subcontract from a cleaned "Contract Info" frame.
+
+    Keeps the same rows as the LBE analysis (subs with a positive 'SUB $$ ') and
+    drops rows without a contractor name, which every grouping would drop anyway.
+
+    Returns:
+        DataFrame with ContractID, ScopeOfWork, SubcontractorName, SubAmount and is_lbe
+    """
+    subs = df[df['is_sub'] & (df['SUB $$ '] > 0) & df['Contractor Name'].notna()]
+    records = pd.DataFrame({
+        'ContractID': subs['Contract'],
+        'ScopeOfWork': subs['Scope of Work'],
+        'SubcontractorName': subs['Contractor Name'],
+        'SubAmount': subs['SUB $$ '],
+        'is_lbe': subs['is_lbe'],
+    }).reset_index(drop=True)
+    records = compact_dtypes(records)
+    for col in ['ContractID', 'ScopeOfWork', 'SubcontractorName']:
+        # Drop categories only prime contractors or non-listed rows used
+        records[col] = records[col].cat.remove_unused_categories()
+    return records
+
+
+def resolve_workbooks(path: str) -> List[str]:
+    """
+    Expand a workbook path, directory or glob pattern into a sorted list of workbooks.
+    """
+    if os.path.isdir(path):
+        candidates = glob.glob(os.path.join(path, '*.xlsx')) + glob.glob(os.path.join(path, '*.xls'))
+    elif glob.has_magic(path):
+        candidates = glob.glob(path)
+    else:
+        candidates = [path]
+    # Skip Excel lock files left by open workbooks
+    workbooks = sorted(p for p in candidates if not os.path.basename(p).startswith('~$'))
+    if not workbooks:
+        raise FileNotFoundError(f"No bid workbooks found for {path!r}")
+    return workbooks
+
+
+def _source_year(file_path: str, df: pd.DataFrame) -> Optional[int]:
+    """Year a workbook covers: from its file name, else the most common 'Year' value"""
+    match = re.search(r'(?<!\d)(?:19|20)\d{2}(?!\d)', os.path.basename(file_path))
+    if match:
+        return int(match.group())
+    if 'Year' in df.columns and df['Year'].notna().any():
+        return int(df['Year'].mode().iloc[0])
+    return None
+
+
+def _load_clean_workbook(file_path: str) -> Tuple[str, pd.DataFrame, float]:
+    """Load, clean and tag one workbook (runs in a worker process)"""
+    start = time.perf_counter()
+    df = clean_contract_info(load_contract_info(file_path))
+    df['SourceFile'] = os.path.basename(file_path)
+    df['SourceYear'] = _source_year(file_path, df)
+    return file_path, df, time.perf_counter() - start
+
+
+def load_bid_data(path: str, max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Load and clean one or many bid workbooks into a single frame.
+
+    With more than one workbook (a directory or glob pattern), files are parsed
+    and cleaned in parallel on a process pool; per-file timing and row counts are
+    reported. Rows are tagged with SourceFile and SourceYear.
+
+    Args:
+        path: Workbook path, directory of workbooks or glob pattern
+        max_workers: Process pool size (defaults to the CPU count)
+
+    Returns:
+        Cleaned "Contract Info" rows of all workbooks, in file order
+    """
+    workbooks = resolve_workbooks(path)
+    if len(workbooks) == 1:
+        return _load_clean_workbook(workbooks[0])[1]
+
+    print(f"Loading {len(workbooks)} workbooks in parallel...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_load_clean_workbook, workbooks))
+
+    for file_path, df, seconds in results:
+        print(f"  {os.path.basename(file_path)}: {len(df):,} rows in {seconds:.2f}s")
+    # Categories differ between files, so concat falls back to object; re-compact
+    combined = compact_dtypes(pd.concat([df for _, df, _ in results], ignore_index=True))
+    print(f"  Total: {len(combined):,} rows in {time.perf_counter() - start:.2f}s")
+    return combined
+
+
+def clean_currency(value: Any) -> float:
+    """
+    Parse a single currency cell ('$1,200', '(500)', '15%') into a float.
+
+    Row-wise reference implementation; use clean_currency_series for whole columns.
+    """
+    if pd.isna(value):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    str_val = str(value).strip()
+    cleaned = re.sub(r'[$,()%]', '', str_val)
+    if str_val.startswith('(') and str_val.endswith(')'):
+        cleaned = '-' + cleaned
+    try:
+        return float(cleaned) if cleaned else np.nan
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def clean_currency_series(values: pd.Series) -> pd.Series:
+    """
+    Vectorized equivalent of applying clean_currency to every cell of a column.
+
+    Numeric cells are cast directly; text cells are cleaned with pandas string ops
+    ('$', ',', '%' and accounting-style '(negative)' values) and cast in bulk once
+    they look like plain numbers. The few cleaned strings that don't (free text,
+    unusual float syntax) are handed to float() so they resolve exactly as the
+    row-wise parser would.
+
+    Args:
+        values: Raw column as loaded from the workbook
+
+    Returns:
+        float64 Series aligned with the input
+    """
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.astype('float64')
+
+    result = pd.Series(np.nan, index=values.index, dtype='float64')
+    present = values.notna()
+    if pd.api.types.is_string_dtype(values) and values.dtype != object:
+        is_text = present
+    else:
+        # Mixed object column straight from Excel: numbers skip the string path
+        is_number = values.map(type).isin(_NUMBER_TYPES) & present
+        if is_number.any():
+            result[is_number] = values[is_number].astype('float64')
+        is_text = present & ~is_number
+
+    if not is_text.any():
+        return result
+
+    text = values[is_text].astype(str).str.strip()
+    negative = text.str.startswith('(') & text.str.endswith(')')
+    cleaned = text.str.replace(r'[$,()%]', '', regex=True)
+    cleaned = cleaned.where(~negative, '-' + cleaned)
+
+    parsed = pd.Series(np.nan, index=cleaned.index, dtype='float64')
+    plain = cleaned.str.fullmatch(_PLAIN_NUMBER)
+    if plain.any():
+        parsed[plain] = cleaned[plain].astype('float64')
+    leftover = ~plain & (cleaned != '')
+    if leftover.any():
+        parsed[leftover] = cleaned[leftover].map(_parse_float)
+
+    result[is_text] = parsed
+    return result
+
+
+def _parse_float(text: str) -> float:
+    """float() that returns NaN instead of raising"""
+    try:
+        return float(text)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+if __name__ == "__main__":
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else "2020BidData.xlsx"
+    print("=== BID DATA MEMORY REPORT ===\n")
+    raw = pd.concat([load_contract_info(p) for p in resolve_workbooks(path)], ignore_index=True)
+    # Cleaned with the compaction step skipped, for the "before" side
+    before = clean_contract_info(raw.copy(), compact=False)
+    after = clean_contract_info(raw.copy())
+    with pd.option_context('display.width', 160, 'display.max_rows', 100):
+        print(memory_report(before, after))
@@ -5,84 +5,98 @@ This will fix the data inconsistency where Electrical Work shows different value
 in the concentration vs LBE analysis.
 """
 
+import os
+import sys
+from typing import Optional
+
 import pandas as pd
 import numpy as np
 
-def load_consolidation_mapping():
-    """Load the scope consolidation mapping"""
-    mapping_file = 'consolidated_analysis/scope_consolidation_mapping.csv'
-    mapping_df = pd.read_csv(mapping_file)
-    
-    # Create a dictionary for mapping
-    mapping_dict = dict(zip(mapping_df['OriginalScope'], mapping_df['ScopeOfWork']))
-    return mapping_dict
+from artifacts import write_frames
+from bid_data import load_bid_data
+from dashboard_export import DASHBOARD_DIR, export_dashboard
+from lbe_analysis import lbe_breakdown, lbe_subcontracts, lbe_tables
+from scope_consolidation import ScopeMatcher, get_default_matcher
 
-def consolidate_lbe_data():
-    """Consolidate the LBE scope analysis data"""
-    print("Loading LBE scope analysis data...")
-    lbe_df = pd.read_csv('lbe_analysis/lbe_scope_analysis.csv')
-    
-    print("Loading consolidation mapping...")
-    mapping_dict = load_consolidation_mapping()
-    
-    # Create consolidated scope column
-    lbe_df['ConsolidatedScope'] = lbe_df['Scope of Work'].map(mapping_dict).fillna(lbe_df['Scope of Work'])
+DASHBOARD_TABLE = 'lbe_scope_analysis_consolidated'
+OUTPUT_FILE = os.path.join(DASHBOARD_DIR, f'{DASHBOARD_TABLE}.csv')
+
+
+def consolidated_scope_codes(scopes: pd.Series, matcher: ScopeMatcher) -> pd.Categorical:
+    """
+    Consolidated scope of every row, via the categorical codes of the original scopes.
     
-    print("Consolidating LBE data...")
-    # Group by consolidated scope and aggregate
-    consolidated_lbe = lbe_df.groupby('ConsolidatedScope').agg({
-        'LBE_Count': 'sum',
-        'Total_Subs': 'sum', 
-        'Total_Dollars': 'sum'
-    }).reset_index()
+    Only the distinct original scopes (the categories) are classified; each row's
+    consolidated scope is then an array lookup on its category code.
     
-    # Recalculate rates and shares
-    consolidated_lbe['LBE_Rate'] = consolidated_lbe['LBE_Count'] / consolidated_lbe['Total_Subs']
+    Args:
+        scopes: Original 'Scope of Work' values
+        matcher: Compiled consolidation rules
     
-    # For LBE dollar share, we need to get the weighted average
-    # First calculate LBE dollars for each scope
-    lbe_df['LBE_Dollars'] = lbe_df['Total_Dollars'] * lbe_df['LBE_Dollar_Share']
+    Returns:
+        Categorical of consolidated scopes (sorted categories; missing stays missing)
+    """
+    scopes = scopes.astype('category')
+    labels = matcher.classify(pd.Series(scopes.cat.categories))
+    label_codes, consolidated = pd.factorize(labels, sort=True)
+    codes = scopes.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codes >= 0, label_codes[codes], -1), categories=consolidated)
+
+
+def consolidate_lbe_data(df: pd.DataFrame, matcher: Optional[ScopeMatcher] = None) -> pd.DataFrame:
+    """
+    LBE scope metrics over consolidated scopes, computed from the cleaned records.
     
-    # Group and sum LBE dollars
-    lbe_dollars_consolidated = lbe_df.groupby('ConsolidatedScope')['LBE_Dollars'].sum().reset_index()
+    Counts, dollars and LBE dollars are summed directly from the subcontract rows
+    in one grouped pass, so the rates and shares are exact rather than rebuilt
+    from the rounded per-scope rows of lbe_scope_analysis.csv.
     
-    # Merge back and calculate share
-    consolidated_lbe = consolidated_lbe.merge(lbe_dollars_consolidated, 
-                                             left_on='ConsolidatedScope', 
-                                             right_on='ConsolidatedScope')
+    Args:
+        df: Cleaned bid rows (output of bid_data.load_bid_data)
+        matcher: Consolidation rules (defaults to the rules file)
     
-    consolidated_lbe['LBE_Dollar_Share'] = consolidated_lbe['LBE_Dollars'] / consolidated_lbe['Total_Dollars']
+    Returns:
+        DataFrame with the lbe_scope_analysis.csv columns, one row per consolidated
+        scope, sorted by total dollars descending
+    """
+    subs = lbe_subcontracts(df)
+    subs['ConsolidatedScope'] = consolidated_scope_codes(subs['Scope of Work'], matcher or get_default_matcher())
     
-    # Rename column to match original structure
-    consolidated_lbe = consolidated_lbe.rename(columns={'ConsolidatedScope': 'Scope of Work'})
+    consolidated_lbe = lbe_breakdown(subs, 'ConsolidatedScope').sort_index()
+    consolidated_lbe.index = consolidated_lbe.index.astype(object)
     
-    # Reorder columns to match original
+    # Match the layout of lbe_scope_analysis.csv
+    consolidated_lbe = consolidated_lbe.rename_axis('Scope of Work').reset_index()
     column_order = ['Scope of Work', 'LBE_Count', 'Total_Subs', 'LBE_Rate', 'Total_Dollars', 'LBE_Dollar_Share']
     consolidated_lbe = consolidated_lbe[column_order]
     
     # Sort by total dollars descending
-    consolidated_lbe = consolidated_lbe.sort_values('Total_Dollars', ascending=False)
-    
-    return consolidated_lbe
+    return consolidated_lbe.sort_values('Total_Dollars', ascending=False)
 
-def main():
+def main(file_path: str = "2020BidData.xlsx"):
     print("=== CONSOLIDATING LBE DATA ===\n")
     
     try:
-        consolidated_lbe = consolidate_lbe_data()
+        print("Loading bid data...")
+        df = load_bid_data(file_path)
+        
+        print("Consolidating LBE data...")
+        consolidated_lbe = consolidate_lbe_data(df)
         
-        # Save the consolidated data
-        output_file = 'contract-insights/public/data/lbe_scope_analysis_consolidated.csv'
-        consolidated_lbe.to_csv(output_file, index=False)
+        # Save the consolidated data, and refresh the dashboard's columnar copy and
+        # manifest so it does not keep serving the previous table
+        output_file = OUTPUT_FILE
+        write_frames({output_file: consolidated_lbe})
+        export_dashboard({DASHBOARD_TABLE: consolidated_lbe}, DASHBOARD_DIR, merge=True)
         
-        print(f"Consolidated LBE data saved to: {output_file}")
+        print(f"Consolidated LBE data saved to: {output_file} (and {DASHBOARD_TABLE}.json)")
         print(f"Number of consolidated scopes: {len(consolidated_lbe)}")
         
         # Show some key comparisons
         print("\nKey scope comparisons (Original vs Consolidated):")
         
-        # Load original for comparison
-        original_lbe = pd.read_csv('lbe_analysis/lbe_scope_analysis.csv')
+        # Unconsolidated scope table for comparison
+        original_lbe = lbe_tables(df)['scope_analysis'].rename_axis('Scope of Work').reset_index()
         
         # Check Electrical Work specifically
         electrical_original = original_lbe[original_lbe['Scope of Work'].str.contains('Electrical', case=False, na=False)]
@@ -108,4 +122,4 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else "2020BidData.xlsx")
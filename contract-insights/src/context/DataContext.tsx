@@ -28,12 +28,56 @@ interface FirmAnalysisType {
   Scope_Count: number;
 }
 
+// Per-scope concentration ratios and dominant-firm counts at each threshold of the
+// pipeline's sweep (CR1, CR2, CR4, Dominant_25, DominantShare_25, ...)
+export interface DominanceSweepType {
+  ScopeOfWork: string;
+  NumSubcontractors: number;
+  [metric: string]: string | number;
+}
+
+// Columnar artifacts written by dashboard_export.py (see manifest.json)
+interface ColumnarColumn {
+  name: string;
+  type: 'number' | 'boolean' | 'string';
+  values?: any[];
+  dictionary?: string[];
+  codes?: (number | null)[];
+}
+
+interface ColumnarTable {
+  rows: number;
+  columns: ColumnarColumn[];
+}
+
+interface DataManifest {
+  version: number;
+  tables: Record<string, { file: string; sha256: string; rows: number; bytes: number }>;
+}
+
+function decodeColumnar(table: ColumnarTable): any[] {
+  const rows: any[] = Array.from({ length: table.rows }, () => ({}));
+  for (const column of table.columns) {
+    // Dictionary-encoded strings store an index per row; everything else is already typed
+    const values = column.codes
+      ? column.codes.map((code) => (code === null ? null : column.dictionary![code]))
+      : column.values!;
+    values.forEach((value, i) => {
+      rows[i][column.name] = value;
+    });
+  }
+  return rows;
+}
+
 interface DataContextType {
   marketConcentration: MarketConcentrationType[];
   dominantSubcontractors: DominantSubcontractorType[];
   lbeAnalysis: LbeAnalysisType[];
   scopeAggregation: ScopeAggregationType[];
   firmAnalysis: FirmAnalysisType[];
+  // Every scope's firms by descending share; empty when the pipeline output is absent
+  rankedSubcontractors: DominantSubcontractorType[];
+  dominanceSweep: DominanceSweepType[];
   isLoading: boolean;
   isUsingFallback: boolean;
 }
@@ -46,6 +90,8 @@ export function DataProvider({ children }: { children: ReactNode }) {
   const [lbeAnalysis, setLbeAnalysis] = useState<LbeAnalysisType[]>(sampleLbeAnalysis);
   const [scopeAggregation, setScopeAggregation] = useState<ScopeAggregationType[]>(sampleScopeAggregation);
   const [firmAnalysis, setFirmAnalysis] = useState<FirmAnalysisType[]>([]);
+  const [rankedSubcontractors, setRankedSubcontractors] = useState<DominantSubcontractorType[]>([]);
+  const [dominanceSweep, setDominanceSweep] = useState<DominanceSweepType[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [isUsingFallback, setIsUsingFallback] = useState(true);
 
@@ -84,15 +130,37 @@ export function DataProvider({ children }: { children: ReactNode }) {
     }
   };
 
+  const loadManifest = async (): Promise<DataManifest | null> => {
+    try {
+      // Revalidated on every load; the artifacts themselves are cached by content hash
+      const response = await fetch('/data/manifest.json', { cache: 'no-cache' });
+      return response.ok ? await response.json() : null;
+    } catch (error) {
+      return null;
+    }
+  };
+
+  const loadTable = async (manifest: DataManifest | null, name: string): Promise<any[]> => {
+    const entry = manifest?.tables[name];
+    if (!entry) {
+      return loadCsvData(`/data/${name}.csv`);
+    }
+    // The hash in the URL means an unchanged artifact is served from the browser cache
+    const response = await fetch(`/data/${entry.file}?v=${entry.sha256.slice(0, 16)}`, { cache: 'force-cache' });
+    if (!response.ok) throw new Error(`Failed to fetch ${entry.file}`);
+    return decodeColumnar(await response.json());
+  };
+
   useEffect(() => {
     const loadAllData = async () => {
       setIsLoading(true);
       let hasErrors = false;
+      const manifest = await loadManifest();
 
       try {
         // Try to load market concentration data
         try {
-          const marketData = await loadCsvData('/data/market_concentration_hhi_consolidated.csv');
+          const marketData = await loadTable(manifest, 'market_concentration_hhi_consolidated');
           if (marketData.length > 0) {
             setMarketConcentration(marketData);
           }
@@ -103,7 +171,7 @@ export function DataProvider({ children }: { children: ReactNode }) {
 
         // Try to load dominant subcontractors data
         try {
-          const dominantData = await loadCsvData('/data/dominant_subcontractors_consolidated.csv');
+          const dominantData = await loadTable(manifest, 'dominant_subcontractors_consolidated');
           if (dominantData.length > 0) {
             setDominantSubcontractors(dominantData);
           }
@@ -114,7 +182,7 @@ export function DataProvider({ children }: { children: ReactNode }) {
 
         // Try to load LBE analysis data
         try {
-          const lbeData = await loadCsvData('/data/lbe_scope_analysis_consolidated.csv');
+          const lbeData = await loadTable(manifest, 'lbe_scope_analysis_consolidated');
           if (lbeData.length > 0) {
             setLbeAnalysis(lbeData);
           }
@@ -125,7 +193,7 @@ export function DataProvider({ children }: { children: ReactNode }) {
 
         // Try to load scope aggregation data
         try {
-          const scopeData = await loadCsvData('/data/scope_subcontractor_aggregation_consolidated.csv');
+          const scopeData = await loadTable(manifest, 'scope_subcontractor_aggregation_consolidated');
           if (scopeData.length > 0) {
             setScopeAggregation(scopeData);
           }
@@ -136,7 +204,7 @@ export function DataProvider({ children }: { children: ReactNode }) {
 
         // Try to load firm analysis data
         try {
-          const firmData = await loadCsvData('/data/firm_analysis.csv');
+          const firmData = await loadTable(manifest, 'firm_analysis');
           if (firmData.length > 0) {
             // Transform boolean strings to actual booleans
             const transformedFirmData = firmData.map((firm: any) => ({
@@ -150,6 +218,14 @@ export function DataProvider({ children }: { children: ReactNode }) {
           hasErrors = true;
         }
 
+        // Optional: the threshold sweep only exists once the pipeline's dashboard stage has run
+        try {
+          setRankedSubcontractors(await loadTable(manifest, 'ranked_subcontractors'));
+          setDominanceSweep(await loadTable(manifest, 'dominance_sweep'));
+        } catch (error) {
+          console.warn('Dominance sweep not available; showing the fixed 25% threshold');
+        }
+
         if (hasErrors) {
           setIsUsingFallback(true);
           toast.error('Full dataset not found, using sample data', {
@@ -184,6 +260,8 @@ export function DataProvider({ children }: { children: ReactNode }) {
     lbeAnalysis,
     scopeAggregation,
     firmAnalysis,
+    rankedSubcontractors,
+    dominanceSweep,
     isLoading,
     isUsingFallback,
   };
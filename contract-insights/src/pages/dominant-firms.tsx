@@ -11,9 +11,10 @@ interface SlideOverProps {
   isOpen: boolean;
   onClose: () => void;
   subcontractor: any;
+  scopeMetrics: any;
 }
 
-function SlideOver({ isOpen, onClose, subcontractor }: SlideOverProps) {
+function SlideOver({ isOpen, onClose, subcontractor, scopeMetrics }: SlideOverProps) {
   if (!isOpen || !subcontractor) return null;
 
   return (
@@ -88,6 +89,32 @@ function SlideOver({ isOpen, onClose, subcontractor }: SlideOverProps) {
               </div>
             </div>
           </div>
+
+          {scopeMetrics && (
+            <div>
+              <h3 className="text-sm font-medium text-gray-500 dark:text-gray-400 uppercase tracking-wide">
+                Scope Concentration
+              </h3>
+              <div className="mt-2 space-y-3">
+                {Object.keys(scopeMetrics).filter(key => /^CR\d+$/.test(key)).map(key => (
+                  <div key={key} className="flex justify-between">
+                    <span className="text-sm text-gray-600 dark:text-gray-300">
+                      Top {key.slice(2)} share ({key}):
+                    </span>
+                    <span className="text-sm font-medium text-gray-900 dark:text-white">
+                      {formatPercent(scopeMetrics[key])}
+                    </span>
+                  </div>
+                ))}
+                <div className="flex justify-between">
+                  <span className="text-sm text-gray-600 dark:text-gray-300">Subcontractors in scope:</span>
+                  <span className="text-sm font-medium text-gray-900 dark:text-white">
+                    {scopeMetrics.NumSubcontractors}
+                  </span>
+                </div>
+              </div>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -95,8 +122,9 @@ function SlideOver({ isOpen, onClose, subcontractor }: SlideOverProps) {
 }
 
 export default function DominantFirmsPage() {
-  const { dominantSubcontractors, firmAnalysis, isLoading } = useData();
+  const { dominantSubcontractors, rankedSubcontractors, dominanceSweep, firmAnalysis, isLoading } = useData();
   const [searchTerm, setSearchTerm] = useState('');
+  const [threshold, setThreshold] = useState(0.25);
   const [sortConfig, setSortConfig] = useState<{
     key: string;
     direction: 'asc' | 'desc';
@@ -113,17 +141,34 @@ export default function DominantFirmsPage() {
     return map;
   }, [firmAnalysis]);
 
+  // Thresholds of the pipeline's dominance sweep (columns Dominant_10, Dominant_25, ...)
+  const thresholds = useMemo(() => {
+    if (dominanceSweep.length === 0) return [0.25];
+    return Object.keys(dominanceSweep[0])
+      .filter(key => key.startsWith('Dominant_'))
+      .map(key => parseFloat(key.slice('Dominant_'.length).replace('_', '.')) / 100);
+  }, [dominanceSweep]);
+
+  const sweepByScope = useMemo(() => {
+    const map = new Map<string, any>();
+    dominanceSweep.forEach(row => map.set(row.ScopeOfWork, row));
+    return map;
+  }, [dominanceSweep]);
+
   const filteredAndSortedData = useMemo(() => {
-    if (!dominantSubcontractors) return [];
+    // The ranked table holds every firm, so any threshold is a filter; without it only
+    // the exported >= 25% positions are available
+    const positions = rankedSubcontractors.length > 0 ? rankedSubcontractors : dominantSubcontractors;
+    if (!positions) return [];
 
     // Filter by search term
-    let filtered = dominantSubcontractors.filter(sub =>
+    let filtered = positions.filter(sub =>
       sub.SubcontractorName.toLowerCase().includes(searchTerm.toLowerCase()) ||
       sub.ScopeOfWork.toLowerCase().includes(searchTerm.toLowerCase())
     );
 
-    // Filter for dominant firms (>=25% market share)
-    filtered = filtered.filter(sub => sub.ShareOfScope >= 0.25);
+    // Filter for dominant firms at the selected threshold
+    filtered = filtered.filter(sub => sub.ShareOfScope >= threshold);
 
     // Sort
     filtered.sort((a, b) => {
@@ -145,7 +190,7 @@ export default function DominantFirmsPage() {
     });
 
     return filtered;
-  }, [dominantSubcontractors, searchTerm, sortConfig]);
+  }, [rankedSubcontractors, dominantSubcontractors, searchTerm, sortConfig, threshold]);
 
   const handleSort = (key: string) => {
     setSortConfig(prev => ({
@@ -182,7 +227,7 @@ export default function DominantFirmsPage() {
           Dominant Firms Analysis
         </h1>
         <p className="text-lg text-gray-600 dark:text-gray-300">
-          Subcontractors with market share ≥ 25% in their respective scopes
+          Subcontractors with market share ≥ {formatPercent(threshold)} in their respective scopes
         </p>
       </div>
 
@@ -190,15 +235,29 @@ export default function DominantFirmsPage() {
         <CardHeader>
           <div className="flex flex-col sm:flex-row sm:items-center sm:justify-between gap-4">
             <CardTitle>Dominant Subcontractors</CardTitle>
-            <div className="relative">
-              <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
-              <input
-                type="text"
-                placeholder="Search by firm or scope..."
-                value={searchTerm}
-                onChange={(e) => setSearchTerm(e.target.value)}
-                className="pl-10 pr-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md bg-white dark:bg-gray-800 text-gray-900 dark:text-white focus:ring-2 focus:ring-primary-500 focus:border-transparent"
-              />
+            <div className="flex items-center gap-4">
+              {thresholds.length > 1 && (
+                <select
+                  value={threshold}
+                  onChange={(e) => setThreshold(parseFloat(e.target.value))}
+                  className="px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-md bg-white dark:bg-gray-800 text-gray-900 dark:text-white focus:ring-2 focus:ring-primary-500 focus:border-transparent"
+                  aria-label="Dominance threshold"
+                >
+                  {thresholds.map(value => (
+                    <option key={value} value={value}>Share ≥ {formatPercent(value)}</option>
+                  ))}
+                </select>
+              )}
+              <div className="relative">
+                <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
+                <input
+                  type="text"
+                  placeholder="Search by firm or scope..."
+                  value={searchTerm}
+                  onChange={(e) => setSearchTerm(e.target.value)}
+                  className="pl-10 pr-4 py-2 border border-gray-300 dark:border-gray-600 rounded-md bg-white dark:bg-gray-800 text-gray-900 dark:text-white focus:ring-2 focus:ring-primary-500 focus:border-transparent"
+                />
+              </div>
             </div>
           </div>
           <p className="text-sm text-gray-600 dark:text-gray-400">
@@ -349,6 +408,7 @@ export default function DominantFirmsPage() {
         isOpen={slideOverOpen}
         onClose={() => setSlideOverOpen(false)}
         subcontractor={selectedSubcontractor}
+        scopeMetrics={selectedSubcontractor ? sweepByScope.get(selectedSubcontractor.ScopeOfWork) : null}
       />
     </div>
   );
@@ -0,0 +1,198 @@
+"""
+Contract Fact Tables
+One row per prime bid and one row per contract, each built once with vectorized
+groupbys and kept under a sorted index, for bid-vs-estimate, LBE requirement
+attainment and subcontracting-share questions without rescanning the bid rows.
+
+    bid_fact_table       (ContractID, PrimeName) -> bid amount, award flag and the
+                         dollars of the subs listed in that bid
+    contract_fact_table  ContractID -> estimate, award, winning bid, bid spread and
+                         the winning bid's subcontracting and LBE attainment
+
+Subs are joined to the prime whose bid lists them (see firm_network.bid_links).
+LBE attainment counts the winning bid's LBE subcontract dollars against the award;
+an LBE prime's own work is shown by PrimeIsLBE but not added in.
+
+The bid, award, estimate and requirement columns are optional: when a workbook
+lacks one, the metrics derived from it are left missing (NaN / NA).
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import ArtifactWriter
+from bid_data import clean_currency_series
+from firm_network import bid_links
+
+
+# Contract attributes copied to the contract table when the workbook has them
+CONTRACT_COLUMNS = {
+    'Year': 'Year',
+    'Title': 'Title',
+    'lbe_requirement': 'LBERequirement',
+    'Engineers Estimate': 'EngineersEstimate',
+    'Contract Award Amount (Awarded)': 'AwardAmount',
+}
+# Contract columns the derived metrics read; missing ones are added as NaN
+METRIC_COLUMNS = ['LBERequirement', 'EngineersEstimate', 'AwardAmount']
+BID_AMOUNT_COLUMN = 'Contract Amount Bid'
+# Columns the tables cannot be built without (cleaned bid rows always have them)
+REQUIRED_COLUMNS = ['Contract', 'Contractor Name', 'Awarded Contract?', 'SUB $$ ', 'Scope of Work',
+                    'is_prime', 'is_sub', 'is_lbe']
+
+
+def _check_columns(bids: pd.DataFrame):
+    missing = [col for col in REQUIRED_COLUMNS if col not in bids.columns]
+    if missing:
+        raise ValueError(f"Bid rows are missing the columns {missing} needed for the contract fact tables; "
+                         f"pass cleaned rows from bid_data.load_bid_data")
+
+
+def bid_fact_table(bids: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per prime bid with the subcontracts it lists.
+
+    Args:
+        bids: Cleaned bid rows in sheet order (output of bid_data.load_bid_data)
+
+    Returns:
+        DataFrame indexed by sorted (ContractID, PrimeName) with BidID, PrimeIsLBE,
+        Awarded, BidAmount, NumSubs, NumLBESubs, SubDollars, LBESubDollars,
+        SubShareOfBid and LBEShareOfBid (BidAmount and the shares are NaN without
+        a 'Contract Amount Bid' column)
+
+    Raises:
+        ValueError: If a REQUIRED_COLUMNS column is missing
+    """
+    _check_columns(bids)
+    is_prime = bids['is_prime'].to_numpy(dtype=bool)
+    primes = bids[is_prime]
+    bid_amounts = (clean_currency_series(primes[BID_AMOUNT_COLUMN]).to_numpy() if BID_AMOUNT_COLUMN in primes
+                   else np.full(len(primes), np.nan))
+    table = pd.DataFrame({
+        # Same numbering as bid_links: the running count of Prime rows
+        'BidID': np.cumsum(is_prime)[is_prime],
+        'ContractID': primes['Contract'].astype(object).to_numpy(),
+        'PrimeName': primes['Contractor Name'].astype(object).to_numpy(),
+        'PrimeIsLBE': primes['is_lbe'].to_numpy(dtype=bool),
+        'Awarded': primes['Awarded Contract?'].astype(str).str.strip().str.upper().eq('Y').to_numpy(),
+        'BidAmount': bid_amounts,
+    })
+
+    links = bid_links(bids)
+    links['LBEDollars'] = links['SubAmount'].where(links['is_lbe'], 0.0)
+    subs = links.groupby('BidID').agg(
+        NumSubs=('SubAmount', 'size'),
+        NumLBESubs=('is_lbe', 'sum'),
+        SubDollars=('SubAmount', 'sum'),
+        LBESubDollars=('LBEDollars', 'sum'),
+    )
+    table = table.join(subs, on='BidID')
+    table[['NumSubs', 'NumLBESubs']] = table[['NumSubs', 'NumLBESubs']].fillna(0).astype('int64')
+    table[['SubDollars', 'LBESubDollars']] = table[['SubDollars', 'LBESubDollars']].fillna(0.0)
+    table['SubShareOfBid'] = table['SubDollars'] / table['BidAmount']
+    table['LBEShareOfBid'] = table['LBESubDollars'] / table['BidAmount']
+    return table.set_index(['ContractID', 'PrimeName']).sort_index()
+
+
+def contract_fact_table(bids: pd.DataFrame, bid_facts: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    One row per contract, joining the award to the winning bid and its subs.
+
+    Args:
+        bids: Cleaned bid rows in sheet order
+        bid_facts: Output of bid_fact_table for the same rows (built when omitted)
+
+    Returns:
+        DataFrame indexed by sorted ContractID with the CONTRACT_COLUMNS present
+        (METRIC_COLUMNS always, NaN when the workbook lacks them), NumBids, LowBid,
+        WinningPrime, PrimeIsLBE, WinningBid, AwardVsEstimate, LowBidVsEstimate,
+        NumSubs, NumLBESubs, SubDollars, LBESubDollars, SubShareOfAward,
+        LBEAttainment and MeetsRequirement (NA without a requirement)
+
+    Raises:
+        ValueError: If a REQUIRED_COLUMNS column is missing
+    """
+    _check_columns(bids)
+    if bid_facts is None:
+        bid_facts = bid_fact_table(bids)
+    columns = {source: name for source, name in CONTRACT_COLUMNS.items() if source in bids.columns}
+    contracts = bids.groupby(bids['Contract'].astype(object))[list(columns)].first().rename(columns=columns)
+    contracts.index.name = 'ContractID'
+    for name in METRIC_COLUMNS:
+        if name not in contracts:
+            contracts[name] = np.nan
+
+    by_contract = bid_facts.groupby(level='ContractID')
+    contracts['NumBids'] = by_contract.size()
+    contracts['LowBid'] = by_contract['BidAmount'].min()
+    winners = bid_facts[bid_facts['Awarded']].reset_index(level='PrimeName')
+    # A contract with more than one bid marked awarded keeps the first
+    winners = winners[~winners.index.duplicated()]
+    contracts['WinningPrime'] = winners['PrimeName']
+    contracts['PrimeIsLBE'] = winners['PrimeIsLBE'].astype('boolean')
+    contracts['WinningBid'] = winners['BidAmount']
+    for col in ['NumSubs', 'NumLBESubs', 'SubDollars', 'LBESubDollars']:
+        contracts[col] = winners[col]
+
+    award = contracts['AwardAmount']
+    estimate = contracts['EngineersEstimate']
+    contracts['AwardVsEstimate'] = award / estimate - 1
+    contracts['LowBidVsEstimate'] = contracts['LowBid'] / estimate - 1
+    contracts['SubShareOfAward'] = contracts['SubDollars'] / award
+    contracts['LBEAttainment'] = contracts['LBESubDollars'] / award
+    requirement = contracts['LBERequirement']
+    contracts['MeetsRequirement'] = (contracts['LBEAttainment'] >= requirement).astype('boolean').where(
+        requirement.notna() & contracts['LBEAttainment'].notna())
+    return contracts.sort_index()
+
+
+def contract_facts(bids: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Both fact tables from one pass: (contract table, bid table)"""
+    bid_facts = bid_fact_table(bids)
+    return contract_fact_table(bids, bid_facts), bid_facts
+
+
+def requirement_attainment(contracts: pd.DataFrame) -> pd.DataFrame:
+    """
+    LBE attainment of contracts with a requirement, per requirement level.
+
+    Returns:
+        DataFrame indexed by LBERequirement with Contracts, AvgLBEAttainment,
+        MetRate (share of contracts meeting it) and AvgAward
+    """
+    with_requirement = contracts[contracts['LBERequirement'] > 0]
+    return with_requirement.groupby('LBERequirement').agg(
+        Contracts=('AwardAmount', 'size'),
+        AvgLBEAttainment=('LBEAttainment', 'mean'),
+        MetRate=('MeetsRequirement', 'mean'),
+        AvgAward=('AwardAmount', 'mean'),
+    )
+
+
+def save_contract_facts(contracts: pd.DataFrame, bid_facts: pd.DataFrame, output_dir: str = 'lbe_analysis',
+                        writer: Optional[ArtifactWriter] = None) -> List[str]:
+    """
+    Write the contract and bid fact tables as CSVs (keyed columns first).
+
+    Args:
+        contracts: Output of contract_fact_table
+        bid_facts: Output of bid_fact_table
+        output_dir: Directory for the CSVs
+        writer: Queue the CSVs on this writer instead of writing them now
+
+    Returns:
+        Paths written
+    """
+    own_writer = writer is None
+    writer = writer or ArtifactWriter()
+    paths = [
+        writer.add(os.path.join(output_dir, 'contract_facts.csv'), contracts, index=True),
+        writer.add(os.path.join(output_dir, 'bid_facts.csv'), bid_facts, index=True),
+    ]
+    if own_writer:
+        writer.write()
+    return paths
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Dashboard Export
+Writes the dashboard tables as compact, pre-typed columnar JSON plus a manifest
+of content hashes, so the dashboard can skip CSV parsing and number guessing and
+only re-download artifacts whose hash changed.
+
+Artifacts go through artifacts.ArtifactWriter, so unchanged tables are not
+rewritten and changed ones are replaced atomically. The directory is served as
+is, so the writer keeps no .artifacts.json there; manifest.json lists the tables.
+
+Each artifact holds one table:
+    {"rows": n, "columns": [
+        {"name": "ScopeHHI", "type": "number", "values": [3422, ...]},
+        {"name": "ScopeOfWork", "type": "string", "dictionary": ["Tunneling", ...], "codes": [0, ...]},
+        {"name": "Is_LBE", "type": "boolean", "values": [false, ...]}]}
+String columns with repeated values are dictionary-encoded (codes index the
+dictionary; null codes are missing values); missing values are null.
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from artifacts import MANIFEST_FILE as ARTIFACT_MANIFEST_FILE, ArtifactWriter, write_if_changed
+
+
+DASHBOARD_DIR = os.path.join('contract-insights', 'public', 'data')
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def _column(name: str, values: pd.Series) -> Dict:
+    """One column of a columnar table, typed from its dtype"""
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(values):
+        # Nullable booleans hold pd.NA, which has no truth value
+        cells = [None if is_missing else bool(value)
+                 for value, is_missing in zip(values.to_numpy(dtype=object), missing)]
+        return {'name': name, 'type': 'boolean', 'values': cells}
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype(float).to_numpy()
+        # Whole numbers are written without a trailing ".0"
+        whole = ~missing & (numbers == np.round(numbers)) & (np.abs(numbers) < 2 ** 53)
+        cells = [int(number) if is_whole else (None if is_missing else float(number))
+                 for number, is_whole, is_missing in zip(numbers, whole, missing)]
+        return {'name': name, 'type': 'number', 'values': cells}
+    codes, dictionary = pd.factorize(values.astype(object), use_na_sentinel=True)
+    if len(dictionary) == len(values):
+        # Nothing repeats, so a dictionary would only add the codes
+        return {'name': name, 'type': 'string', 'values': [None if code < 0 else str(dictionary[code])
+                                                           for code in codes]}
+    return {'name': name, 'type': 'string', 'dictionary': [str(value) for value in dictionary],
+            'codes': [None if code < 0 else int(code) for code in codes]}
+
+
+def columnar_table(df: pd.DataFrame) -> Dict:
+    """
+    A frame as a typed, dictionary-encoded columnar dict.
+
+    Args:
+        df: Table to encode (its index is dropped)
+
+    Returns:
+        Dict with the row count and one entry per column
+    """
+    return {
+        'rows': len(df),
+        'columns': [_column(str(name), df[name]) for name in df.columns],
+    }
+
+
+def _encode(df: pd.DataFrame) -> bytes:
+    return json.dumps(columnar_table(df), separators=(',', ':'), allow_nan=False).encode()
+
+
+def load_dashboard_manifest(output_dir: str = DASHBOARD_DIR) -> Dict:
+    """The dashboard manifest in output_dir (empty when missing or from another format version)"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE)) as handle:
+            manifest = json.load(handle)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'version': FORMAT_VERSION, 'tables': {}}
+    if manifest.get('version') != FORMAT_VERSION:
+        return {'version': FORMAT_VERSION, 'tables': {}}
+    return manifest
+
+
+def export_dashboard(tables: Dict[str, pd.DataFrame], output_dir: str = DASHBOARD_DIR,
+                     merge: bool = False) -> List[str]:
+    """
+    Write each table as <name>.json and a manifest.json listing their hashes.
+
+    Unchanged artifacts are not rewritten, so their timestamps (and any HTTP
+    caching keyed on them) survive a rerun.
+
+    Args:
+        tables: Table name (the dashboard's CSV stem) -> frame
+        output_dir: Directory the dashboard serves as /data
+        merge: Keep the manifest's entries for tables not given (whose artifacts
+            still exist), so a script refreshing one table leaves the rest listed
+
+    Returns:
+        Paths of the artifacts and the manifest
+    """
+    writer = ArtifactWriter(manifest=False)
+    paths = {name: writer.add(os.path.join(output_dir, f"{name}.json"), df, kind=f"columnar-v{FORMAT_VERSION}",
+                              serialize=_encode)
+             for name, df in sorted(tables.items())}
+    written = writer.write()
+    # Left by exports from before the writer skipped its manifest here
+    stale = os.path.join(output_dir, ARTIFACT_MANIFEST_FILE)
+    if os.path.exists(stale):
+        os.remove(stale)
+
+    manifest = {'version': FORMAT_VERSION, 'tables': {}}
+    if merge:
+        manifest['tables'] = {name: entry for name, entry in load_dashboard_manifest(output_dir)['tables'].items()
+                              if os.path.exists(os.path.join(output_dir, entry['file']))}
+    for name, path in paths.items():
+        manifest['tables'][name] = {
+            'file': f"{name}.json",
+            'sha256': written[path]['sha256'],
+            'rows': written[path]['rows'],
+            'bytes': written[path]['bytes'],
+        }
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    write_if_changed(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode() + b'\n')
+    return list(paths.values()) + [manifest_path]
+
+
+def dashboard_tables(scope_sub_agg: pd.DataFrame, scope_hhi: pd.DataFrame, dominant_subs: pd.DataFrame,
+                     scope_mapping: pd.DataFrame, lbe: Dict[str, pd.DataFrame],
+                     lbe_consolidated: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    The dashboard tables under their CSV names, shaped as the CSV exports write them.
+
+    Args:
+        scope_sub_agg: Consolidated scope x subcontractor aggregation with shares
+        scope_hhi: Consolidated HHI per scope
+        dominant_subs: Dominant subcontractors
+        scope_mapping: OriginalScope -> ScopeOfWork pairs
+        lbe: Output of lbe_analysis.lbe_tables
+        lbe_consolidated: Output of consolidate_lbe_data.consolidate_lbe_data
+
+    Returns:
+        Dict of table name -> frame
+    """
+    return {
+        'scope_subcontractor_aggregation_consolidated': scope_sub_agg,
+        'market_concentration_hhi_consolidated': scope_hhi,
+        'dominant_subcontractors_consolidated': dominant_subs,
+        'scope_consolidation_mapping': scope_mapping.sort_values(['ScopeOfWork', 'OriginalScope']),
+        'lbe_scope_analysis': lbe['scope_analysis'].reset_index(),
+        'firm_analysis': lbe['firm_analysis'].reset_index(),
+        'competitive_scopes': lbe['competitive_scopes'],
+        'lbe_vs_nonlbe_comparison': lbe['lbe_comparison'],
+        'lbe_scope_analysis_consolidated': lbe_consolidated,
+    }
+
+
+def export_csv_directory(data_dir: str = DASHBOARD_DIR) -> List[str]:
+    """
+    Columnar copies of every CSV already in data_dir (e.g. the committed dashboard data).
+
+    Tables the pipeline exports only as JSON (concentration trends, rankings) stay
+    in the manifest.
+    """
+    tables = {
+        os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path)
+        for path in sorted(glob.glob(os.path.join(data_dir, '*.csv')))
+    }
+    return export_dashboard(tables, data_dir, merge=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write columnar JSON copies of the dashboard CSVs")
+    parser.add_argument('data_dir', nargs='?', default=DASHBOARD_DIR, help='Directory holding the dashboard CSVs')
+    args = parser.parse_args()
+
+    print("=== DASHBOARD EXPORT ===\n")
+    paths = export_csv_directory(args.data_dir)
+    with open(paths[-1]) as handle:
+        manifest = json.load(handle)
+    for path in paths[:-1]:
+        name = os.path.splitext(os.path.basename(path))[0]
+        entry = manifest['tables'][name]
+        csv_bytes = os.path.getsize(os.path.join(args.data_dir, f"{name}.csv"))
+        print(f"  {name:<46} {entry['rows']:>6,} rows  {csv_bytes:>8,} -> {entry['bytes']:>8,} bytes")
+    print(f"\nManifest written to {paths[-1]}")
+
+
+if __name__ == "__main__":
+    main()
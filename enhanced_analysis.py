@@ -3,11 +3,23 @@ Enhanced Bid Analysis with Scope Consolidation
 Addresses the artificial fragmentation issue that skews market concentration data
 """
 
+import os
 import pandas as pd
 import numpy as np
 import re
 from typing import Dict, Tuple, List, Optional
 
+from artifacts import ArtifactWriter
+from backends import BACKENDS, consolidated_aggregation, get_backend
+from bid_data import compact_dtypes, load_bid_data, resolve_workbooks, subcontractor_records
+from firm_resolution import FirmResolver, firm_mapping_from_counts, get_default_resolver, resolve_firm_names
+from instrumentation import start_run
+from market_concentration import BOOTSTRAP_RESAMPLES, bootstrap_concentration, classify_concentration, dominant_subcontractors
+from scope_consolidation import ScopeMatcher, get_default_matcher, save_matcher
+
+
+RECORDS_FILE = 'analysis_results/02_subcontractor_records.csv'
+
 
 def consolidate_scopes(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -28,184 +40,288 @@ def consolidate_scopes(df: pd.DataFrame) -> pd.DataFrame:
     df_consolidated = df.copy()
     df_consolidated['OriginalScope'] = df_consolidated['ScopeOfWork']
     
-    # Define consolidation rules
-    consolidation_rules = {
-        'AC_PAVING_WORK': {
-            'keywords': ['ac paving', 'asphalt paving', 'ac grinding', 'ac mill', 'asphalt grinding', 'asphalt work', 'asphalt concrete', 'ac panel', 'grinding & paving', 'grinding, paving', 'ac & grinding'],
-            'exclude': ['design', 'survey', 'testing'],
-            'consolidated_name': 'AC Paving & Asphalt Work (Consolidated)'
-        },
-        'GRINDING_WORK': {
-            'keywords': ['grinding'],
-            'exclude': ['ac', 'asphalt', 'paving', 'design', 'survey', 'testing'],
-            'consolidated_name': 'Grinding Work (Consolidated)'
-        },
-        'CONCRETE_WORK': {
-            'keywords': ['concrete', 'cast in place'],
-            'exclude': ['ac', 'asphalt', 'design'],
-            'consolidated_name': 'Concrete Work (Consolidated)'
-        },
-        'TRAFFIC_CONTROL': {
-            'keywords': ['traffic', 'sawcutting'],
-            'exclude': ['design'],
-            'consolidated_name': 'Traffic Control & Sawcutting (Consolidated)'
-        },
-        'PIPELINE_WORK': {
-            'keywords': ['cipp', 'cipl', 'pipeline', 'sewer', 'water'],
-            'exclude': ['design', 'testing'],
-            'consolidated_name': 'Pipeline & Sewer Work (Consolidated)'
-        },
-        'TRUCKING_HAULING': {
-            'keywords': ['trucking', 'hauling', 'transport'],
-            'exclude': [],
-            'consolidated_name': 'Trucking & Hauling (Consolidated)'
-        },
-        'ENGINEERING_DESIGN': {
-            'keywords': ['engineering', 'design', 'survey'],
-            'exclude': [],
-            'consolidated_name': 'Engineering & Design Services (Consolidated)'
-        },
-        'ELECTRICAL_WORK': {
-            'keywords': ['electrical', 'electric'],
-            'exclude': [],
-            'consolidated_name': 'Electrical Work (Consolidated)'
-        },
-        'STRUCTURAL_WORK': {
-            'keywords': ['structural', 'steel', 'frame'],
-            'exclude': [],
-            'consolidated_name': 'Structural Work (Consolidated)'
-        }
-    }
+    # Apply consolidation (rules from scope_consolidation_rules.json are compiled
+    # once; each distinct scope string is classified once and broadcast back)
+    matcher = get_default_matcher()
+    df_consolidated['ScopeOfWork'] = matcher.classify(df_consolidated['OriginalScope']).astype('category')
+    save_matcher(matcher)
     
-    def get_consolidated_scope(original_scope) -> str:
-        """Determine consolidated scope category for a given original scope"""
-        # Handle NaN values
-        if pd.isna(original_scope):
-            return "Unknown/Unspecified Scope"
-        
-        scope_lower = str(original_scope).lower().strip()
-        
-        for category, rules in consolidation_rules.items():
-            # Check if any keywords match
-            has_keyword = any(keyword in scope_lower for keyword in rules['keywords'])
-            # Check if any exclude terms match
-            has_exclude = any(exclude in scope_lower for exclude in rules['exclude'])
-            
-            if has_keyword and not has_exclude:
-                return rules['consolidated_name']
-        
-        # If no consolidation rule matches, keep original (but clean it)
-        return str(original_scope).strip()
+    print_consolidation_summary(df_consolidated)
     
-    # Apply consolidation
-    df_consolidated['ScopeOfWork'] = df_consolidated['OriginalScope'].apply(get_consolidated_scope)
-    
-    # Show consolidation results
-    consolidation_summary = df_consolidated.groupby('ScopeOfWork')['OriginalScope'].nunique().sort_values(ascending=False)
+    return df_consolidated
+
+
+def print_consolidation_summary(scope_mapping: pd.DataFrame):
+    """Print how many original scopes were folded into each consolidated scope"""
+    consolidation_summary = scope_mapping.groupby('ScopeOfWork', observed=True)['OriginalScope'].nunique().sort_values(ascending=False)
     print("\nScope Consolidation Summary:")
     print("Consolidated Scope -> Number of Original Scopes Combined")
     for scope, count in consolidation_summary.head(10).items():
         if count > 1:
             print(f"  {scope}: {count} original scopes")
+
+
+def stream_consolidated_aggregation(records_path: str = RECORDS_FILE, chunksize: int = 100_000,
+                                    matcher: Optional[ScopeMatcher] = None,
+                                    resolver: Optional[FirmResolver] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Consolidate and aggregate the subcontractor records CSV chunk by chunk.
     
-    return df_consolidated
+    Each chunk is consolidated and reduced to partial (scope, subcontractor) sums,
+    distinct (scope, subcontractor, ContractID) triples and rows per firm name
+    spelling. The pieces are combined once at the end, after the spellings are
+    resolved to canonical firm names from the counts of the whole file. Peak
+    memory is bounded by one chunk plus the partial results, not by the size of
+    the input.
+    
+    Args:
+        records_path: Subcontractor records CSV
+        chunksize: Rows read per chunk
+        matcher: Scope consolidation rules (the default rules when None)
+        resolver: Firm name resolver (the cached default when None)
+    
+    Returns:
+        Tuple of (scope x subcontractor aggregation with TotalSubAmount and
+        ContractsCount, OriginalScope -> ScopeOfWork mapping in first-seen order),
+        matching aggregate_scope_subcontractors on the loaded and resolved records
+        (see load_subcontractor_records)
+    """
+    matcher = matcher or get_default_matcher()
+    keys = ['ScopeOfWork', 'SubcontractorName']
+    partials, triples, mappings, name_rows = [], [], [], []
+    rows = 0
+    
+    for chunk in pd.read_csv(records_path, chunksize=chunksize):
+        rows += len(chunk)
+        names = chunk['SubcontractorName']
+        # Names are compared as text, as resolve_firm_names compares them
+        chunk = chunk.assign(OriginalScope=chunk['ScopeOfWork'], SubcontractorName=names.astype(str).where(names.notna()))
+        chunk['ScopeOfWork'] = matcher.classify(chunk['OriginalScope'])
+        partials.append(chunk.groupby(keys, observed=True)['SubAmount'].sum().reset_index())
+        triples.append(chunk[keys + ['ContractID']].dropna().drop_duplicates())
+        mappings.append(chunk[['OriginalScope', 'ScopeOfWork']].drop_duplicates())
+        name_rows.append(chunk['SubcontractorName'].value_counts())
+    save_matcher(matcher)
+    print(f"Streamed {rows} subcontractor records")
+    
+    if not rows:
+        agg = pd.DataFrame({'ScopeOfWork': pd.Series(dtype=object), 'SubcontractorName': pd.Series(dtype=object),
+                            'TotalSubAmount': pd.Series(dtype='float64'), 'ContractsCount': pd.Series(dtype='int64')})
+        return agg, pd.DataFrame({'OriginalScope': pd.Series(dtype=object), 'ScopeOfWork': pd.Series(dtype=object)})
+    
+    firms = firm_mapping_from_counts(pd.concat(name_rows).groupby(level=0).sum(), 'SubcontractorName', resolver)
+    canonical = pd.Series(firms['SubcontractorName'].to_numpy(), index=firms['OriginalSubcontractorName'].to_numpy())
+    
+    partials = pd.concat(partials, ignore_index=True)
+    partials['SubcontractorName'] = partials['SubcontractorName'].map(canonical)
+    agg = partials.groupby(keys)['SubAmount'].sum().rename('TotalSubAmount').to_frame()
+    triples = pd.concat(triples, ignore_index=True)
+    triples['SubcontractorName'] = triples['SubcontractorName'].map(canonical)
+    counts = triples.drop_duplicates().groupby(keys)['ContractID'].nunique()
+    agg['ContractsCount'] = counts.reindex(agg.index, fill_value=0)
+    mapping = pd.concat(mappings, ignore_index=True).drop_duplicates()
+    return agg.sort_index().reset_index(), mapping.reset_index(drop=True)
+
+
+def print_original_comparison(original_hhi: pd.DataFrame, original_dominant: pd.DataFrame,
+                              scope_hhi_consolidated: pd.DataFrame, dominant_subs_consolidated: pd.DataFrame):
+    """Print scope, concentration and dominance counts before vs after consolidation"""
+    print(f"\n SCOPE COUNTS:")
+    print(f"  Original scopes: {len(original_hhi)}")
+    print(f"  Consolidated scopes: {len(scope_hhi_consolidated)}")
+    print(f"  Reduction: {len(original_hhi) - len(scope_hhi_consolidated)} scopes consolidated")
+    
+    print(f"\n MARKET CONCENTRATION:")
+    orig_highly_concentrated = len(original_hhi[original_hhi['ConcentrationLevel'] == 'Highly Concentrated'])
+    new_highly_concentrated = len(scope_hhi_consolidated[scope_hhi_consolidated['ConcentrationLevel'] == 'Highly Concentrated'])
+    
+    print(f"  Original highly concentrated: {orig_highly_concentrated}/{len(original_hhi)} ({orig_highly_concentrated/len(original_hhi)*100:.1f}%)")
+    print(f"  Consolidated highly concentrated: {new_highly_concentrated}/{len(scope_hhi_consolidated)} ({new_highly_concentrated/len(scope_hhi_consolidated)*100:.1f}%)")
+    
+    print(f"\n DOMINANT SUBCONTRACTORS:")
+    print(f"  Original dominant positions: {len(original_dominant)}")
+    print(f"  Consolidated dominant positions: {len(dominant_subs_consolidated)}")
+
 
+def print_fragile_labels(scope_hhi: pd.DataFrame, min_probability: float = 0.8, top: int = 10):
+    """Print the largest scopes whose concentration level holds in fewer than min_probability of resamples"""
+    level_probability = pd.Series(
+        [row[f"P_{row['ConcentrationLevel'].replace(' ', '_')}"] for _, row in scope_hhi.iterrows()],
+        index=scope_hhi.index
+    )
+    fragile = scope_hhi[level_probability < min_probability].assign(LevelProbability=level_probability)
+    print(f"\n FRAGILE CONCENTRATION LABELS: {len(fragile)}/{len(scope_hhi)} scopes hold their level "
+          f"in under {min_probability:.0%} of resamples")
+    for _, row in fragile.nlargest(top, 'ScopeTotalSub').iterrows():
+        print(f"  {row['ScopeOfWork']}: {row['ConcentrationLevel']} in {row['LevelProbability']:.0%} "
+              f"(HHI {row['ScopeHHI']:.0f}, CI {row['ScopeHHI_Lower']:.0f}-{row['ScopeHHI_Upper']:.0f}, "
+              f"{row['NumContracts']} contracts)")
 
-def analyze_with_consolidation(file_path: str):
+
+def save_consolidated_results(scope_sub_agg: pd.DataFrame, scope_hhi: pd.DataFrame, dominant_subs: pd.DataFrame,
+                              scope_mapping: pd.DataFrame, output_dir: str = "consolidated_analysis",
+                              writer: Optional[ArtifactWriter] = None) -> List[str]:
+    """
+    Write the consolidated aggregation, HHI, dominant firm and scope mapping CSVs.
+    
+    Unchanged CSVs are left alone and changed ones replaced atomically (see artifacts.py).
+    
+    Args:
+        writer: Queue the CSVs on this writer instead of writing them now
+    
+    Returns:
+        Paths written
+    """
+    own_writer = writer is None
+    writer = writer or ArtifactWriter()
+    paths = [
+        f"{output_dir}/scope_subcontractor_aggregation_consolidated.csv",
+        f"{output_dir}/market_concentration_hhi_consolidated.csv",
+        f"{output_dir}/dominant_subcontractors_consolidated.csv",
+        f"{output_dir}/scope_consolidation_mapping.csv",
+    ]
+    writer.add(paths[0], scope_sub_agg)
+    writer.add(paths[1], scope_hhi)
+    writer.add(paths[2], dominant_subs)
+    
+    # Save scope mapping for transparency
+    writer.add(paths[3], scope_mapping.sort_values(['ScopeOfWork', 'OriginalScope']))
+    if own_writer:
+        writer.write()
+    return paths
+
+
+def load_subcontractor_records(file_path: str) -> pd.DataFrame:
+    """
+    Load the subcontractor records to consolidate.
+    
+    A single workbook uses the records written by the base analysis when they
+    exist; a directory or glob of workbooks (or missing records) is loaded from
+    the workbooks directly, in parallel. Spelling variants of firm names are
+    merged either way. The records file holds only subcontract rows, so the
+    canonical spelling of a firm is the one most of its subcontracts use (a
+    workbook also counts its prime bids); the clusters are the same.
+    
+    Args:
+        file_path: Bid workbook, or a directory / glob pattern of workbooks
+    
+    Returns:
+        DataFrame with ScopeOfWork, SubcontractorName, SubAmount and ContractID
+    """
+    if len(resolve_workbooks(file_path)) == 1 and os.path.exists(RECORDS_FILE):
+        return resolve_firm_names(compact_dtypes(pd.read_csv(RECORDS_FILE)), column='SubcontractorName')
+    return subcontractor_records(resolve_firm_names(load_bid_data(file_path)))
+
+
+def analyze_with_consolidation(file_path: str, chunksize: Optional[int] = None, instrument: Optional[str] = None,
+                               backend: str = 'pandas', bootstrap: int = 0, workers: Optional[int] = None):
     """
     Run the full analysis with scope consolidation to get realistic market concentration insights.
+    
+    Args:
+        file_path: Bid workbook, or a directory / glob pattern of workbooks
+        chunksize: Stream the subcontractor records CSV in chunks of this many rows
+            instead of loading it whole (outputs are identical). Only applies to a
+            single workbook whose records CSV exists, with the pandas backend and no
+            bootstrap; otherwise a warning says why it is ignored
+        instrument: Instrumentation options (see instrumentation.py); off by default
+        backend: Aggregation engine ('pandas' or 'duckdb', see backends.py). With
+            duckdb the records CSV is aggregated in the engine without loading it
+        bootstrap: Resamples per scope for HHI confidence intervals (0 = off). The
+            resampling needs contract-level records, so the records are loaded in
+            memory even with chunksize or a non-pandas backend
+        workers: Process pool size for the bootstrap (defaults to the CPU count)
     """
     print("=== ENHANCED BID ANALYSIS WITH SCOPE CONSOLIDATION ===\n")
+    run = start_run('enhanced_analysis', instrument)
+    output_dir = "consolidated_analysis"
     
     # Load the existing analysis results
     print("Loading existing analysis results...")
     
     try:
-        # Read the detailed subcontractor records
-        subs_data = pd.read_csv('analysis_results/02_subcontractor_records.csv')
-        print(f"Loaded {len(subs_data)} subcontractor records")
-        
-        # Consolidate scopes
-        subs_consolidated = consolidate_scopes(subs_data)
+        engine = get_backend(backend)
+        n_workbooks = len(resolve_workbooks(file_path))
+        use_records_file = n_workbooks == 1 and os.path.exists(RECORDS_FILE)
+        if chunksize:
+            reason = (f"{n_workbooks} workbooks are loaded directly" if n_workbooks != 1 else
+                      f"there is no {RECORDS_FILE} to stream" if not use_records_file else
+                      "--bootstrap needs the contract-level records in memory" if bootstrap else
+                      f"the {backend} backend aggregates the records file out of core" if backend != 'pandas' else
+                      None)
+            if reason:
+                print(f"Warning: --chunksize is ignored because {reason}")
+        if backend != 'pandas' and use_records_file and not bootstrap:
+            # Out-of-core mode: only the distinct scopes are classified in Python
+            run.section(f'{backend} consolidate + aggregate')
+            print("Consolidating artificially fragmented scopes...")
+            scope_sub_agg_consolidated, scope_mapping = consolidated_aggregation(
+                engine, RECORDS_FILE, get_default_matcher(), resolver=get_default_resolver()
+            )
+            print_consolidation_summary(scope_mapping)
+            run.done(rows_out=scope_sub_agg_consolidated)
+        elif chunksize and use_records_file and not bootstrap:
+            # Streaming mode: never hold the full record set in memory
+            run.section('stream consolidate + aggregate')
+            print("Consolidating artificially fragmented scopes...")
+            scope_sub_agg_consolidated, scope_mapping = stream_consolidated_aggregation(RECORDS_FILE, chunksize)
+            print_consolidation_summary(scope_mapping)
+            run.done(rows_out=scope_sub_agg_consolidated)
+        else:
+            # Read the detailed subcontractor records
+            run.section('load records')
+            subs_data = load_subcontractor_records(file_path)
+            print(f"Loaded {len(subs_data)} subcontractor records")
+            
+            # Consolidate scopes
+            run.done(rows_out=subs_data)
+            run.section('consolidate', rows_in=subs_data)
+            subs_consolidated = consolidate_scopes(subs_data)
+            scope_mapping = subs_consolidated[['OriginalScope', 'ScopeOfWork']].drop_duplicates()
+            
+            # Group by consolidated scope and contractor
+            run.done(rows_out=subs_consolidated)
+            run.section('aggregate', rows_in=subs_consolidated)
+            scope_sub_agg_consolidated = engine.aggregate_scope_subcontractors(subs_consolidated, 'ScopeOfWork')
+            run.done(rows_out=scope_sub_agg_consolidated)
         
         # Re-aggregate with consolidated scopes
         print("\nRe-computing aggregations with consolidated scopes...")
         
-        # Group by consolidated scope and contractor
-        scope_sub_agg_consolidated = subs_consolidated.groupby(['ScopeOfWork', 'SubcontractorName']).agg({
-            'SubAmount': 'sum',
-            'ContractID': 'nunique'
-        }).reset_index()
-        
-        scope_sub_agg_consolidated = scope_sub_agg_consolidated.rename(columns={
-            'SubAmount': 'TotalSubAmount',
-            'ContractID': 'ContractsCount'
-        })
-        
-        # Compute scope totals and shares
-        scope_totals = scope_sub_agg_consolidated.groupby('ScopeOfWork')['TotalSubAmount'].sum().reset_index()
-        scope_totals = scope_totals.rename(columns={'TotalSubAmount': 'ScopeTotalSub'})
-        
-        scope_sub_agg_consolidated = scope_sub_agg_consolidated.merge(scope_totals, on='ScopeOfWork')
-        scope_sub_agg_consolidated['ShareOfScope'] = scope_sub_agg_consolidated['TotalSubAmount'] / scope_sub_agg_consolidated['ScopeTotalSub']
-        
-        # Compute HHI for consolidated scopes
-        def calc_hhi(group):
-            shares = group['ShareOfScope']
-            hhi = (shares ** 2).sum() * 10000
-            return hhi
-        
-        scope_hhi_consolidated = scope_sub_agg_consolidated.groupby('ScopeOfWork').apply(calc_hhi, include_groups=False).reset_index()
-        scope_hhi_consolidated.columns = ['ScopeOfWork', 'ScopeHHI']
-        
-        # Add scope statistics
-        scope_stats = scope_sub_agg_consolidated.groupby('ScopeOfWork').agg({
-            'SubcontractorName': 'nunique',
-            'TotalSubAmount': 'sum'
-        }).reset_index()
-        scope_stats.columns = ['ScopeOfWork', 'NumSubcontractors', 'ScopeTotalSub']
-        
-        scope_hhi_consolidated = scope_hhi_consolidated.merge(scope_stats, on='ScopeOfWork')
-        
-        # Classify concentration levels
-        def classify_concentration(hhi):
-            if hhi < 1500:
-                return "Unconcentrated"
-            elif hhi <= 2500:
-                return "Moderately Concentrated"
-            else:
-                return "Highly Concentrated"
+        # Shares, HHI, subcontractor counts, totals and concentration levels in one pass
+        run.section('hhi', rows_in=scope_sub_agg_consolidated)
+        scope_sub_agg_consolidated, scope_hhi_consolidated = engine.concentration_tables(
+            scope_sub_agg_consolidated, 'ScopeOfWork'
+        )
         
-        scope_hhi_consolidated['ConcentrationLevel'] = scope_hhi_consolidated['ScopeHHI'].apply(classify_concentration)
+        if bootstrap:
+            # Confidence intervals and level probabilities from resampled contracts
+            run.done(rows_out=scope_hhi_consolidated)
+            run.section('hhi bootstrap', rows_in=subs_consolidated)
+            print(f"Bootstrapping scope HHI ({bootstrap:,} resamples of contracts per scope)...")
+            intervals = bootstrap_concentration(subs_consolidated, 'ScopeOfWork', n_resamples=bootstrap,
+                                                max_workers=workers)
+            scope_hhi_consolidated = scope_hhi_consolidated.merge(intervals, on='ScopeOfWork', how='left')
+            print_fragile_labels(scope_hhi_consolidated)
         
         # Extract dominant subcontractors (consolidated)
-        dominant_subs_consolidated = scope_sub_agg_consolidated[scope_sub_agg_consolidated['ShareOfScope'] >= 0.25].copy()
-        dominant_subs_consolidated['RankInScope'] = dominant_subs_consolidated.groupby('ScopeOfWork')['ShareOfScope'].rank(
-            method='dense', ascending=False
-        )
+        run.done(rows_out=scope_hhi_consolidated)
+        run.section('dominant', rows_in=scope_sub_agg_consolidated)
+        dominant_subs_consolidated = dominant_subcontractors(scope_sub_agg_consolidated, 'ScopeOfWork')
+        run.done(rows_out=dominant_subs_consolidated)
         
         # Print comparison results
+        run.section('comparison and insights', rows_in=scope_hhi_consolidated)
         print("\n=== COMPARISON: BEFORE vs AFTER CONSOLIDATION ===")
         
         # Load original results for comparison
-        original_hhi = pd.read_csv('analysis_results/04_market_concentration_hhi.csv')
-        original_dominant = pd.read_csv('analysis_results/05_dominant_subcontractors.csv')
-        
-        print(f"\n SCOPE COUNTS:")
-        print(f"  Original scopes: {len(original_hhi)}")
-        print(f"  Consolidated scopes: {len(scope_hhi_consolidated)}")
-        print(f"  Reduction: {len(original_hhi) - len(scope_hhi_consolidated)} scopes consolidated")
-        
-        print(f"\n MARKET CONCENTRATION:")
-        orig_highly_concentrated = len(original_hhi[original_hhi['ConcentrationLevel'] == 'Highly Concentrated'])
-        new_highly_concentrated = len(scope_hhi_consolidated[scope_hhi_consolidated['ConcentrationLevel'] == 'Highly Concentrated'])
-        
-        print(f"  Original highly concentrated: {orig_highly_concentrated}/{len(original_hhi)} ({orig_highly_concentrated/len(original_hhi)*100:.1f}%)")
-        print(f"  Consolidated highly concentrated: {new_highly_concentrated}/{len(scope_hhi_consolidated)} ({new_highly_concentrated/len(scope_hhi_consolidated)*100:.1f}%)")
-        
-        print(f"\n DOMINANT SUBCONTRACTORS:")
-        print(f"  Original dominant positions: {len(original_dominant)}")
-        print(f"  Consolidated dominant positions: {len(dominant_subs_consolidated)}")
+        original_hhi_file = 'analysis_results/04_market_concentration_hhi.csv'
+        original_dominant_file = 'analysis_results/05_dominant_subcontractors.csv'
+        if os.path.exists(original_hhi_file) and os.path.exists(original_dominant_file):
+            print_original_comparison(pd.read_csv(original_hhi_file), pd.read_csv(original_dominant_file),
+                                      scope_hhi_consolidated, dominant_subs_consolidated)
+        else:
+            print("  (no unconsolidated results in analysis_results/ to compare against)")
         
         # Show most significant consolidated scopes
         print(f"\n TOP CONSOLIDATED SCOPES BY DOLLAR VALUE:")
@@ -230,19 +346,12 @@ def analyze_with_consolidation(file_path: str):
         # Save consolidated results
         print(f"\nSaving consolidated analysis results...")
         
-        import os
-        output_dir = "consolidated_analysis"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        scope_sub_agg_consolidated.to_csv(f"{output_dir}/scope_subcontractor_aggregation_consolidated.csv", index=False)
-        scope_hhi_consolidated.to_csv(f"{output_dir}/market_concentration_hhi_consolidated.csv", index=False)
-        dominant_subs_consolidated.to_csv(f"{output_dir}/dominant_subcontractors_consolidated.csv", index=False)
-        
-        # Save scope mapping for transparency
-        scope_mapping = subs_consolidated[['OriginalScope', 'ScopeOfWork']].drop_duplicates().sort_values('ScopeOfWork')
-        scope_mapping.to_csv(f"{output_dir}/scope_consolidation_mapping.csv", index=False)
+        run.section('save results')
+        save_consolidated_results(scope_sub_agg_consolidated, scope_hhi_consolidated, dominant_subs_consolidated,
+                                  scope_mapping, output_dir)
         
         print(f"  Saved consolidated results to: {output_dir}/")
+        run.done()
         
         print("\n=== REALISTIC MARKET CONCENTRATION INSIGHTS ===")
         
@@ -270,10 +379,32 @@ which was skewed by artificial scope fragmentation.
         """)
         
     except Exception as e:
+        run.done(error=e)
         print(f"Error in consolidated analysis: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        run.finish(output_dir)
 
 
 if __name__ == "__main__":
-    analyze_with_consolidation("2020BidData.xlsx")
+    import argparse
+    parser = argparse.ArgumentParser(description="Bid analysis with scope consolidation")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Stream the subcontractor records CSV in chunks of this many rows')
+    parser.add_argument('--instrument', nargs='?', const='1', default=None,
+                        help='Write consolidated_analysis/run_report.json with per-stage timing, rows and memory; '
+                             'add "memory" and/or "profile" for tracemalloc and cProfile')
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help='Engine for the aggregation and HHI stages')
+    parser.add_argument('--bootstrap', nargs='?', type=int, const=BOOTSTRAP_RESAMPLES, default=0,
+                        help='Add HHI confidence intervals and concentration level probabilities from this '
+                             'many contract resamples per scope (default %d)' % BOOTSTRAP_RESAMPLES)
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size for --bootstrap')
+    args = parser.parse_args()
+    if args.chunksize and args.bootstrap:
+        parser.error("--chunksize cannot be combined with --bootstrap, which resamples the records in memory")
+    analyze_with_consolidation(args.file_path, chunksize=args.chunksize, instrument=args.instrument,
+                               backend=args.backend, bootstrap=args.bootstrap, workers=args.workers)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Prime-Subcontractor Network
+Which primes funnel work to which subcontractors, and how concentrated each
+prime's subcontracting is, from the bid structure of the Contract Info sheet.
+
+Each bid is a Prime row followed by the Sub rows it lists, so every listed
+subcontract is linked to the prime whose bid it appears in. Firms and scopes are
+integer-coded and the links held as scipy.sparse CSR matrices:
+    prime x sub   dollars and number of contracts listing the pair
+    sub x scope   dollars per consolidated scope
+Partner, exclusivity and concentration queries are sparse row/column
+reductions, so hundreds of thousands of firm pairs stay cheap in memory.
+"""
+
+import argparse
+import os
+from typing import Optional, Set
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from artifacts import ArtifactWriter
+from market_concentration import classify_concentration_series
+from scope_consolidation import ScopeMatcher
+
+
+OUTPUT_DIR = 'consolidated_analysis'
+
+
+def bid_links(bids: pd.DataFrame, matcher: Optional[ScopeMatcher] = None) -> pd.DataFrame:
+    """
+    One row per listed subcontract with the prime whose bid lists it.
+
+    Keeps the same subcontracts as bid_data.subcontractor_records.
+
+    Args:
+        bids: Cleaned bid rows in sheet order (output of bid_data.load_bid_data)
+        matcher: Scope consolidation rules; scopes are left as written when None
+
+    Returns:
+        DataFrame with BidID (running count of Prime rows), ContractID, PrimeName,
+        Awarded (the prime's bid won), SubcontractorName, ScopeOfWork, SubAmount and is_lbe
+    """
+    contract = bids['Contract'].astype(object)
+    # A bid runs from its Prime row to the next one; sub rows inherit its prime
+    bid_number = bids['is_prime'].cumsum()
+    prime = bids['Contractor Name'].astype(object).where(bids['is_prime']).groupby(contract).ffill()
+    awarded = bids['Awarded Contract?'].astype(object).where(bids['is_prime']).groupby(bid_number).transform('first')
+
+    subs = bids['is_sub'] & (bids['SUB $$ '] > 0) & bids['Contractor Name'].notna() & prime.notna()
+    links = pd.DataFrame({
+        'BidID': bid_number[subs],
+        'ContractID': bids.loc[subs, 'Contract'],
+        'PrimeName': prime[subs],
+        'Awarded': awarded[subs].astype(str).str.strip().str.upper().eq('Y'),
+        'SubcontractorName': bids.loc[subs, 'Contractor Name'].astype(object),
+        'ScopeOfWork': bids.loc[subs, 'Scope of Work'].astype(object),
+        'SubAmount': bids.loc[subs, 'SUB $$ '],
+        'is_lbe': bids.loc[subs, 'is_lbe'],
+    }).reset_index(drop=True)
+    if matcher is not None:
+        links['ScopeOfWork'] = matcher.classify(links['ScopeOfWork'])
+    return links
+
+
+class FirmNetwork:
+    """
+    Sparse prime x sub and sub x scope graphs with partner and concentration queries.
+
+    Args:
+        links: One row per subcontract (see bid_links)
+        awarded_only: Keep only subcontracts of winning bids
+    """
+
+    def __init__(self, links: pd.DataFrame, awarded_only: bool = False):
+        if awarded_only:
+            links = links[links['Awarded']]
+        self.links = links = links[links['ScopeOfWork'].notna()]
+        prime_ids, self.primes = pd.factorize(links['PrimeName'].astype(object), sort=True)
+        sub_ids, self.subs = pd.factorize(links['SubcontractorName'].astype(object), sort=True)
+        scope_ids, self.scopes = pd.factorize(links['ScopeOfWork'].astype(object), sort=True)
+        amounts = links['SubAmount'].to_numpy(dtype='float64')
+        shape = (len(self.primes), len(self.subs))
+
+        # Duplicate (row, col) entries are summed when converting to CSR
+        self.prime_sub = sparse.coo_matrix((amounts, (prime_ids, sub_ids)), shape=shape).tocsr()
+        # Distinct contracts per pair: a sub listed twice in one bid, or a prime
+        # bidding a contract twice, counts once
+        pair_contracts = pd.DataFrame({'prime': prime_ids, 'sub': sub_ids,
+                                       'contract': links['ContractID'].astype(object).to_numpy()}).drop_duplicates()
+        self.prime_sub_contracts = sparse.coo_matrix(
+            (np.ones(len(pair_contracts)), (pair_contracts['prime'], pair_contracts['sub'])), shape=shape).tocsr()
+        self.sub_prime = self.prime_sub.T.tocsr()
+        self.sub_prime_contracts = self.prime_sub_contracts.T.tocsr()
+        self.sub_scope = sparse.coo_matrix((amounts, (sub_ids, scope_ids)),
+                                           shape=(len(self.subs), len(self.scopes))).tocsr()
+        sub_lbe = np.zeros(len(self.subs), dtype=bool)
+        # LBE flag per sub from its first subcontract, as in lbe_analysis's firm table
+        first = pd.Series(sub_ids).drop_duplicates()
+        sub_lbe[first.to_numpy()] = links['is_lbe'].to_numpy(dtype=bool)[first.index]
+        self.sub_lbe = sub_lbe
+        self._prime_index = {name: i for i, name in enumerate(self.primes)}
+        self._sub_index = {name: i for i, name in enumerate(self.subs)}
+
+    @staticmethod
+    def _row(matrix: sparse.csr_matrix, i: int):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        return matrix.indices[start:end], matrix.data[start:end]
+
+    def top_partners(self, firm: str, n: int = 10) -> pd.DataFrame:
+        """
+        A firm's largest partners by dollars: subs of a prime, or primes of a sub.
+
+        Args:
+            firm: Prime or subcontractor name (a firm acting as both is treated as a prime)
+            n: Partners to return
+
+        Returns:
+            DataFrame with Partner, Dollars, Contracts, Share (of the firm's dollars
+            with all partners) and, for a prime's subs, is_lbe
+        """
+        if firm in self._prime_index:
+            i, dollars, counts, names = self._prime_index[firm], self.prime_sub, self.prime_sub_contracts, self.subs
+        elif firm in self._sub_index:
+            i, dollars, counts, names = self._sub_index[firm], self.sub_prime, self.sub_prime_contracts, self.primes
+        else:
+            raise KeyError(f"'{firm}' is not a prime or subcontractor in the network")
+        partners, amounts = self._row(dollars, i)
+        order = np.argsort(-amounts, kind='stable')[:n]
+        top = pd.DataFrame({
+            'Partner': names[partners[order]],
+            'Dollars': amounts[order],
+            'Contracts': counts[i, partners[order]].toarray().ravel().astype(int),
+            'Share': amounts[order] / amounts.sum(),
+        })
+        if dollars is self.prime_sub:
+            top['is_lbe'] = self.sub_lbe[partners[order]]
+        return top
+
+    def sub_exclusivity(self) -> pd.DataFrame:
+        """
+        How tied each subcontractor is to a single prime.
+
+        Returns:
+            DataFrame per sub with is_lbe, NumPrimes, TotalDollars, TopPrime and
+            ExclusivityRatio (share of its dollars listed by its top prime), sorted
+            by TotalDollars
+        """
+        totals = np.asarray(self.sub_prime.sum(axis=1)).ravel()
+        top_prime = np.asarray(self.sub_prime.argmax(axis=1)).ravel()
+        return pd.DataFrame({
+            'SubcontractorName': self.subs,
+            'is_lbe': self.sub_lbe,
+            'NumPrimes': np.diff(self.sub_prime.indptr),
+            'TotalDollars': totals,
+            'TopPrime': self.primes[top_prime],
+            'ExclusivityRatio': self.sub_prime.max(axis=1).toarray().ravel() / totals,
+        }).sort_values('TotalDollars', ascending=False, kind='stable').reset_index(drop=True)
+
+    def prime_concentration(self, dominant_subs: Optional[Set[str]] = None) -> pd.DataFrame:
+        """
+        Concentration of each prime's subcontracting across its subs.
+
+        Args:
+            dominant_subs: Names of scope-dominant subcontractors (e.g. from
+                dominant_subcontractors); adds the dollar share going to them
+
+        Returns:
+            DataFrame per prime with NumSubs, TotalSubDollars, PartnerHHI (HHI of
+            its dollars across subs), ConcentrationLevel, TopSub, TopSubShare,
+            LBEDollarShare and, with dominant_subs, DominantSubShare; sorted by
+            TotalSubDollars
+        """
+        totals = np.asarray(self.prime_sub.sum(axis=1)).ravel()
+        squares = np.asarray(self.prime_sub.multiply(self.prime_sub).sum(axis=1)).ravel()
+        table = pd.DataFrame({
+            'PrimeName': self.primes,
+            'NumSubs': np.diff(self.prime_sub.indptr),
+            'TotalSubDollars': totals,
+            'PartnerHHI': squares / totals ** 2 * 10000,
+        })
+        table['ConcentrationLevel'] = classify_concentration_series(table['PartnerHHI'])
+        table['TopSub'] = self.subs[np.asarray(self.prime_sub.argmax(axis=1)).ravel()]
+        table['TopSubShare'] = self.prime_sub.max(axis=1).toarray().ravel() / totals
+        table['LBEDollarShare'] = (self.prime_sub @ self.sub_lbe.astype(float)) / totals
+        if dominant_subs is not None:
+            is_dominant = np.isin(self.subs, list(dominant_subs)).astype(float)
+            table['DominantSubShare'] = (self.prime_sub @ is_dominant) / totals
+        return table.sort_values('TotalSubDollars', ascending=False, kind='stable').reset_index(drop=True)
+
+    def sub_scopes(self, sub: str, n: int = 10) -> pd.DataFrame:
+        """A subcontractor's scopes by dollars, with Share of its total"""
+        if sub not in self._sub_index:
+            raise KeyError(f"'{sub}' is not a subcontractor in the network")
+        scopes, amounts = self._row(self.sub_scope, self._sub_index[sub])
+        order = np.argsort(-amounts, kind='stable')[:n]
+        return pd.DataFrame({
+            'ScopeOfWork': self.scopes[scopes[order]],
+            'Dollars': amounts[order],
+            'Share': amounts[order] / amounts.sum(),
+        })
+
+
+def save_network_tables(network: FirmNetwork, dominant_subs: Optional[Set[str]] = None,
+                        output_dir: str = OUTPUT_DIR, writer: Optional[ArtifactWriter] = None) -> list:
+    """
+    Write prime_network_concentration.csv and sub_exclusivity.csv; returns the paths.
+
+    With a writer the CSVs are queued on it instead of written now.
+    """
+    own_writer = writer is None
+    writer = writer or ArtifactWriter()
+    paths = [
+        writer.add(os.path.join(output_dir, 'prime_network_concentration.csv'),
+                   network.prime_concentration(dominant_subs)),
+        writer.add(os.path.join(output_dir, 'sub_exclusivity.csv'), network.sub_exclusivity()),
+    ]
+    if own_writer:
+        writer.write()
+    return paths
+
+
+def main():
+    from pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Prime-subcontractor network analysis")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--firm', action='append', help='Show the top partners of this prime or sub (repeatable)')
+    parser.add_argument('--awarded-only', action='store_true', help='Only use subcontracts of winning bids')
+    args = parser.parse_args()
+
+    print("=== PRIME-SUBCONTRACTOR NETWORK ===\n")
+    pipeline = Pipeline(file_path=args.file_path)
+    network = pipeline.get('network')
+    if args.awarded_only:
+        network = FirmNetwork(network.links, awarded_only=True)
+    dominant = set(pipeline.get('dominant')['SubcontractorName'].astype(str))
+    print(f"{len(network.primes)} primes, {len(network.subs)} subcontractors, "
+          f"{network.prime_sub.nnz:,} prime-sub pairs, {len(network.scopes)} scopes")
+
+    primes = network.prime_concentration(dominant)
+    print("\nLargest primes by subcontracted dollars:")
+    for _, row in primes.head(10).iterrows():
+        print(f"  {row['PrimeName']:<40} {row['NumSubs']:>3} subs  HHI {row['PartnerHHI']:>6,.0f}  "
+              f"LBE {row['LBEDollarShare']:>6.1%}  to dominant subs {row['DominantSubShare']:>6.1%}")
+
+    exclusive = network.sub_exclusivity()
+    exclusive = exclusive[exclusive['NumPrimes'] > 1]
+    print("\nMulti-prime subcontractors by exclusivity (LBE vs non-LBE):")
+    for is_lbe, group in exclusive.groupby('is_lbe'):
+        print(f"  {'LBE' if is_lbe else 'Non-LBE'}: {len(group)} subs, median exclusivity "
+              f"{group['ExclusivityRatio'].median():.1%}, median primes {group['NumPrimes'].median():.0f}")
+
+    for firm in args.firm or []:
+        print(f"\nTop partners of {firm}:")
+        print(network.top_partners(firm).to_string(index=False))
+
+    paths = save_network_tables(network, dominant)
+    print(f"\nNetwork tables written to {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
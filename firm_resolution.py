@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Firm Name Resolution
+Merges spelling variants of the same firm ("RK Engineering" / "Rk Engineering ",
+"Professional Tree Care" / "The Professional Tree Care Co.") into one canonical
+name, so market shares, HHI and dominant-firm rankings are not split across
+variants.
+
+Names are normalized (case, punctuation, legal suffixes, "dba" tails), then
+each new normalized name is compared only with names sharing a blocking key
+(a distinctive token or the first letters of the name), never with every other
+name. Pairs whose character-trigram similarity reaches the threshold are merged
+into one cluster. The clusters are cached on disk and extended incrementally,
+so a run only compares the names it has not seen before; the clusters depend
+only on the set of names seen, not on the order they arrived in.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+from typing import Dict, FrozenSet, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_frames
+from bid_data import CACHE_DIR, load_bid_data
+
+
+SIMILARITY_THRESHOLD = 0.85
+# Blocks larger than this hold a generic token ("construction") and are not compared
+# in; an oversized first-letters block is split on a longer prefix instead
+MAX_BLOCK_SIZE = 50
+PREFIX_LENGTH = 6
+LONG_PREFIX_LENGTH = 12
+MAPPING_FILE = 'consolidated_analysis/firm_resolution_mapping.csv'
+
+# Bump when normalize_firm_name or the blocking changes, to invalidate cached clusters
+NORMALIZATION_VERSION = 2
+
+LEGAL_TERMS = {
+    'inc', 'incorporated', 'llc', 'llp', 'lp', 'co', 'corp', 'corporation', 'company', 'ltd', 'limited', 'the',
+}
+ABBREVIATIONS = {
+    'assoc': 'associates', 'assocs': 'associates', 'bros': 'brothers', 'const': 'construction',
+    'constr': 'construction', 'eng': 'engineering', 'engr': 'engineering', 'exc': 'excavation',
+    'intl': 'international', 'mech': 'mechanical', 'svc': 'services', 'svcs': 'services',
+}
+
+_PARENTHETICAL = re.compile(r'\([^)]*\)')
+_DBA = re.compile(r'\b(?:dba|d/b/a|d\.b\.a\.?)\b.*$')
+_APOSTROPHE = re.compile(r"['’]")
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize_firm_name(name) -> str:
+    """
+    Comparison key for a firm name ('' for blanks).
+
+    Lowercases, drops parentheticals and anything after "dba", spells out '&',
+    strips punctuation, expands common abbreviations and removes legal terms.
+    """
+    if pd.isna(name):
+        return ''
+    text = _DBA.sub(' ', _PARENTHETICAL.sub(' ', str(name).lower()))
+    text = _NON_ALNUM.sub(' ', _APOSTROPHE.sub('', text.replace('&', ' and ')))
+    tokens = [ABBREVIATIONS.get(token, token) for token in text.split()]
+    kept = [token for token in tokens if token not in LEGAL_TERMS]
+    # A name made only of legal terms keeps them rather than becoming blank
+    return ' '.join(kept or tokens)
+
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    """Character trigrams of a normalized name with its spaces removed"""
+    compact = f"  {key.replace(' ', '')} "
+    return frozenset(compact[i:i + 3] for i in range(len(compact) - 2))
+
+
+def _block_keys(key: str) -> List[str]:
+    """
+    Blocking keys of a normalized name: its tokens of 2+ characters, then its
+    first letters and its longer prefix (the sub-block compared in when the
+    first-letters block is oversized).
+    """
+    compact = key.replace(' ', '')
+    keys = [f"t:{token}" for token in sorted(set(key.split())) if len(token) >= 2]
+    keys.append(f"p:{compact[:PREFIX_LENGTH]}")
+    keys.append(f"l:{compact[:LONG_PREFIX_LENGTH]}")
+    return keys
+
+
+class FirmResolver:
+    """
+    Incremental clustering of firm names.
+
+    Each raw spelling maps to a normalized key (memoized). A new key is
+    compared with the keys in its blocks and joined to every cluster it is
+    similar enough to (a union-find over keys). Names with different numbers
+    ("Unit 1" / "Unit 2") are never merged.
+
+    Every key is kept in all its blocks. A block with more than max_block_size
+    keys is not compared in; an oversized first-letters block is replaced by the
+    key's longer-prefix block, so every key keeps a block to be compared in. When
+    an add() pushes a block over the limit, the clusters are rebuilt without it,
+    so they are the same whatever order the names arrived in.
+
+    Args:
+        threshold: Minimum trigram similarity for two normalized names to merge
+        max_block_size: Blocks larger than this are not compared in
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_block_size: int = MAX_BLOCK_SIZE):
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self._keys: Dict[str, str] = {}
+        self._parent: Dict[str, str] = {}
+        self._blocks: Dict[str, List[str]] = {}
+        self._trigram_cache: Dict[str, FrozenSet[str]] = {}
+        self._dirty = False
+        self.comparisons = 0
+
+    @property
+    def settings_hash(self) -> str:
+        """Hash of the settings the clusters depend on (names the cache file)"""
+        payload = json.dumps([NORMALIZATION_VERSION, self.threshold, self.max_block_size])
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def _find(self, key: str) -> str:
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def _union(self, a: str, b: str):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            # The lexically smaller root wins so clusters don't depend on arrival order
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def _grams(self, key: str) -> FrozenSet[str]:
+        grams = self._trigram_cache.get(key)
+        if grams is None:
+            grams = self._trigram_cache[key] = _trigrams(key)
+        return grams
+
+    def _register(self, keys: List[str]) -> bool:
+        """Add new keys to their blocks; returns whether a block went over max_block_size"""
+        saturated = False
+        for key in keys:
+            self._parent[key] = key
+            for block in _block_keys(key):
+                members = self._blocks.setdefault(block, [])
+                # Longer-prefix blocks are never size-limited
+                saturated |= len(members) == self.max_block_size and not block.startswith('l:')
+                members.append(key)
+        return saturated
+
+    def _compared_blocks(self, key: str) -> List[str]:
+        """Blocks a key is compared in: those within max_block_size, with the longer prefix for an oversized prefix"""
+        *tokens, prefix, long_prefix = _block_keys(key)
+        blocks = [block for block in tokens if len(self._blocks[block]) <= self.max_block_size]
+        blocks.append(prefix if len(self._blocks[prefix]) <= self.max_block_size else long_prefix)
+        return blocks
+
+    def _compare(self, keys: List[str]):
+        """Merge each of keys with the similar keys in its compared blocks (each pair once)"""
+        pending = set(keys)
+        for key in keys:
+            pending.discard(key)
+            grams = self._grams(key)
+            digits = _DIGITS.findall(key)
+            candidates: Set[str] = set()
+            for block in self._compared_blocks(key):
+                candidates.update(self._blocks[block])
+            candidates.discard(key)
+            for other in candidates:
+                # A pair of keys from this batch is compared when the later one is reached
+                if other in pending:
+                    continue
+                other_grams = self._grams(other)
+                # Jaccard can't reach the threshold when one set is much smaller than the other
+                if min(len(grams), len(other_grams)) < self.threshold * max(len(grams), len(other_grams)):
+                    continue
+                self.comparisons += 1
+                if (len(grams & other_grams) >= self.threshold * len(grams | other_grams)
+                        and _DIGITS.findall(other) == digits):
+                    self._union(key, other)
+
+    def add(self, names) -> int:
+        """
+        Cluster any spellings not seen before.
+
+        Returns:
+            Number of new normalized keys placed
+        """
+        unseen = [name for name in pd.unique(pd.Series(names, dtype=object).dropna().astype(str))
+                  if name not in self._keys]
+        for name in unseen:
+            self._keys[name] = normalize_firm_name(name)
+        new_keys = [key for key in dict.fromkeys(self._keys[name] for name in unseen)
+                    if key and key not in self._parent]
+        if self._register(new_keys):
+            # A block stopped being compared in: rebuild the clusters without it
+            self._parent = {key: key for key in self._parent}
+            self._compare(list(self._parent))
+        else:
+            self._compare(new_keys)
+        if unseen:
+            self._dirty = True
+        return len(new_keys)
+
+    def resolve(self, names: pd.Series) -> pd.Series:
+        """
+        Canonical firm name for each value of a column.
+
+        Within each cluster the spelling used by the most rows in `names`
+        (whitespace-trimmed; ties go to the alphabetically first) becomes the
+        canonical name. Blank names are left as they are.
+
+        Args:
+            names: Raw 'Contractor Name' / SubcontractorName values (may contain NaN)
+
+        Returns:
+            Series of canonical names aligned with the input
+        """
+        codes, uniques = pd.factorize(names.astype(object))
+        uniques = pd.Series(uniques, dtype=object).astype(str)
+        labels = self.canonical_names(uniques, np.bincount(codes[codes >= 0], minlength=len(uniques)))
+        # factorize codes missing values as -1, which picks the trailing NaN
+        labels = np.append(labels, np.nan)
+        return pd.Series(labels[codes], index=names.index)
+
+    def canonical_names(self, spellings: pd.Series, rows: np.ndarray) -> np.ndarray:
+        """
+        Canonical firm name for each distinct raw spelling, given its row count.
+
+        This is the rule resolve() applies to a column; callers that keep
+        running row counts (incremental.py) use it to resolve across batches.
+
+        Args:
+            spellings: Distinct raw spellings (strings)
+            rows: Number of rows carrying each spelling
+
+        Returns:
+            Array of canonical names aligned with `spellings`
+        """
+        spellings = spellings.reset_index(drop=True)
+        self.add(spellings)
+
+        keys = spellings.map(self._keys)
+        table = pd.DataFrame({
+            'spelling': spellings.str.strip(),
+            'cluster': [self._find(key) if key else f"raw:{name}" for key, name in zip(keys, spellings)],
+            'rows': rows,
+        })
+        canonical = (table.sort_values(['rows', 'spelling'], ascending=[False, True], kind='stable')
+                     .drop_duplicates('cluster').set_index('cluster')['spelling'])
+        labels = table['cluster'].map(canonical).to_numpy(dtype=object)
+        labels[(keys == '').to_numpy()] = spellings[keys == ''].to_numpy(dtype=object)
+        return labels
+
+    def clusters(self) -> Dict[str, List[str]]:
+        """Raw spellings grouped by cluster, for clusters with more than one spelling"""
+        groups: Dict[str, List[str]] = {}
+        for name, key in self._keys.items():
+            if key:
+                groups.setdefault(self._find(key), []).append(name)
+        return {root: sorted(names) for root, names in groups.items() if len(names) > 1}
+
+    def to_state(self) -> Dict:
+        """Return the memo, clusters and blocks as plain data for caching"""
+        return {
+            'threshold': self.threshold,
+            'max_block_size': self.max_block_size,
+            'keys': self._keys,
+            'parent': self._parent,
+            'blocks': self._blocks,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'FirmResolver':
+        """Rebuild a resolver from to_state() output"""
+        resolver = cls(state['threshold'], state['max_block_size'])
+        resolver._keys = state['keys']
+        resolver._parent = state['parent']
+        resolver._blocks = state['blocks']
+        return resolver
+
+
+def _resolver_cache_path(settings_hash: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"firm_resolver-{settings_hash}.pkl")
+
+
+def save_resolver(resolver: FirmResolver, cache_dir: str = CACHE_DIR):
+    """Persist a resolver's clusters keyed by its settings"""
+    if not resolver._dirty:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _resolver_cache_path(resolver.settings_hash, cache_dir)
+    with open(f"{path}.tmp", 'wb') as handle:
+        pickle.dump(resolver.to_state(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    resolver._dirty = False
+
+
+def load_resolver(threshold: float = SIMILARITY_THRESHOLD, cache_dir: str = CACHE_DIR) -> FirmResolver:
+    """Return the cached resolver for these settings, or an empty one"""
+    resolver = FirmResolver(threshold)
+    path = _resolver_cache_path(resolver.settings_hash, cache_dir)
+    if os.path.exists(path):
+        with open(path, 'rb') as handle:
+            return FirmResolver.from_state(pickle.load(handle))
+    return resolver
+
+
+_default_resolvers: Dict[float, FirmResolver] = {}
+
+
+def get_default_resolver(threshold: float = SIMILARITY_THRESHOLD) -> FirmResolver:
+    """Return the process-wide resolver for a threshold, loading its cache on first use"""
+    if threshold not in _default_resolvers:
+        _default_resolvers[threshold] = load_resolver(threshold)
+    return _default_resolvers[threshold]
+
+
+def resolve_firm_names(df: pd.DataFrame, column: str = 'Contractor Name',
+                       resolver: Optional[FirmResolver] = None) -> pd.DataFrame:
+    """
+    Replace a frame's firm names with their canonical names.
+
+    The raw names are kept in 'Original' + column without spaces (e.g.
+    'OriginalContractorName'), as consolidation keeps 'OriginalScope'.
+
+    Args:
+        df: Cleaned bid rows (output of bid_data.load_bid_data) or subcontract records
+        column: Firm name column to resolve
+        resolver: Resolver to use (default: the cached process-wide one)
+
+    Returns:
+        Copy of df with the column resolved
+    """
+    resolver = resolver or get_default_resolver()
+    resolved = df.copy()
+    resolved[f"Original{column.replace(' ', '')}"] = df[column]
+    resolved[column] = resolver.resolve(df[column]).astype('category')
+    save_resolver(resolver)
+    return resolved
+
+
+def firm_mapping_from_counts(row_counts: pd.Series, column: str = 'SubcontractorName',
+                             resolver: Optional[FirmResolver] = None) -> pd.DataFrame:
+    """
+    Raw -> canonical firm name table for a column whose rows were counted without
+    loading it (chunk by chunk, or in an out-of-core backend).
+
+    Gives the names resolve_firm_names would give the whole column.
+
+    Args:
+        row_counts: Rows per raw spelling (indexed by spelling, missing names excluded)
+        column: Firm name column the table maps
+        resolver: Resolver to use (default: the cached process-wide one, whose
+            cache is updated)
+
+    Returns:
+        DataFrame with 'Original' + column (raw spelling) and column (canonical
+        name), named as resolve_firm_names names them
+    """
+    spellings = pd.Series(row_counts.index.astype(str), dtype=object)
+    labels = (resolver or get_default_resolver()).canonical_names(spellings, row_counts.to_numpy(dtype=np.int64))
+    if resolver is None:
+        save_resolver(get_default_resolver())
+    return pd.DataFrame({f"Original{column.replace(' ', '')}": spellings, column: labels})
+
+
+def firm_mapping(df: pd.DataFrame, column: str = 'Contractor Name') -> pd.DataFrame:
+    """Distinct (original name, canonical name) pairs of a resolved frame, sorted"""
+    original = f"Original{column.replace(' ', '')}"
+    mapping = df[[original, column]].dropna().astype(str).drop_duplicates()
+    return mapping.sort_values([column, original]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve spelling variants of firm names")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD,
+                        help='Minimum trigram similarity for two names to merge')
+    args = parser.parse_args()
+
+    print("=== FIRM NAME RESOLUTION ===\n")
+    df = load_bid_data(args.file_path)
+    resolver = get_default_resolver(args.threshold)
+    resolved = resolve_firm_names(df, resolver=resolver)
+    mapping = firm_mapping(resolved)
+    merged = mapping[mapping.duplicated('Contractor Name', keep=False)]
+
+    print(f"Distinct names: {mapping['OriginalContractorName'].nunique()} -> "
+          f"{mapping['Contractor Name'].nunique()} firms ({resolver.comparisons} comparisons this run)")
+    for canonical, group in merged.groupby('Contractor Name', sort=True):
+        print(f"  {canonical}")
+        for original in group['OriginalContractorName']:
+            print(f"    <- {original!r}")
+
+    write_frames({MAPPING_FILE: mapping})
+    print(f"\nMapping written to {MAPPING_FILE}")
+
+
+if __name__ == "__main__":
+    main()
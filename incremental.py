@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Incremental Bid Data Pipeline
+Keeps a persisted aggregate state of every bid drop ingested so far and, for each
+new batch, re-derives the concentration, dominant-firm and LBE outputs only for
+the consolidated scopes the batch touched.
+
+The state is partitioned by consolidated scope. Each scope's partition holds its
+per (original scope, subcontractor) sums, its distinct-contract count per
+subcontractor and a sorted array of (subcontractor, contract) hashes used to tell
+which of a batch's contracts are new. A batch only classifies its own scope
+values, loads and rewrites the partitions of the scopes it touches, and appends
+its raw contract rows as one file under batches/, so a refresh costs in
+proportion to the batch rather than to the whole history. The contract rows are
+read back only when the consolidation rules change: any scope can then move, so
+every partition is rebuilt and every output re-derived once.
+
+Firm names are resolved as the full pipeline resolves them (firm_resolution.py).
+Pair sums are stored under the raw spellings and mapped to canonical names when
+the outputs are derived; distinct-contract counts are kept per canonical name.
+The state keeps the row count of every raw spelling seen so far, so a cluster's
+canonical name is picked from the whole history, as a full recompute would pick
+it. A batch that changes the canonical name of an already stored spelling
+(a variant overtaking it, or a new name bridging two clusters) rebuilds the
+partitions the same way a rules change does.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_frames
+from bid_data import clean_contract_info, load_contract_info, subcontractor_records
+from firm_resolution import FirmResolver, firm_mapping_from_counts
+from market_concentration import concentration_tables, dominant_subcontractors
+from scope_consolidation import ScopeMatcher, get_default_matcher, save_matcher
+
+
+STATE_DIR = 'aggregate_state'
+OUTPUT_DIR = 'consolidated_analysis'
+# Under the state directory: one pickle per consolidated scope, one Parquet file
+# of contract rows per ingested batch
+PARTITION_DIR = 'partitions'
+BATCH_DIR = 'batches'
+
+PAIR_KEYS = ['OriginalScope', 'SubcontractorName']
+CONTRACT_COLUMNS = PAIR_KEYS + ['ContractID']
+PAIR_SUMS = ['SubAmount', 'LBEAmount', 'Records', 'LBERecords']
+
+# Derived tables kept alongside the state and patched per touched scope
+OUTPUT_FILES = {
+    'scope_sub_agg': 'scope_subcontractor_aggregation_consolidated.csv',
+    'hhi': 'market_concentration_hhi_consolidated.csv',
+    'dominant': 'dominant_subcontractors_consolidated.csv',
+    'lbe': 'lbe_scope_analysis_consolidated.csv',
+}
+
+
+def _empty_partition() -> Dict:
+    return {
+        # Per (original scope, subcontractor): dollar and record sums
+        'pairs': pd.DataFrame({col: pd.Series(dtype='float64' if 'Amount' in col else 'int64') for col in PAIR_SUMS},
+                              index=pd.MultiIndex.from_arrays([[], []], names=PAIR_KEYS)),
+        # Distinct contracts per subcontractor within the consolidated scope
+        'counts': pd.Series(dtype='int64', index=pd.Index([], dtype=object, name='SubcontractorName'),
+                            name='ContractsCount'),
+        # Sorted hashes of the (subcontractor, contract) pairs already counted
+        'keys': np.empty(0, dtype=np.uint64),
+    }
+
+
+def partition_stem(scope: str) -> str:
+    """File name stem of a consolidated scope's partition"""
+    return hashlib.sha256(str(scope).encode()).hexdigest()[:16]
+
+
+def _partition_path(state_dir: str, scope: str) -> str:
+    return os.path.join(state_dir, PARTITION_DIR, f"{partition_stem(scope)}.pkl")
+
+
+def contract_keys(contracts: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of each row's (SubcontractorName, ContractID)"""
+    return pd.util.hash_pandas_object(contracts[['SubcontractorName', 'ContractID']], index=False).to_numpy()
+
+
+def load_state(state_dir: str = STATE_DIR) -> Dict:
+    """
+    Load the state's metadata and derived tables (empty if nothing was ingested yet).
+
+    Scope partitions are read on first use (see load_partitions).
+    """
+    state = {
+        'meta': {'batches': [], 'rules_hash': None, 'scopes': [], 'name_rows': {}, 'firm_names': {}},
+        'state_dir': state_dir,
+        'partitions': {},
+        'dirty': set(),
+        'new_batches': {},
+        'stale': set(),
+    }
+    meta_path = os.path.join(state_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return state
+
+    with open(meta_path) as handle:
+        state['meta'] = json.load(handle)
+    state['meta'].setdefault('scopes', [])
+    for name in OUTPUT_FILES:
+        path = os.path.join(state_dir, f"{name}.parquet")
+        if os.path.exists(path):
+            state[name] = pd.read_parquet(path)
+    # State written before partitioning keeps one unpartitioned file per table;
+    # the next refresh splits it into scope partitions
+    legacy = {table: os.path.join(state_dir, f"{table}.parquet") for table in ['pairs', 'contracts']}
+    if all(os.path.exists(path) for path in legacy.values()):
+        state['legacy'] = {table: pd.read_parquet(path) for table, path in legacy.items()}
+        state['stale'] |= set(legacy.values())
+    return state
+
+
+def load_partitions(state: Dict, scopes: Iterable[str]) -> Dict[str, Dict]:
+    """
+    The partitions of some consolidated scopes, reading each from disk once.
+
+    Returns:
+        Scope -> partition (empty for a scope not seen before)
+    """
+    stored = set(state['meta']['scopes'])
+    for scope in scopes:
+        if scope in state['partitions']:
+            continue
+        if scope in stored:
+            with open(_partition_path(state['state_dir'], scope), 'rb') as handle:
+                state['partitions'][scope] = pickle.load(handle)
+        else:
+            state['partitions'][scope] = _empty_partition()
+    return {scope: state['partitions'][scope] for scope in scopes}
+
+
+def _write_atomic(path: str, write: Callable[[str], None]):
+    write(f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def save_state(state: Dict):
+    """Persist the changed partitions, the new batches' contract rows, the derived tables and the metadata"""
+    state_dir = state['state_dir']
+    os.makedirs(os.path.join(state_dir, PARTITION_DIR), exist_ok=True)
+    os.makedirs(os.path.join(state_dir, BATCH_DIR), exist_ok=True)
+    for scope in state['dirty']:
+        def dump(path: str, partition: Dict = state['partitions'][scope]):
+            with open(path, 'wb') as handle:
+                pickle.dump(partition, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        _write_atomic(_partition_path(state_dir, scope), dump)
+    for key, contracts in state['new_batches'].items():
+        _write_atomic(os.path.join(state_dir, BATCH_DIR, f"{key}.parquet"),
+                      lambda path, frame=contracts: frame.to_parquet(path, index=False))
+    for name in OUTPUT_FILES:
+        if name in state:
+            _write_atomic(os.path.join(state_dir, f"{name}.parquet"),
+                          lambda path, frame=state[name]: frame.to_parquet(path, index=False))
+
+    written = {_partition_path(state_dir, scope) for scope in state['dirty']}
+    for path in state['stale'] - written:
+        if os.path.exists(path):
+            os.remove(path)
+
+    state['meta']['scopes'] = sorted(set(state['meta']['scopes']) | state['dirty'])
+    # Written last: a crash before this point leaves the previous batch list, so
+    # the interrupted batch is simply ingested again
+    with open(os.path.join(state_dir, 'meta.json'), 'w') as handle:
+        json.dump(state['meta'], handle, indent=2)
+    state['dirty'], state['new_batches'], state['stale'] = set(), {}, set()
+
+
+def batch_id(records: pd.DataFrame) -> str:
+    """Content fingerprint of a batch of records, used to make ingestion idempotent"""
+    # Order-independent: the (wrapping) sum of per-row hashes
+    row_hashes = pd.util.hash_pandas_object(records, index=False).to_numpy()
+    return f"{int(row_hashes.sum(dtype=np.uint64)):016x}-{len(records)}"
+
+
+def canonical_subcontractors(state: Dict, names: pd.Series) -> pd.Series:
+    """Canonical firm name of each raw subcontractor spelling under the state's firm names"""
+    return names.map(state['meta'].get('firm_names', {})).fillna(names)
+
+
+def update_firm_names(state: Dict, names: pd.Series, resolver: Optional[FirmResolver] = None) -> bool:
+    """
+    Count a batch's firm name rows into the state and re-derive the canonical names.
+
+    Args:
+        state: Loaded state (modified in place)
+        names: The batch's raw 'Contractor Name' column, prime and subcontract rows alike
+        resolver: Firm name resolver (the cached default when None)
+
+    Returns:
+        Whether a spelling already stored got a different canonical name, in
+        which case the partitions have to be rebuilt (see needs_repartition)
+    """
+    name_rows = state['meta'].setdefault('name_rows', {})
+    for name, rows in names.dropna().astype(str).value_counts().items():
+        name_rows[name] = name_rows.get(name, 0) + int(rows)
+
+    mapping = firm_mapping_from_counts(pd.Series(name_rows, dtype='int64'), 'Contractor Name', resolver)
+    firm_names = dict(zip(mapping['OriginalContractorName'], mapping['Contractor Name']))
+    previous = state['meta'].get('firm_names', {})
+    changed = any(firm_names[name] != canonical for name, canonical in previous.items())
+    state['meta']['firm_names'] = firm_names
+    if changed:
+        state['names_changed'] = True
+    return changed
+
+
+def _fold(state: Dict, pairs: pd.DataFrame, contracts: pd.DataFrame) -> Set[str]:
+    """
+    Add pair sums and distinct contract rows, both carrying ScopeOfWork, to their
+    scopes' partitions; returns the scopes touched.
+
+    Pairs stay under their raw subcontractor names; contracts are counted under
+    the canonical names.
+    """
+    scopes = set(pairs['ScopeOfWork']) | set(contracts['ScopeOfWork'])
+    partitions = load_partitions(state, scopes)
+    contracts = contracts.assign(SubcontractorName=canonical_subcontractors(state, contracts['SubcontractorName']))
+
+    for scope, scope_pairs in pairs.groupby('ScopeOfWork', sort=False):
+        partition = partitions[scope]
+        added = scope_pairs.set_index(PAIR_KEYS)[PAIR_SUMS]
+        merged = partition['pairs'].add(added, fill_value=0)
+        partition['pairs'] = merged.astype({'Records': 'int64', 'LBERecords': 'int64'})
+
+    all_keys = contract_keys(contracts)
+    subs = contracts['SubcontractorName'].to_numpy(dtype=object)
+    for scope, rows in contracts.groupby('ScopeOfWork', sort=False).indices.items():
+        partition = partitions[scope]
+        keys, first = np.unique(all_keys[rows], return_index=True)
+        # Only (subcontractor, contract) pairs this scope has not counted yet add to ContractsCount
+        seen = partition['keys']
+        position = np.minimum(np.searchsorted(seen, keys), max(len(seen) - 1, 0))
+        new = (seen[position] != keys) if len(seen) else np.ones(len(keys), dtype=bool)
+        added = pd.Series(subs[rows[first[new]]]).value_counts()
+        counts = partition['counts'].add(added, fill_value=0).astype('int64')
+        counts.index.name, counts.name = 'SubcontractorName', 'ContractsCount'
+        partition['counts'] = counts
+        # Both sorted and disjoint: insert rather than re-sort the whole history
+        partition['keys'] = np.insert(seen, np.searchsorted(seen, keys[new]), keys[new])
+
+    state['dirty'] |= scopes
+    return scopes
+
+
+def _batch_tables(records: pd.DataFrame):
+    """Per-pair sums and distinct contract rows of a batch of subcontractor records"""
+    batch = records.rename(columns={'ScopeOfWork': 'OriginalScope'})
+    batch = batch.assign(
+        LBEAmount=batch['SubAmount'].where(batch['is_lbe'], 0.0),
+        Records=1,
+        LBERecords=batch['is_lbe'].astype('int64'),
+    )
+    for col in CONTRACT_COLUMNS:
+        batch[col] = batch[col].astype(object)
+    pairs = batch.groupby(PAIR_KEYS, dropna=False, observed=True)[PAIR_SUMS].sum().reset_index()
+    contracts = batch[CONTRACT_COLUMNS].drop_duplicates().reset_index(drop=True)
+    return pairs, contracts
+
+
+def merge_batch(state: Dict, records: pd.DataFrame, matcher: Optional[ScopeMatcher] = None,
+                key: Optional[str] = None) -> Set[str]:
+    """
+    Fold a batch of subcontractor records into the partitions of the scopes it touches.
+
+    Args:
+        state: Loaded state (modified in place)
+        records: Output of bid_data.subcontractor_records
+        matcher: Scope consolidation rules (the default rules when None)
+        key: The batch's batch_id (computed when omitted)
+
+    Returns:
+        Consolidated scopes the batch touched
+    """
+    matcher = matcher or get_default_matcher()
+    pairs, contracts = _batch_tables(records)
+    state['new_batches'][key or batch_id(records)] = contracts
+    return _fold(state,
+                 pairs.assign(ScopeOfWork=matcher.classify(pairs['OriginalScope'])),
+                 contracts.assign(ScopeOfWork=matcher.classify(contracts['OriginalScope'])))
+
+
+def needs_repartition(state: Dict, matcher: ScopeMatcher) -> bool:
+    """
+    Whether the partitions were grouped under other rules or other canonical
+    firm names (or not partitioned, or not firm-resolved, yet)
+    """
+    unresolved = bool(state['meta']['batches']) and 'firm_names' not in state['meta']
+    return ('legacy' in state or state.get('names_changed', False) or unresolved
+            or state['meta'].get('rules_hash') not in (None, matcher.rules_hash))
+
+
+def repartition(state: Dict, matcher: ScopeMatcher, resolver: Optional[FirmResolver] = None):
+    """
+    Re-classify every stored pair and contract row under the matcher's rules and
+    the current canonical firm names, and regroup the partitions.
+    """
+    # Stored partitions plus any merged in memory since the state was loaded
+    scopes = set(state['meta']['scopes']) | set(state['partitions'])
+    partitions = load_partitions(state, scopes)
+    pairs = [partition['pairs'].reset_index() for partition in partitions.values()]
+    contracts = [pd.read_parquet(path) for path in glob.glob(os.path.join(state['state_dir'], BATCH_DIR, '*.parquet'))
+                 if os.path.basename(path)[:-len('.parquet')] not in state['new_batches']]
+    contracts += list(state['new_batches'].values())
+    legacy = state.pop('legacy', None)
+    if legacy is not None:
+        pairs.append(legacy['pairs'])
+        # Kept as a batch file so later rule changes still see these contracts
+        state['new_batches']['legacy'] = legacy['contracts'][CONTRACT_COLUMNS]
+        contracts.append(legacy['contracts'])
+
+    pairs = pd.concat(pairs + [_empty_partition()['pairs'].reset_index()], ignore_index=True)
+    pairs = pairs.astype({col: object for col in PAIR_KEYS}).groupby(
+        PAIR_KEYS, dropna=False, observed=True)[PAIR_SUMS].sum().reset_index()
+    contracts = pd.concat(contracts + [pd.DataFrame(columns=CONTRACT_COLUMNS)], ignore_index=True)
+    contracts = contracts[CONTRACT_COLUMNS].astype(object).drop_duplicates()
+    if 'firm_names' not in state['meta']:
+        # State ingested before firm resolution has no prime rows to count;
+        # its subcontract rows stand in for the name frequencies
+        state['meta']['name_rows'] = {}
+        update_firm_names(state, pairs['SubcontractorName'].repeat(pairs['Records']), resolver)
+
+    state['stale'] |= {_partition_path(state['state_dir'], scope) for scope in scopes}
+    state['meta']['scopes'] = []
+    state['partitions'] = {}
+    state['dirty'] = set()
+    _fold(state,
+          pairs.assign(ScopeOfWork=matcher.classify(pairs['OriginalScope'])),
+          contracts.assign(ScopeOfWork=matcher.classify(contracts['OriginalScope'])))
+    state['meta']['rules_hash'] = matcher.rules_hash
+    state.pop('names_changed', None)
+
+
+def derive_outputs(partitions: Dict[str, Dict], firm_names: Optional[Dict[str, str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Derive the consolidated output tables from some scopes' partitions.
+
+    Args:
+        partitions: Consolidated scope -> partition
+        firm_names: Raw subcontractor spelling -> canonical name (the state's
+            meta['firm_names']); spellings not listed are kept as they are
+    """
+    frames = [partition['pairs'].reset_index().assign(ScopeOfWork=scope) for scope, partition in partitions.items()]
+    pairs = pd.concat(frames, ignore_index=True) if frames else _empty_partition()['pairs'].reset_index().assign(
+        ScopeOfWork=pd.Series(dtype=object))
+    pairs['SubcontractorName'] = pairs['SubcontractorName'].map(firm_names or {}).fillna(pairs['SubcontractorName'])
+    counts = [partition['counts'].reset_index().assign(ScopeOfWork=scope) for scope, partition in partitions.items()]
+    contracts_count = pd.concat(counts, ignore_index=True) if counts else pd.DataFrame(
+        columns=['ScopeOfWork', 'SubcontractorName', 'ContractsCount'])
+
+    scope_sub = pairs.groupby(['ScopeOfWork', 'SubcontractorName'], observed=True).agg(
+        TotalSubAmount=('SubAmount', 'sum')
+    ).reset_index()
+    scope_sub = scope_sub.merge(contracts_count, on=['ScopeOfWork', 'SubcontractorName'], how='left')
+    scope_sub['ContractsCount'] = scope_sub['ContractsCount'].fillna(0).astype('int64')
+
+    scope_sub_agg, hhi = concentration_tables(scope_sub, 'ScopeOfWork')
+    dominant = dominant_subcontractors(scope_sub_agg, 'ScopeOfWork')
+
+    lbe = pairs.groupby('ScopeOfWork', observed=True).agg(
+        LBE_Count=('LBERecords', 'sum'),
+        Total_Subs=('Records', 'sum'),
+        Total_Dollars=('SubAmount', 'sum'),
+        LBE_Dollars=('LBEAmount', 'sum'),
+    ).reset_index()
+    lbe['LBE_Rate'] = lbe['LBE_Count'] / lbe['Total_Subs']
+    # A scope whose subcontracts carry no dollars has a 0 dollar share, as in lbe_analysis.lbe_rates
+    has_dollars = lbe['Total_Dollars'] > 0
+    lbe['LBE_Dollar_Share'] = 0.0
+    lbe.loc[has_dollars, 'LBE_Dollar_Share'] = lbe.loc[has_dollars, 'LBE_Dollars'] / lbe.loc[has_dollars, 'Total_Dollars']
+    lbe = lbe.rename(columns={'ScopeOfWork': 'Scope of Work'})[
+        ['Scope of Work', 'LBE_Count', 'Total_Subs', 'LBE_Rate', 'Total_Dollars', 'LBE_Dollar_Share']
+    ]
+
+    return {'scope_sub_agg': scope_sub_agg, 'hhi': hhi, 'dominant': dominant, 'lbe': lbe}
+
+
+def _sort_output(name: str, table: pd.DataFrame) -> pd.DataFrame:
+    """Order a derived table the way the full pipeline writes it"""
+    if name == 'lbe':
+        return table.sort_values('Total_Dollars', ascending=False, kind='stable')
+    return table.sort_values(['ScopeOfWork', 'SubcontractorName'] if 'SubcontractorName' in table else 'ScopeOfWork',
+                             kind='stable')
+
+
+def refresh_outputs(state: Dict, touched_scopes: Optional[Set[str]] = None,
+                    matcher: Optional[ScopeMatcher] = None) -> Set[str]:
+    """
+    Re-derive the output tables for the consolidated scopes touched by new data.
+
+    Args:
+        state: Loaded state (derived tables are patched in place)
+        touched_scopes: Consolidated scopes that changed, or None to rebuild everything
+        matcher: Scope consolidation rules (the default rules when None)
+
+    Returns:
+        Consolidated scopes that were recomputed
+    """
+    matcher = matcher or get_default_matcher()
+    if needs_repartition(state, matcher):
+        # New rules can move any scope, so every partition and output is derived again
+        repartition(state, matcher)
+        touched_scopes = None
+    save_matcher(matcher)
+
+    rebuild = touched_scopes is None
+    consolidated = set(state['meta']['scopes']) | set(state['partitions']) if rebuild else set(touched_scopes)
+    fresh = derive_outputs(load_partitions(state, consolidated), state['meta'].get('firm_names'))
+
+    for name, table in fresh.items():
+        scope_col = 'Scope of Work' if name == 'lbe' else 'ScopeOfWork'
+        if not rebuild and name in state:
+            kept = state[name][~state[name][scope_col].isin(consolidated)]
+            table = pd.concat([kept, table], ignore_index=True)
+        state[name] = _sort_output(name, table).reset_index(drop=True)
+
+    state['meta']['rules_hash'] = matcher.rules_hash
+    return consolidated
+
+
+def write_outputs(state: Dict, output_dir: str = OUTPUT_DIR):
+    """Write the derived tables as the CSVs the dashboard reads (unchanged ones are skipped)"""
+    write_frames({os.path.join(output_dir, file_name): state[name] for name, file_name in OUTPUT_FILES.items()})
+
+
+def merge_bids(state: Dict, bids: pd.DataFrame, matcher: Optional[ScopeMatcher] = None,
+               resolver: Optional[FirmResolver] = None) -> Optional[Set[str]]:
+    """
+    Count a batch of cleaned bid rows' firm names and fold its subcontract records into the state.
+
+    Args:
+        state: Loaded state (modified in place)
+        bids: Cleaned bid rows (output of bid_data.clean_contract_info)
+        matcher: Scope consolidation rules (the default rules when None)
+        resolver: Firm name resolver (the cached default when None)
+
+    Returns:
+        Consolidated scopes the batch touched, or None if the batch was already ingested
+    """
+    records = subcontractor_records(bids)
+    key = batch_id(records)
+    if key in state['meta']['batches']:
+        return None
+    update_firm_names(state, bids['Contractor Name'], resolver)
+    touched = merge_batch(state, records, matcher, key)
+    state['meta']['batches'].append(key)
+    return touched
+
+
+def ingest_workbooks(paths: List[str], state_dir: str = STATE_DIR, output_dir: str = OUTPUT_DIR) -> Set[str]:
+    """
+    Ingest new bid workbooks into the aggregate state and refresh the outputs.
+
+    Batches already ingested (same content) are skipped. Subcontractor names
+    are resolved to canonical firm names, as in the full pipeline, so the CSVs
+    match what pipeline.py writes for the same workbooks.
+
+    Returns:
+        Consolidated scopes whose outputs were recomputed
+    """
+    state = load_state(state_dir)
+    matcher = get_default_matcher()
+    rules_changed = needs_repartition(state, matcher)
+    if rules_changed:
+        # Partitions follow the consolidated scopes, so regroup them before merging
+        repartition(state, matcher)
+
+    touched: Set[str] = set()
+    for path in paths:
+        bids = clean_contract_info(load_contract_info(path))
+        merged = merge_bids(state, bids, matcher)
+        if merged is None:
+            print(f"  {path}: already ingested, skipping")
+            continue
+        touched |= merged
+        print(f"  {path}: {len(bids):,} bid rows")
+
+    if not touched and not rules_changed:
+        print("No new data; outputs are current")
+        return set()
+
+    recomputed = refresh_outputs(state, None if rules_changed else touched, matcher)
+    save_state(state)
+    write_outputs(state, output_dir)
+    return recomputed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new bid workbooks into the incremental aggregate state")
+    parser.add_argument('workbooks', nargs='*', help='Bid workbooks to ingest')
+    parser.add_argument('--state-dir', default=STATE_DIR, help='Directory holding the aggregate state')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory for the derived CSVs')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Re-derive every output from the state (e.g. after editing the rules)')
+    args = parser.parse_args()
+
+    print("=== INCREMENTAL BID DATA REFRESH ===\n")
+    if args.rebuild:
+        state = load_state(args.state_dir)
+        recomputed = refresh_outputs(state)
+        save_state(state)
+        write_outputs(state, args.output_dir)
+    else:
+        recomputed = ingest_workbooks(args.workbooks, args.state_dir, args.output_dir)
+
+    if recomputed:
+        print(f"\nRecomputed {len(recomputed)} consolidated scopes; outputs written to {args.output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Run Instrumentation
+Opt-in per-section timing, row counts and memory for the analysis scripts, with
+optional cProfile and tracemalloc hooks and a JSON run report written next to
+the output CSVs. When instrumentation is off every call is a no-op.
+
+Enable it with a script's --instrument flag or the BID_INSTRUMENT environment
+variable: "1" (timing, rows, peak RSS), plus "memory" (tracemalloc allocated
+bytes) and/or "profile" (cProfile), e.g. BID_INSTRUMENT=memory,profile.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+ENV_VAR = 'BID_INSTRUMENT'
+REPORT_FILE = 'run_report.json'
+PROFILE_FILE = 'run_profile.prof'
+
+# Functions listed in the report when profiling
+PROFILE_TOP = 25
+
+
+def parse_options(value: Optional[str]) -> Optional[Dict[str, bool]]:
+    """
+    Instrumentation options from a BID_INSTRUMENT / --instrument value.
+
+    Returns:
+        None when instrumentation is off, else a dict with 'memory' and 'profile'
+    """
+    if not value or value.strip().lower() in ('0', 'false', 'off', 'no'):
+        return None
+    flags = {flag.strip().lower() for flag in value.split(',')}
+    return {'memory': 'memory' in flags, 'profile': 'profile' in flags}
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _rows(value) -> Optional[int]:
+    """Row count of a frame (or None for anything without a length)"""
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class Run:
+    """
+    Measurements for one script run.
+
+    Sections are either sequential (section() closes the previous one) or
+    explicit context managers (measure()); each records wall time, rows in/out,
+    peak RSS and, with memory tracing on, bytes allocated.
+    """
+
+    def __init__(self, name: str, memory: bool = False, profile: bool = False):
+        self.name = name
+        self.memory = memory
+        self.sections: List[Dict] = []
+        self._open: Optional[Dict] = None
+        # Open records, outermost first: tracemalloc keeps a single peak, so a
+        # nested section folds the peak so far into each enclosing record
+        self._active: List[Dict] = []
+        self._started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        # Leave tracing running at finish() if someone else started it
+        self._owns_tracing = memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        self._profiler = cProfile.Profile() if profile else None
+        if self._profiler:
+            self._profiler.enable()
+
+    def _begin(self, name: str, rows_in) -> Dict:
+        record = {'name': name, 'rows_in': _rows(rows_in) if rows_in is not None else None, 'rows_out': None,
+                  '_start': time.perf_counter()}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in self._active:
+                outer['_peak'] = max(outer['_peak'], peak)
+            tracemalloc.reset_peak()
+            record['_traced'] = record['_peak'] = current
+            self._active.append(record)
+        return record
+
+    def _end(self, record: Dict, rows_out=None, error: Optional[BaseException] = None):
+        record['seconds'] = time.perf_counter() - record.pop('_start')
+        if rows_out is not None:
+            record['rows_out'] = _rows(rows_out)
+        if error is not None:
+            record['error'] = f"{type(error).__name__}: {error}"
+        record['peak_rss_bytes'] = _peak_rss_bytes()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, record.pop('_peak'))
+            self._active = [outer for outer in self._active if outer is not record]
+            for outer in self._active:
+                outer['_peak'] = max(outer['_peak'], peak)
+            baseline = record.pop('_traced')
+            record['allocated_bytes'] = current - baseline
+            record['peak_allocated_bytes'] = peak - baseline
+        self.sections.append(record)
+
+    def section(self, name: str, rows_in=None):
+        """Start a section, closing the previous one (rows_in: a frame or count)"""
+        self.done()
+        self._open = self._begin(name, rows_in)
+
+    def done(self, rows_out=None, error: Optional[BaseException] = None):
+        """Close the current section, if any (rows_out: a frame or count; error: what it raised)"""
+        if self._open is not None:
+            record, self._open = self._open, None
+            self._end(record, rows_out, error)
+
+    @contextmanager
+    def measure(self, name: str, rows_in=None):
+        """Measure a block; set ['rows_out'] on the yielded record to count its output"""
+        record = self._begin(name, rows_in)
+        error = None
+        try:
+            yield record
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            # A block that raises is still recorded, with the error
+            self._end(record, record['rows_out'], error)
+
+    def _profile_summary(self, output_dir: str) -> Dict:
+        self._profiler.disable()
+        path = os.path.join(output_dir, PROFILE_FILE)
+        self._profiler.dump_stats(path)
+        stats = pstats.Stats(self._profiler, stream=io.StringIO()).sort_stats('cumulative')
+        top = []
+        for func in stats.fcn_list[:PROFILE_TOP]:
+            calls, primitive, tottime, cumtime, _ = stats.stats[func]
+            top.append({'function': pstats.func_std_string(func), 'calls': calls,
+                        'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+        return {'file': path, 'top_cumulative': top}
+
+    def finish(self, output_dir: str) -> str:
+        """
+        Close the open section and write the JSON run report to output_dir.
+
+        Call it from a finally block so a run that raises still gets its report;
+        close the failing section first with done(error=...) to record the error.
+
+        Returns:
+            Path of the report
+        """
+        self.done()
+        os.makedirs(output_dir, exist_ok=True)
+        report = {
+            'run': self.name,
+            'started': self._started.isoformat(timespec='seconds'),
+            'total_seconds': time.perf_counter() - self._start,
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'memory_tracing': self.memory,
+            'failed': any('error' in section for section in self.sections),
+            'sections': self.sections,
+        }
+        if self._profiler:
+            report['profile'] = self._profile_summary(output_dir)
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+        path = os.path.join(output_dir, REPORT_FILE)
+        with open(path, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Run report written to {path}")
+        return path
+
+
+class _NullRun:
+    """Stand-in used when instrumentation is off: every call does nothing"""
+
+    sections: List[Dict] = []
+
+    def section(self, name: str, rows_in=None):
+        pass
+
+    def done(self, rows_out=None, error: Optional[BaseException] = None):
+        pass
+
+    @contextmanager
+    def measure(self, name: str, rows_in=None):
+        yield {}
+
+    def finish(self, output_dir: str) -> Optional[str]:
+        return None
+
+
+NULL_RUN = _NullRun()
+
+
+def start_run(name: str, instrument: Optional[str] = None):
+    """
+    Begin instrumenting a run.
+
+    Args:
+        name: Run name recorded in the report
+        instrument: --instrument value; falls back to the BID_INSTRUMENT variable
+
+    Returns:
+        A Run, or a no-op stand-in when instrumentation is off
+    """
+    options = parse_options(instrument if instrument is not None else os.environ.get(ENV_VAR))
+    if options is None:
+        return NULL_RUN
+    return Run(name, **options)
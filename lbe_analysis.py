@@ -4,55 +4,235 @@ Analyzes Local Business Enterprise (LBE) participation patterns to identify
 how to better help LBE firms compete against dominant subcontractors.
 """
 
+import os
 import pandas as pd
 import numpy as np
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from artifacts import ArtifactWriter
+from bid_data import load_bid_data
+from contract_facts import contract_facts, requirement_attainment, save_contract_facts
+from firm_resolution import resolve_firm_names
+from instrumentation import start_run
 
-def analyze_lbe_competition(file_path: str):
+
+def lbe_breakdown(subs: pd.DataFrame, by, amount_col: str = 'SUB $$ ',
+                  extra: Optional[Dict[str, Tuple[str, str]]] = None) -> pd.DataFrame:
+    """
+    LBE vs non-LBE counts and dollars for every group in a single grouped pass.
+
+    Args:
+        subs: Subcontractor rows with an 'is_lbe' flag
+        by: Column name(s) to group on (e.g. 'Scope of Work', 'Contractor Name')
+        amount_col: Dollar column to total
+        extra: Additional named aggregations, as accepted by DataFrame.groupby().agg
+
+    Returns:
+        DataFrame indexed by group (in order of first appearance) with LBE_Count,
+        NonLBE_Count, Total_Subs, LBE_Rate, Total_Dollars, LBE_Dollars,
+        LBE_Dollar_Share, Has_LBE and Has_NonLBE, plus any extra columns
+    """
+    frame = subs.assign(_lbe_dollars=subs[amount_col].where(subs['is_lbe'], 0.0))
+    breakdown = frame.groupby(by, sort=False, observed=True).agg(
+        LBE_Count=('is_lbe', 'sum'),
+        Total_Subs=('is_lbe', 'size'),
+        Total_Dollars=(amount_col, 'sum'),
+        LBE_Dollars=('_lbe_dollars', 'sum'),
+        **(extra or {})
+    )
+    return lbe_rates(breakdown)
+
+
+def lbe_rates(breakdown: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add NonLBE_Count, LBE_Rate, LBE_Dollar_Share, Has_LBE and Has_NonLBE to a table
+    of per-group LBE_Count, Total_Subs, Total_Dollars and LBE_Dollars (in place).
+    """
+    breakdown['NonLBE_Count'] = breakdown['Total_Subs'] - breakdown['LBE_Count']
+    breakdown['LBE_Rate'] = breakdown['LBE_Count'] / breakdown['Total_Subs']
+    has_dollars = breakdown['Total_Dollars'] > 0
+    breakdown['LBE_Dollar_Share'] = 0.0
+    breakdown.loc[has_dollars, 'LBE_Dollar_Share'] = (
+        breakdown.loc[has_dollars, 'LBE_Dollars'] / breakdown.loc[has_dollars, 'Total_Dollars']
+    )
+    breakdown['Has_LBE'] = breakdown['LBE_Count'] > 0
+    breakdown['Has_NonLBE'] = breakdown['NonLBE_Count'] > 0
+    return breakdown
+
+
+def competitive_scopes(scope_breakdown: pd.DataFrame, min_value: float = 100000) -> pd.DataFrame:
+    """
+    Scopes where LBE and non-LBE firms compete directly.
+    
+    Args:
+        scope_breakdown: Output of lbe_breakdown by scope
+        min_value: Minimum total subcontract dollars for a scope to count
+    
+    Returns:
+        DataFrame with Scope, Total_Value, LBE_Share, LBE_Count and NonLBE_Count,
+        sorted by Total_Value descending
+    """
+    competitive = scope_breakdown[
+        scope_breakdown['Has_LBE'] & scope_breakdown['Has_NonLBE'] &
+        (scope_breakdown['Total_Dollars'] > min_value)
+    ]
+    competitive = pd.DataFrame({
+        'Scope': competitive.index,
+        'Total_Value': competitive['Total_Dollars'].to_numpy(),
+        'LBE_Share': competitive['LBE_Dollar_Share'].to_numpy(),
+        'LBE_Count': competitive['LBE_Count'].to_numpy(),
+        'NonLBE_Count': competitive['NonLBE_Count'].to_numpy()
+    })
+    return competitive.sort_values('Total_Value', ascending=False)
+
+
+def lbe_subcontracts(df: pd.DataFrame) -> pd.DataFrame:
+    """Subcontractor rows with a positive subcontract amount (the LBE analysis population)"""
+    return df[(df['is_sub'] == True) & (df['SUB $$ '] > 0) & (df['SUB $$ '].notna())].copy()
+
+
+def lbe_tables(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Build the LBE analysis tables from the cleaned bid rows.
+    
+    Args:
+        df: Output of bid_data.load_bid_data
+    
+    Returns:
+        Dictionary with scope_analysis, firm_analysis, competitive_scopes and
+        lbe_comparison (the tables written to lbe_analysis/), plus the underlying
+        per-scope scope_breakdown
+    """
+    subs = lbe_subcontracts(df)
+    lbe_subs = subs[subs['is_lbe'] == True]
+    non_lbe_subs = subs[subs['is_lbe'] == False]
+    
+    # One grouped pass serves the scope table and the competitive scope analysis
+    scope_breakdown = lbe_breakdown(subs, 'Scope of Work')
+    
+    scope_analysis = scope_breakdown.sort_index()[
+        ['LBE_Count', 'Total_Subs', 'LBE_Rate', 'Total_Dollars']
+    ].round(3)
+    scope_analysis['LBE_Dollar_Share'] = scope_breakdown['LBE_Dollar_Share']
+    
+    # Sort by total dollars descending
+    scope_analysis = scope_analysis.sort_values('Total_Dollars', ascending=False)
+    
+    # Firms by subcontract dollars
+    firm_analysis = lbe_breakdown(subs, 'Contractor Name', extra={
+        'Is_LBE': ('is_lbe', 'first'),
+        'Scope_Count': ('Scope of Work', 'nunique')
+    }).sort_index()[['Total_Dollars', 'Is_LBE', 'Scope_Count']].sort_values('Total_Dollars', ascending=False)
+    
+    # Scopes where LBE and non-LBE compete directly
+    competitive_df = competitive_scopes(scope_breakdown)
+    
+    # LBE vs Non-LBE comparison
+    lbe_sub_dollars = lbe_subs['SUB $$ '].sum()
+    total_sub_dollars = subs['SUB $$ '].sum()
+    lbe_comparison = pd.DataFrame({
+        'Metric': [
+            'Number of Subcontractors',
+            'Total Dollar Volume',
+            'Average Contract Size',
+            'Number of Scopes Served',
+            'Market Share (%)'
+        ],
+        'LBE_Firms': [
+            len(lbe_subs),
+            lbe_sub_dollars,
+            lbe_subs['SUB $$ '].mean(),
+            lbe_subs['Scope of Work'].nunique(),
+            lbe_sub_dollars / total_sub_dollars * 100
+        ],
+        'Non_LBE_Firms': [
+            len(non_lbe_subs),
+            total_sub_dollars - lbe_sub_dollars,
+            non_lbe_subs['SUB $$ '].mean(),
+            non_lbe_subs['Scope of Work'].nunique(),
+            (total_sub_dollars - lbe_sub_dollars) / total_sub_dollars * 100
+        ]
+    })
+    
+    return {
+        'scope_analysis': scope_analysis,
+        'firm_analysis': firm_analysis,
+        'competitive_scopes': competitive_df,
+        'lbe_comparison': lbe_comparison,
+        'scope_breakdown': scope_breakdown,
+    }
+
+
+def save_lbe_tables(tables: Dict[str, pd.DataFrame], output_dir: str = 'lbe_analysis',
+                    writer: Optional[ArtifactWriter] = None) -> List[str]:
+    """
+    Write the LBE analysis tables as CSVs.
+    
+    Args:
+        tables: Output of lbe_tables
+        output_dir: Directory for the CSVs
+        writer: Queue the CSVs on this writer instead of writing them now
+    
+    Returns:
+        Paths written
+    """
+    own_writer = writer is None
+    writer = writer or ArtifactWriter()
+    paths = {
+        'scope_analysis': os.path.join(output_dir, 'lbe_scope_analysis.csv'),
+        'firm_analysis': os.path.join(output_dir, 'firm_analysis.csv'),
+        'competitive_scopes': os.path.join(output_dir, 'competitive_scopes.csv'),
+        'lbe_comparison': os.path.join(output_dir, 'lbe_vs_nonlbe_comparison.csv'),
+    }
+    # Scope and firm tables keep their index (the scope / firm name)
+    writer.add(paths['scope_analysis'], tables['scope_analysis'], index=True)
+    writer.add(paths['firm_analysis'], tables['firm_analysis'], index=True)
+    writer.add(paths['competitive_scopes'], tables['competitive_scopes'])
+    writer.add(paths['lbe_comparison'], tables['lbe_comparison'])
+    if own_writer:
+        writer.write()
+    return list(paths.values())
+
+
+def analyze_lbe_competition(file_path: str, instrument: Optional[str] = None):
     """
     Comprehensive analysis of LBE participation and competitiveness.
+    
+    Args:
+        file_path: Bid workbook, or a directory / glob pattern of workbooks
+        instrument: Instrumentation options (see instrumentation.py); off by default
     """
     print("=== LBE COMPETITION ANALYSIS ===\n")
-    
-    # Load and clean data
-    df = pd.read_excel(file_path, sheet_name='Contract Info')
-    
-    # Clean monetary columns
-    def clean_currency(value):
-        if pd.isna(value):
-            return np.nan
-        if isinstance(value, (int, float)):
-            return float(value)
-        str_val = str(value).strip()
-        cleaned = re.sub(r'[$,()%]', '', str_val)
-        if str_val.startswith('(') and str_val.endswith(')'):
-            cleaned = '-' + cleaned
-        try:
-            return float(cleaned) if cleaned else np.nan
-        except (ValueError, TypeError):
-            return np.nan
-    
-    # Clean monetary columns
-    for col in ['Contract Award Amount (Awarded)', 'SUB $$ ', 'Engineers Estimate']:
-        if col in df.columns:
-            df[col] = df[col].apply(clean_currency)
-    
-    # Create role flags
-    df['is_prime'] = df['Sub/Prime'].str.contains('Prime', case=False, na=False)
-    df['is_sub'] = df['Sub/Prime'].str.contains('Sub', case=False, na=False)
-    
-    # Clean LBE status
-    df['is_lbe'] = df['LBE? '].str.contains('Y', case=False, na=False)
-    df['lbe_requirement'] = pd.to_numeric(df['LBE Requirement'], errors='coerce')
+    run = start_run('lbe_analysis', instrument)
+    try:
+        return _analyze_lbe_competition(file_path, run)
+    except Exception as e:
+        run.done(error=e)
+        raise
+    finally:
+        run.finish('lbe_analysis')
+
+
+def _analyze_lbe_competition(file_path: str, run) -> Dict[str, pd.DataFrame]:
+    """Body of analyze_lbe_competition, reporting its sections to run"""
+    # Load and clean data (served from the columnar cache after the first run).
+    # A directory or glob of workbooks is loaded in parallel and combined.
+    # Spelling variants of a firm's name are merged (see firm_resolution.py).
+    run.section('load')
+    df = resolve_firm_names(load_bid_data(file_path))
+    run.done(rows_out=df)
+    run.section('lbe tables', rows_in=df)
+    tables = lbe_tables(df)
+    run.done(rows_out=tables['scope_analysis'])
     
     # Analyze LBE participation by role
+    run.section('1. participation by role', rows_in=df)
     print("1. LBE PARTICIPATION BY ROLE")
     print("=" * 40)
     
-    role_analysis = df.groupby(['Sub/Prime', 'is_lbe']).size().unstack(fill_value=0)
-    role_totals = df.groupby('Sub/Prime').size()
+    role_analysis = df.groupby(['Sub/Prime', 'is_lbe'], observed=True).size().unstack(fill_value=0)
+    role_totals = df.groupby('Sub/Prime', observed=True).size()
     
     print("LBE Participation Rates by Role:")
     for role in role_analysis.index:
@@ -63,11 +243,13 @@ def analyze_lbe_competition(file_path: str):
             print(f"  {role}: {lbe_count}/{total_count} ({lbe_rate:.1f}%)")
     
     # Analyze LBE success in subcontracting
+    run.done(rows_out=role_analysis)
+    run.section('2. subcontractor analysis', rows_in=df)
     print(f"\n2. LBE SUBCONTRACTOR ANALYSIS")
     print("=" * 40)
     
     # Get subcontractor data
-    subs = df[(df['is_sub'] == True) & (df['SUB $$ '] > 0) & (df['SUB $$ '].notna())].copy()
+    subs = lbe_subcontracts(df)
     
     lbe_subs = subs[subs['is_lbe'] == True]
     non_lbe_subs = subs[subs['is_lbe'] == False]
@@ -90,27 +272,12 @@ def analyze_lbe_competition(file_path: str):
     print(f"Size Gap: {avg_non_lbe_contract/avg_lbe_contract:.1f}x larger for non-LBE")
     
     # Analyze by scope
+    run.done(rows_out=subs)
+    run.section('3. participation by scope', rows_in=subs)
     print(f"\n3. LBE PARTICIPATION BY SCOPE")
     print("=" * 40)
     
-    scope_analysis = subs.groupby('Scope of Work').agg({
-        'is_lbe': ['sum', 'count', 'mean'],
-        'SUB $$ ': ['sum']
-    }).round(3)
-    
-    scope_analysis.columns = ['LBE_Count', 'Total_Subs', 'LBE_Rate', 'Total_Dollars']
-    scope_analysis['LBE_Dollar_Share'] = 0.0
-    
-    # Calculate LBE dollar share by scope
-    for scope in scope_analysis.index:
-        scope_subs = subs[subs['Scope of Work'] == scope]
-        lbe_dollars = scope_subs[scope_subs['is_lbe'] == True]['SUB $$ '].sum()
-        total_dollars = scope_subs['SUB $$ '].sum()
-        if total_dollars > 0:
-            scope_analysis.loc[scope, 'LBE_Dollar_Share'] = lbe_dollars / total_dollars
-    
-    # Sort by total dollars descending
-    scope_analysis = scope_analysis.sort_values('Total_Dollars', ascending=False)
+    scope_analysis = tables['scope_analysis']
     
     print("Top 10 Scopes by Dollar Value - LBE Performance:")
     print("Scope | Total $ | LBE Rate | LBE $ Share")
@@ -119,6 +286,8 @@ def analyze_lbe_competition(file_path: str):
         print(f"{scope[:30]:<30} | ${row['Total_Dollars']:>8,.0f} | {row['LBE_Rate']:>6.1%} | {row['LBE_Dollar_Share']:>8.1%}")
     
     # Identify LBE opportunities
+    run.done(rows_out=scope_analysis)
+    run.section('4. opportunity analysis', rows_in=scope_analysis)
     print(f"\n4. LBE OPPORTUNITY ANALYSIS")
     print("=" * 40)
     
@@ -136,17 +305,13 @@ def analyze_lbe_competition(file_path: str):
         print(f"{scope[:35]:<35} | ${row['Total_Dollars']:>8,.0f} | {row['LBE_Rate']:>6.1%} | {row['Total_Subs']:>8.0f}")
     
     # Analyze against dominant firms
+    run.done(rows_out=low_lbe_high_value)
+    run.section('5. dominant firms', rows_in=subs)
     print(f"\n5. LBE vs DOMINANT FIRMS ANALYSIS")
     print("=" * 40)
     
     # Identify dominant non-LBE firms
-    firm_analysis = subs.groupby('Contractor Name').agg({
-        'SUB $$ ': 'sum',
-        'is_lbe': 'first',
-        'Scope of Work': 'nunique'
-    }).sort_values('SUB $$ ', ascending=False)
-    
-    firm_analysis.columns = ['Total_Dollars', 'Is_LBE', 'Scope_Count']
+    firm_analysis = tables['firm_analysis']
     
     top_non_lbe = firm_analysis[firm_analysis['Is_LBE'] == False].head(10)
     top_lbe = firm_analysis[firm_analysis['Is_LBE'] == True].head(10)
@@ -160,28 +325,13 @@ def analyze_lbe_competition(file_path: str):
         print(f"  {firm}: ${row['Total_Dollars']:,.0f} across {row['Scope_Count']} scopes")
     
     # Scope overlap analysis
+    run.done(rows_out=firm_analysis)
+    run.section('6. competitive scopes', rows_in=tables['scope_breakdown'])
     print(f"\n6. COMPETITIVE SCOPE ANALYSIS")
     print("=" * 40)
     
     # Find scopes where LBE and non-LBE compete directly
-    competitive_scopes = []
-    for scope in subs['Scope of Work'].unique():
-        scope_data = subs[subs['Scope of Work'] == scope]
-        has_lbe = (scope_data['is_lbe'] == True).any()
-        has_non_lbe = (scope_data['is_lbe'] == False).any()
-        total_value = scope_data['SUB $$ '].sum()
-        
-        if has_lbe and has_non_lbe and total_value > 100000:
-            lbe_share = scope_data[scope_data['is_lbe'] == True]['SUB $$ '].sum() / total_value
-            competitive_scopes.append({
-                'Scope': scope,
-                'Total_Value': total_value,
-                'LBE_Share': lbe_share,
-                'LBE_Count': (scope_data['is_lbe'] == True).sum(),
-                'NonLBE_Count': (scope_data['is_lbe'] == False).sum()
-            })
-    
-    competitive_df = pd.DataFrame(competitive_scopes).sort_values('Total_Value', ascending=False)
+    competitive_df = tables['competitive_scopes']
     
     print(f"Scopes with Direct LBE vs Non-LBE Competition (Value > $100K):")
     print("Scope | Value | LBE Share | LBE Firms | Non-LBE Firms")
@@ -190,75 +340,80 @@ def analyze_lbe_competition(file_path: str):
         print(f"{row['Scope'][:25]:<25} | ${row['Total_Value']:>8,.0f} | {row['LBE_Share']:>7.1%} | {row['LBE_Count']:>8.0f} | {row['NonLBE_Count']:>12.0f}")
     
     # LBE Requirements vs Performance
+    run.done(rows_out=competitive_df)
+    run.section('7. requirement vs performance', rows_in=df)
     print(f"\n7. LBE REQUIREMENT vs PERFORMANCE")
     print("=" * 40)
     
-    # Analyze contracts with LBE requirements
-    contracts_with_req = df[df['lbe_requirement'] > 0].copy()
+    # One row per contract: the award joined to the winning bid and its listed subs
+    contracts, bid_facts = contract_facts(df)
+    req_performance = requirement_attainment(contracts)
     
-    req_performance = contracts_with_req.groupby('lbe_requirement').agg({
-        'is_lbe': 'mean',
-        'Contract Award Amount (Awarded)': 'mean'
-    }).round(3)
-    
-    print("LBE Requirements vs Actual LBE Participation:")
-    print("Requirement | Actual LBE Rate | Avg Contract Size")
-    print("-" * 55)
+    print("LBE Requirements vs Winning-Bid LBE Subcontracting (share of award):")
+    print("Requirement | Contracts | Avg LBE Attainment | Met | Avg Contract Size")
+    print("-" * 75)
     for req, row in req_performance.iterrows():
-        print(f"{req:>10.0%} | {row['is_lbe']:>13.1%} | ${row['Contract Award Amount (Awarded)']:>14,.0f}")
+        print(f"{req:>10.0%} | {row['Contracts']:>9.0f} | {row['AvgLBEAttainment']:>18.1%} | "
+              f"{row['MetRate']:>5.0%} | ${row['AvgAward']:>14,.0f}")
     
-    # Save analysis results
-    print(f"\n8. SAVING LBE ANALYSIS RESULTS")
+    # Award and bids against the Engineers Estimate
+    run.done(rows_out=req_performance)
+    run.section('8. bid vs estimate', rows_in=contracts)
+    print(f"\n8. BID vs ENGINEERS ESTIMATE")
     print("=" * 40)
     
-    import os
-    os.makedirs('lbe_analysis', exist_ok=True)
-    
-    # Save detailed data
-    scope_analysis.to_csv('lbe_analysis/lbe_scope_analysis.csv')
-    firm_analysis.to_csv('lbe_analysis/firm_analysis.csv')
-    competitive_df.to_csv('lbe_analysis/competitive_scopes.csv', index=False)
+    estimated = contracts[contracts['EngineersEstimate'].notna()]
+    print(f"Contracts with an estimate: {len(estimated)} of {len(contracts)}")
+    if len(estimated):
+        print(f"Award vs estimate:    median {estimated['AwardVsEstimate'].median():+.1%}, "
+              f"range {estimated['AwardVsEstimate'].min():+.1%} to {estimated['AwardVsEstimate'].max():+.1%}")
+        print(f"Awards under estimate: {(estimated['AwardVsEstimate'] < 0).mean():.1%}")
+    print(f"Subcontracted share of award: median {contracts['SubShareOfAward'].median():.1%}")
+    
+    sub_share = bid_facts.groupby(level='PrimeName').agg(
+        Bids=('BidAmount', 'size'),
+        Wins=('Awarded', 'sum'),
+        AvgSubShare=('SubShareOfBid', 'mean'),
+        AvgLBEShare=('LBEShareOfBid', 'mean'),
+    ).sort_values('Bids', ascending=False)
+    print("\nSubcontracted Share of Bid by Prime (most active):")
+    print("Prime | Bids | Wins | Avg Sub Share | Avg LBE Sub Share")
+    print("-" * 75)
+    for prime, row in sub_share.head(10).iterrows():
+        print(f"{prime[:30]:<30} | {row['Bids']:>4.0f} | {row['Wins']:>4.0f} | "
+              f"{row['AvgSubShare']:>13.1%} | {row['AvgLBEShare']:>17.1%}")
     
-    # Create LBE vs Non-LBE comparison
-    lbe_comparison = pd.DataFrame({
-        'Metric': [
-            'Number of Subcontractors',
-            'Total Dollar Volume',
-            'Average Contract Size',
-            'Number of Scopes Served',
-            'Market Share (%)'
-        ],
-        'LBE_Firms': [
-            len(lbe_subs),
-            lbe_sub_dollars,
-            avg_lbe_contract,
-            lbe_subs['Scope of Work'].nunique(),
-            lbe_sub_dollars / total_sub_dollars * 100
-        ],
-        'Non_LBE_Firms': [
-            len(non_lbe_subs),
-            total_sub_dollars - lbe_sub_dollars,
-            avg_non_lbe_contract,
-            non_lbe_subs['Scope of Work'].nunique(),
-            (total_sub_dollars - lbe_sub_dollars) / total_sub_dollars * 100
-        ]
-    })
+    # Save analysis results
+    run.done(rows_out=sub_share)
+    run.section('9. save results')
+    print(f"\n9. SAVING LBE ANALYSIS RESULTS")
+    print("=" * 40)
     
-    lbe_comparison.to_csv('lbe_analysis/lbe_vs_nonlbe_comparison.csv', index=False)
+    save_contract_facts(contracts, bid_facts)
+    save_lbe_tables(tables)
+    run.done()
     
     print("Saved analysis files:")
     print("  - lbe_analysis/lbe_scope_analysis.csv")
     print("  - lbe_analysis/firm_analysis.csv") 
     print("  - lbe_analysis/competitive_scopes.csv")
     print("  - lbe_analysis/lbe_vs_nonlbe_comparison.csv")
+    print("  - lbe_analysis/contract_facts.csv")
+    print("  - lbe_analysis/bid_facts.csv")
     
-    return {
-        'scope_analysis': scope_analysis,
-        'firm_analysis': firm_analysis,
-        'competitive_scopes': competitive_df,
-        'lbe_comparison': lbe_comparison
-    }
+    results = {name: tables[name] for name in ['scope_analysis', 'firm_analysis', 'competitive_scopes', 'lbe_comparison']}
+    results['contract_facts'] = contracts
+    return results
 
 
 if __name__ == "__main__":
-    results = analyze_lbe_competition("2020BidData.xlsx")
+    import argparse
+    parser = argparse.ArgumentParser(description="LBE competition analysis")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--instrument', nargs='?', const='1', default=None,
+                        help='Write lbe_analysis/run_report.json with per-section timing, rows and memory; '
+                             'add "memory" and/or "profile" (e.g. --instrument memory,profile) for '
+                             'tracemalloc and cProfile')
+    args = parser.parse_args()
+    results = analyze_lbe_competition(args.file_path, instrument=args.instrument)
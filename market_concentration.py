@@ -0,0 +1,355 @@
+"""
+Market Concentration Metrics
+Vectorized market shares and Herfindahl-Hirschman Index (HHI) per market, where a
+market is any combination of grouping keys (scope, scope x year, scope x department),
+plus bootstrap confidence intervals for the HHI.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+# HHI thresholds (points on the 0-10,000 scale)
+UNCONCENTRATED_BELOW = 1500
+HIGHLY_CONCENTRATED_ABOVE = 2500
+
+CONCENTRATION_LEVELS = ["Unconcentrated", "Moderately Concentrated", "Highly Concentrated"]
+
+# Default grid for dominance_sweep: share thresholds and top-k concentration ratios (CR-k)
+DOMINANCE_THRESHOLDS = [0.10, 0.15, 0.20, 0.25, 0.33, 0.50]
+CONCENTRATION_RATIOS = [1, 2, 4]
+
+BOOTSTRAP_RESAMPLES = 2000
+# Cap on the elements of one resample x contract (or cell) matrix; keeping it cache-sized is
+# faster than drawing every resample at once
+BOOTSTRAP_CHUNK_ELEMENTS = 250_000
+
+Keys = Union[str, Sequence[str]]
+
+
+def classify_concentration(hhi: float) -> str:
+    """Classify a single HHI value into a concentration level"""
+    if hhi < UNCONCENTRATED_BELOW:
+        return "Unconcentrated"
+    elif hhi <= HIGHLY_CONCENTRATED_ABOVE:
+        return "Moderately Concentrated"
+    else:
+        return "Highly Concentrated"
+
+
+def classify_concentration_series(hhi: pd.Series) -> pd.Series:
+    """Vectorized classify_concentration for a column of HHI values"""
+    values = hhi.to_numpy(dtype='float64')
+    levels = np.select(
+        [values < UNCONCENTRATED_BELOW, values <= HIGHLY_CONCENTRATED_ABOVE],
+        ["Unconcentrated", "Moderately Concentrated"],
+        default="Highly Concentrated"
+    )
+    return pd.Series(levels, index=hhi.index)
+
+
+def _as_list(keys: Keys) -> List[str]:
+    return [keys] if isinstance(keys, str) else list(keys)
+
+
+def group_codes(df: pd.DataFrame, keys: Keys) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Integer-code the markets of a frame.
+
+    Returns:
+        Tuple of (code per row, frame of market keys in code order). Markets are
+        sorted by key, matching DataFrame.groupby's default ordering.
+    """
+    grouped = df.groupby(_as_list(keys), sort=True, dropna=False, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    markets = grouped.size().index.to_frame(index=False)
+    return codes, markets
+
+
+def aggregate_scope_subcontractors(records: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                                   firm_col: str = 'SubcontractorName', amount_col: str = 'SubAmount',
+                                   contract_col: str = 'ContractID') -> pd.DataFrame:
+    """
+    Collapse subcontractor records to one row per market and firm.
+
+    Returns:
+        DataFrame with the market keys, firm, TotalSubAmount and ContractsCount
+        (distinct contracts)
+    """
+    agg = records.groupby(_as_list(keys) + [firm_col], observed=True).agg({
+        amount_col: 'sum',
+        contract_col: 'nunique'
+    }).reset_index()
+    return agg.rename(columns={amount_col: 'TotalSubAmount', contract_col: 'ContractsCount'})
+
+
+def concentration_tables(agg: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                         amount_col: str = 'TotalSubAmount') -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Market shares and HHI for every market from a single coding of the frame.
+
+    Each market is integer-coded once; totals, shares and sum-of-squared-shares
+    are then bincount reductions over those codes, with no per-market Python
+    calls or intermediate merges.
+
+    Args:
+        agg: One row per market and firm (see aggregate_scope_subcontractors)
+        keys: Column(s) defining a market
+        amount_col: Dollar column the shares are computed from
+
+    Returns:
+        Tuple of (agg with ScopeTotalSub and ShareOfScope added, market table with
+        the market keys, ScopeHHI, NumSubcontractors, ScopeTotalSub and
+        ConcentrationLevel in key order)
+    """
+    codes, markets = group_codes(agg, keys)
+    amounts = agg[amount_col].to_numpy(dtype='float64')
+    n_markets = len(markets)
+
+    totals = np.bincount(codes, weights=amounts, minlength=n_markets)
+    # A market with no dollars has undefined shares and an HHI of 0, as a pandas
+    # sum of its NaN squared shares gives
+    has_dollars = totals[codes] > 0
+    shares = np.divide(amounts, totals[codes], out=np.full(len(amounts), np.nan), where=has_dollars)
+
+    with_shares = agg.copy()
+    with_shares['ScopeTotalSub'] = totals[codes]
+    with_shares['ShareOfScope'] = shares
+
+    concentration = markets.copy()
+    concentration['ScopeHHI'] = np.bincount(codes, weights=np.where(has_dollars, shares, 0.0) ** 2,
+                                            minlength=n_markets) * 10000
+    concentration['NumSubcontractors'] = np.bincount(codes, minlength=n_markets)
+    concentration['ScopeTotalSub'] = totals
+    concentration['ConcentrationLevel'] = classify_concentration_series(concentration['ScopeHHI'])
+    return with_shares, concentration
+
+
+def market_concentration(agg: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                         amount_col: str = 'TotalSubAmount') -> pd.DataFrame:
+    """HHI table only; see concentration_tables"""
+    return concentration_tables(agg, keys, amount_col)[1]
+
+
+def dominant_subcontractors(with_shares: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                            threshold: float = 0.25) -> pd.DataFrame:
+    """
+    Firms holding at least `threshold` of their market, ranked within the market.
+
+    Args:
+        with_shares: Output of concentration_tables (needs ShareOfScope)
+        keys: Column(s) defining a market
+        threshold: Minimum ShareOfScope to count as dominant
+
+    Returns:
+        The qualifying rows with a dense RankInScope (1 = largest share)
+    """
+    dominant = with_shares[with_shares['ShareOfScope'] >= threshold].copy()
+    dominant['RankInScope'] = dominant.groupby(_as_list(keys), observed=True)['ShareOfScope'].rank(
+        method='dense', ascending=False
+    )
+    return dominant
+
+
+def rank_within_markets(with_shares: pd.DataFrame, keys: Keys = 'ScopeOfWork') -> pd.DataFrame:
+    """
+    Every market's firms sorted by share, largest first, from one sort of the frame.
+
+    Dominant positions at any threshold and top-k lists are then prefixes of each
+    market's run of rows, so they are slices rather than new filter-and-rank passes.
+
+    Args:
+        with_shares: Output of concentration_tables (needs ShareOfScope)
+        keys: Column(s) defining a market
+
+    Returns:
+        with_shares ordered by market and descending share, with RankInScope (dense,
+        as dominant_subcontractors), PositionInScope (1..n; ties in firm order) and
+        CumulativeShare (share held by this firm and every firm above it; 0 in a
+        market with no dollars)
+    """
+    codes, _ = group_codes(with_shares, keys)
+    shares = with_shares['ShareOfScope'].to_numpy(dtype='float64')
+    order = np.lexsort((-shares, codes))
+    codes, shares = codes[order], shares[order]
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    run_start = np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    new_value = np.r_[True, (codes[1:] != codes[:-1]) | (shares[1:] != shares[:-1])]
+    value_number = np.cumsum(new_value)
+    # Shares of a market with no dollars are NaN; they add nothing, rather than
+    # poisoning the running sum for every market sorted after it
+    filled = np.nan_to_num(shares, nan=0.0)
+    cumulative = np.cumsum(filled)
+
+    ranked = with_shares.iloc[order].reset_index(drop=True)
+    ranked['RankInScope'] = value_number - value_number[run_start] + 1
+    ranked['PositionInScope'] = np.arange(len(codes)) - run_start + 1
+    ranked['CumulativeShare'] = cumulative - (cumulative[run_start] - filled[run_start])
+    return ranked
+
+
+def dominance_sweep(ranked: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                    thresholds: Sequence[float] = DOMINANCE_THRESHOLDS,
+                    ratios: Sequence[int] = CONCENTRATION_RATIOS) -> pd.DataFrame:
+    """
+    Dominant-firm counts at a grid of thresholds and CR-k ratios per market, in one pass.
+
+    Args:
+        ranked: Output of rank_within_markets
+        keys: Column(s) defining a market
+        thresholds: Minimum shares for a dominant firm
+        ratios: k values of the CR-k concentration ratios (combined share of the top k firms)
+
+    Returns:
+        DataFrame per market with NumSubcontractors, CR<k> for each ratio, and
+        Dominant_<pct> (dominant firm count) and DominantShare_<pct> (their
+        combined share) for each threshold, e.g. Dominant_25 for 0.25
+    """
+    key_list = _as_list(keys)
+    starts = np.flatnonzero(ranked['PositionInScope'].to_numpy() == 1)
+    counts = np.diff(np.r_[starts, len(ranked)])
+    shares = ranked['ShareOfScope'].to_numpy(dtype='float64')
+    cumulative = ranked['CumulativeShare'].to_numpy(dtype='float64')
+
+    sweep = ranked.iloc[starts][key_list].reset_index(drop=True)
+    sweep['NumSubcontractors'] = counts
+    for k in ratios:
+        sweep[f"CR{k}"] = cumulative[starts + np.minimum(k, counts) - 1]
+
+    # Shares descend within a market, so the firms clearing a threshold are a prefix of
+    # its run: the whole grid is one comparison matrix reduced per market
+    grid = np.asarray(thresholds, dtype='float64')
+    clears = shares[:, None] >= grid[None, :]
+    dominant = np.add.reduceat(clears, starts, axis=0) if len(starts) else np.zeros((0, len(grid)), dtype=int)
+    last = starts[:, None] + dominant - 1
+    dominant_share = np.where(dominant > 0, cumulative[np.maximum(last, 0)], 0.0)
+    for j, threshold in enumerate(grid):
+        label = f"{threshold * 100:g}".replace('.', '_')
+        sweep[f"Dominant_{label}"] = dominant[:, j]
+        sweep[f"DominantShare_{label}"] = dominant_share[:, j]
+    return sweep
+
+
+def _bootstrap_market(contracts: np.ndarray, amounts: np.ndarray, firm_starts: np.ndarray, n_contracts: int,
+                      n_resamples: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """
+    HHI of each bootstrap resample of one market.
+
+    Args:
+        contracts: Contract index (0..n_contracts-1) of each contract x firm cell, cells sorted by firm
+        amounts: Dollars of each cell
+        firm_starts: Position of each firm's first cell
+        n_contracts: Number of contracts in the market
+        n_resamples: Number of resamples
+        seed: Seed of this market's random stream
+
+    Returns:
+        Array of n_resamples HHI values
+    """
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_CHUNK_ELEMENTS // max(n_contracts, len(amounts)))
+    hhi = np.empty(n_resamples)
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        # One row of contract draws per resample, turned into per-contract counts
+        draws = rng.integers(0, n_contracts, size=(size, n_contracts))
+        offsets = (np.arange(size) * n_contracts)[:, None]
+        counts = np.bincount((draws + offsets).ravel(), minlength=size * n_contracts).reshape(size, n_contracts)
+        # Each cell weighted by how often its contract was drawn, summed per firm
+        firm_totals = np.add.reduceat(counts[:, contracts] * amounts, firm_starts, axis=1)
+        shares = firm_totals / firm_totals.sum(axis=1, keepdims=True)
+        hhi[start:start + size] = (shares ** 2).sum(axis=1) * 10000
+    return hhi
+
+
+def _bootstrap_batch(batch: List[Tuple], n_resamples: int,
+                     confidence: float) -> List[Tuple[int, float, float, float, float, float]]:
+    """CI bounds and concentration level probabilities for a batch of markets (runs in a worker process)"""
+    tail = (1 - confidence) / 2 * 100
+    results = []
+    for index, contracts, amounts, firm_starts, n_contracts, seed in batch:
+        hhi = _bootstrap_market(contracts, amounts, firm_starts, n_contracts, n_resamples, seed)
+        lower, upper = np.percentile(hhi, [tail, 100 - tail])
+        unconcentrated = np.mean(hhi < UNCONCENTRATED_BELOW)
+        highly = np.mean(hhi > HIGHLY_CONCENTRATED_ABOVE)
+        results.append((index, lower, upper, unconcentrated, 1 - unconcentrated - highly, highly))
+    return results
+
+
+def bootstrap_concentration(records: pd.DataFrame, keys: Keys = 'ScopeOfWork',
+                            firm_col: str = 'SubcontractorName', amount_col: str = 'SubAmount',
+                            contract_col: str = 'ContractID', n_resamples: int = BOOTSTRAP_RESAMPLES,
+                            confidence: float = 0.95, seed: int = 0,
+                            max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Bootstrap confidence intervals for each market's HHI, resampling contracts within the market.
+
+    A batch of resamples is drawn as one matrix of contract indices and turned
+    into per-contract counts; weighting each contract x firm cell by its
+    contract's count and summing per firm gives every resample's firm totals at
+    once. Markets are split into batches of similar size and spread across a
+    process pool. Every market has its own random stream derived from `seed`,
+    so results do not depend on the number of workers.
+
+    Args:
+        records: One row per subcontract (e.g. consolidated subcontractor records)
+        keys: Column(s) defining a market
+        firm_col: Firm column
+        amount_col: Dollar column
+        contract_col: Contract column (the resampling unit)
+        n_resamples: Resamples per market
+        confidence: Width of the percentile interval
+        seed: Random seed
+        max_workers: Process pool size (defaults to the CPU count; 1 runs in-process)
+
+    Returns:
+        DataFrame with the market keys, NumContracts, ScopeHHI_Lower and
+        ScopeHHI_Upper, and the share of resamples in each concentration level
+        (P_Unconcentrated, P_Moderately_Concentrated, P_Highly_Concentrated), in
+        key order
+    """
+    key_list = _as_list(keys)
+    # Sorted by market, then firm, so each market's cells are contiguous and grouped by firm
+    cells = records.groupby(key_list + [firm_col, contract_col], observed=True, sort=True,
+                            dropna=False)[amount_col].sum().reset_index()
+    codes, markets = group_codes(cells, key_list)
+    bounds = np.searchsorted(codes, np.arange(len(markets) + 1))
+    seeds = np.random.SeedSequence(seed).spawn(len(markets))
+
+    tasks = []
+    for index in range(len(markets)):
+        market = cells.iloc[bounds[index]:bounds[index + 1]]
+        contracts, contract_ids = pd.factorize(market[contract_col], use_na_sentinel=False)
+        firms = pd.factorize(market[firm_col], use_na_sentinel=False)[0]
+        firm_starts = np.flatnonzero(np.r_[True, firms[1:] != firms[:-1]])
+        tasks.append((index, contracts, market[amount_col].to_numpy(dtype='float64'), firm_starts,
+                      len(contract_ids), seeds[index]))
+
+    # Batches of roughly equal work (contracts + cells per resample), several per worker
+    workers = max_workers or os.cpu_count() or 1
+    n_batches = min(len(tasks), workers * 4) or 1
+    work = np.cumsum([n_contracts + len(amounts) for _, _, amounts, _, n_contracts, _ in tasks])
+    batch_of = np.minimum((work - 1) * n_batches // max(work[-1], 1), n_batches - 1) if tasks else []
+    batches = [[task for task, batch in zip(tasks, batch_of) if batch == b] for b in range(n_batches)]
+    batches = [batch for batch in batches if batch]
+
+    if workers == 1 or len(batches) <= 1:
+        results = [row for batch in batches for row in _bootstrap_batch(batch, n_resamples, confidence)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_bootstrap_batch, batch, n_resamples, confidence) for batch in batches]
+            results = [row for future in futures for row in future.result()]
+
+    results.sort()
+    intervals = markets.copy()
+    intervals['NumContracts'] = [task[4] for task in tasks]
+    columns = ['ScopeHHI_Lower', 'ScopeHHI_Upper'] + [f"P_{level.replace(' ', '_')}" for level in CONCENTRATION_LEVELS]
+    values = np.array([row[1:] for row in results]).reshape(len(results), len(columns))
+    for i, column in enumerate(columns):
+        intervals[column] = values[:, i]
+    return intervals
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Bid Analysis Pipeline
+The LBE and consolidated market analyses as one lazily evaluated stage graph:
+load -> firms -> records -> consolidate -> aggregate -> hhi -> dominant (+ dominance
+sweep) -> lbe (+ consolidated lbe, rolling trends, prime-sub network, contract facts)
+-> export, with a columnar dashboard stage next to export.
+Each stage output is cached under a key hashed from the stage's parameters and
+its upstream keys, so requesting an output only computes the stale stages above
+it, and one run writes every artifact without reading intermediate CSVs back.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+from artifacts import ArtifactWriter, artifact_hashes
+from backends import BACKENDS, get_backend
+from bid_data import CACHE_DIR, load_bid_data, resolve_workbooks, subcontractor_records
+from consolidate_lbe_data import consolidate_lbe_data
+from contract_facts import contract_facts, save_contract_facts
+from dashboard_export import DASHBOARD_DIR, dashboard_tables, export_dashboard
+from enhanced_analysis import save_consolidated_results
+from firm_network import FirmNetwork, bid_links, save_network_tables
+from firm_resolution import (NORMALIZATION_VERSION, SIMILARITY_THRESHOLD, firm_mapping, get_default_resolver,
+                             resolve_firm_names)
+from instrumentation import start_run
+from lbe_analysis import lbe_tables, save_lbe_tables
+from market_concentration import (CONCENTRATION_RATIOS, DOMINANCE_THRESHOLDS, dominance_sweep, dominant_subcontractors,
+                                  rank_within_markets)
+from scope_consolidation import RULES_FILE, get_default_matcher, load_rules, save_matcher
+from trends import concentration_trends
+
+
+PIPELINE_CACHE_DIR = os.path.join(CACHE_DIR, 'pipeline')
+
+DEFAULT_PARAMS = {
+    'file_path': '2020BidData.xlsx',
+    'rules_path': RULES_FILE,
+    'dominance_threshold': 0.25,
+    # Grid for the dominance stage: share thresholds and CR-k ratios, all from one sort
+    'dominance_thresholds': tuple(DOMINANCE_THRESHOLDS),
+    'concentration_ratios': tuple(CONCENTRATION_RATIOS),
+    # Trigram similarity at which firm name variants merge (see firm_resolution.py)
+    'firm_threshold': SIMILARITY_THRESHOLD,
+    # Engine for the aggregate and hhi stages (see backends.py)
+    'backend': 'pandas',
+    # Rolling trend windows: periods per window and between window ends; periods are
+    # bid years, or calendar months of date_column when it is set
+    'trend_window': 1,
+    'trend_step': 1,
+    'date_column': None,
+    'lbe_dir': 'lbe_analysis',
+    'output_dir': 'consolidated_analysis',
+    'dashboard_dir': DASHBOARD_DIR,
+}
+
+
+class Stage(NamedTuple):
+    """One node of the pipeline graph"""
+    # Called with the pipeline parameters followed by the outputs of `deps`
+    func: Callable[..., Any]
+    deps: List[str]
+    # Parameters that feed the cache key (file parameters are fingerprinted)
+    params: List[str]
+    # Bump when the stage's code changes its output, to invalidate cached results
+    # (a stage backed by a module with its own cache version uses that version)
+    version: int = 1
+    # Optional check that a cached output is still usable (e.g. exported files are unchanged)
+    valid: Optional[Callable[[Any], bool]] = None
+    # Keep the output in the in-process memo; off for stages whose result is files on
+    # disk, which another run or tool may have replaced since
+    memoize: bool = True
+
+
+def _consolidate(params: Dict, records: pd.DataFrame) -> pd.DataFrame:
+    """Records with OriginalScope kept and ScopeOfWork replaced by the consolidated scope"""
+    matcher = get_default_matcher(params['rules_path'])
+    consolidated = records.assign(OriginalScope=records['ScopeOfWork'])
+    consolidated['ScopeOfWork'] = matcher.classify(consolidated['OriginalScope']).astype('category')
+    save_matcher(matcher)
+    return consolidated
+
+
+def _concentration(params: Dict, scope_sub_agg: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    with_shares, hhi = get_backend(params['backend']).concentration_tables(scope_sub_agg, 'ScopeOfWork')
+    return {'scope_sub_agg': with_shares, 'hhi': hhi}
+
+
+def _dominance(params: Dict, concentration: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    ranked = rank_within_markets(concentration['scope_sub_agg'], 'ScopeOfWork')
+    sweep = dominance_sweep(ranked, 'ScopeOfWork', params['dominance_thresholds'], params['concentration_ratios'])
+    return {'ranked': ranked, 'sweep': sweep}
+
+
+def _export(params: Dict, consolidated: pd.DataFrame, concentration: Dict[str, pd.DataFrame],
+            dominant: pd.DataFrame, lbe: Dict[str, pd.DataFrame], lbe_consolidated: pd.DataFrame,
+            bids: pd.DataFrame, trends: pd.DataFrame, network: FirmNetwork,
+            dominance: Dict[str, pd.DataFrame], contracts: Dict[str, pd.DataFrame]) -> Dict[str, str]:
+    """
+    Write the lbe_analysis/ and consolidated_analysis/ CSVs; returns each path's content SHA-256.
+
+    All CSVs go through one ArtifactWriter: unchanged ones are skipped and the rest
+    written concurrently and atomically.
+    """
+    writer = ArtifactWriter()
+    output_dir = params['output_dir']
+    scope_mapping = consolidated[['OriginalScope', 'ScopeOfWork']].drop_duplicates()
+    paths = save_lbe_tables(lbe, params['lbe_dir'], writer)
+    paths += save_contract_facts(contracts['contracts'], contracts['bids'], params['lbe_dir'], writer)
+    paths += save_consolidated_results(concentration['scope_sub_agg'], concentration['hhi'], dominant,
+                                       scope_mapping, output_dir, writer)
+    paths += [
+        writer.add(os.path.join(output_dir, 'lbe_scope_analysis_consolidated.csv'), lbe_consolidated),
+        writer.add(os.path.join(output_dir, 'firm_resolution_mapping.csv'), firm_mapping(bids)),
+        writer.add(os.path.join(output_dir, 'concentration_trends.csv'), trends),
+        writer.add(os.path.join(output_dir, 'dominance_sweep.csv'), dominance['sweep']),
+    ]
+    dominant_names = set(dominant['SubcontractorName'].astype(str))
+    paths += save_network_tables(network, dominant_names, output_dir, writer)
+    written = writer.write()
+    return {path: written[path]['sha256'] for path in paths}
+
+
+def _dashboard(params: Dict, consolidated: pd.DataFrame, concentration: Dict[str, pd.DataFrame],
+               dominant: pd.DataFrame, lbe: Dict[str, pd.DataFrame], lbe_consolidated: pd.DataFrame,
+               trends: pd.DataFrame, dominance: Dict[str, pd.DataFrame]) -> Dict[str, str]:
+    """Write the columnar dashboard artifacts and manifest; returns each path's content SHA-256"""
+    scope_mapping = consolidated[['OriginalScope', 'ScopeOfWork']].drop_duplicates()
+    tables = dashboard_tables(concentration['scope_sub_agg'], concentration['hhi'], dominant, scope_mapping,
+                              lbe, lbe_consolidated)
+    tables['concentration_trends'] = trends
+    tables['ranked_subcontractors'] = dominance['ranked']
+    tables['dominance_sweep'] = dominance['sweep']
+    return artifact_hashes(export_dashboard(tables, params['dashboard_dir']))
+
+
+def _artifacts_unchanged(hashes: Dict[str, str]) -> bool:
+    """Whether every artifact a stage wrote still holds the bytes it wrote"""
+    return artifact_hashes(hashes) == hashes
+
+
+STAGES: Dict[str, Stage] = {
+    'load': Stage(lambda params: load_bid_data(params['file_path']), [], ['file_path']),
+    'firms': Stage(lambda params, bids: resolve_firm_names(bids, resolver=get_default_resolver(params['firm_threshold'])),
+                   ['load'], ['firm_threshold'], version=NORMALIZATION_VERSION),
+    'records': Stage(lambda params, bids: subcontractor_records(bids), ['firms'], []),
+    'consolidate': Stage(_consolidate, ['records'], ['rules_path']),
+    'aggregate': Stage(lambda params, consolidated: get_backend(params['backend']).aggregate_scope_subcontractors(
+        consolidated, 'ScopeOfWork'), ['consolidate'], ['backend']),
+    'hhi': Stage(_concentration, ['aggregate'], ['backend'], version=2),
+    'dominant': Stage(lambda params, concentration: dominant_subcontractors(
+        concentration['scope_sub_agg'], 'ScopeOfWork', params['dominance_threshold']), ['hhi'], ['dominance_threshold']),
+    'dominance': Stage(_dominance, ['hhi'], ['dominance_thresholds', 'concentration_ratios'], version=2),
+    'lbe': Stage(lambda params, bids: lbe_tables(bids), ['firms'], []),
+    'lbe_consolidated': Stage(lambda params, bids: consolidate_lbe_data(bids, get_default_matcher(params['rules_path'])),
+                              ['firms'], ['rules_path']),
+    'trends': Stage(lambda params, bids, consolidated: concentration_trends(
+        bids, consolidated, params['trend_window'], params['trend_step'], params['date_column']),
+        ['firms', 'consolidate'], ['trend_window', 'trend_step', 'date_column']),
+    'network': Stage(lambda params, bids: FirmNetwork(bid_links(bids, get_default_matcher(params['rules_path']))),
+                     ['firms'], ['rules_path']),
+    'contracts': Stage(lambda params, bids: dict(zip(['contracts', 'bids'], contract_facts(bids))), ['firms'], [],
+                       version=2),
+    'export': Stage(_export, ['consolidate', 'hhi', 'dominant', 'lbe', 'lbe_consolidated', 'firms', 'trends',
+                              'network', 'dominance', 'contracts'],
+                    ['lbe_dir', 'output_dir'], valid=_artifacts_unchanged, memoize=False),
+    'dashboard': Stage(_dashboard, ['consolidate', 'hhi', 'dominant', 'lbe', 'lbe_consolidated', 'trends',
+                                    'dominance'],
+                       ['dashboard_dir'], valid=_artifacts_unchanged, memoize=False),
+}
+
+
+def _workbook_fingerprint(path: str) -> List:
+    """Path, mtime and size of every workbook a file_path resolves to"""
+    fingerprint = []
+    for workbook in resolve_workbooks(path):
+        stat = os.stat(workbook)
+        fingerprint.append([os.path.abspath(workbook), stat.st_mtime_ns, stat.st_size])
+    return fingerprint
+
+
+# Parameters naming input files are keyed on their content, not just their name
+_PARAM_FINGERPRINTS: Dict[str, Callable[[Any], Any]] = {
+    'file_path': _workbook_fingerprint,
+    'rules_path': lambda path: load_rules(path)[1],
+}
+
+
+class Pipeline:
+    """
+    Lazily evaluated, cached stage graph.
+
+    Outputs are memoized in-process by cache key and, unless use_cache is False,
+    pickled to cache_dir so later runs reuse them. A stage is stale when its key
+    (its own parameters plus the keys of everything upstream) has no cached
+    output; get() recomputes only those stages.
+    """
+
+    def __init__(self, cache_dir: str = PIPELINE_CACHE_DIR, use_cache: bool = True,
+                 instrument: Optional[str] = None, **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown pipeline parameters: {sorted(unknown)}")
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self._memo: Dict[str, Any] = {}
+        self._keys: Dict[str, str] = {}
+        # (stage, 'computed' | 'memory' | 'disk', seconds) for the stages visited by get()
+        self.log: List[tuple] = []
+        # Per-stage timing, rows and memory of computed stages (no-op unless instrument is set)
+        self.instrumentation = start_run('pipeline', instrument)
+
+    def key(self, name: str) -> str:
+        """Cache key of a stage (computed without running anything)"""
+        if name not in self._keys:
+            stage = STAGES[name]
+            params = {
+                param: _PARAM_FINGERPRINTS.get(param, lambda value: value)(self.params[param])
+                for param in stage.params
+            }
+            payload = json.dumps({
+                'stage': name,
+                'version': stage.version,
+                'params': params,
+                'deps': [self.key(dep) for dep in stage.deps],
+            }, sort_keys=True)
+            self._keys[name] = hashlib.sha256(payload.encode()).hexdigest()[:16]
+        return self._keys[name]
+
+    def _cache_path(self, name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def _store(self, name: str, key: str, value: Any):
+        """Pickle a stage output, replacing the stage's previous entry"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(name, key)
+        with open(f"{path}.tmp", 'wb') as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        for stale in glob.glob(self._cache_path(name, '*')):
+            if stale != path:
+                os.remove(stale)
+
+    def _get(self, name: str) -> Any:
+        stage = STAGES[name]
+        key = self.key(name)
+        start = time.perf_counter()
+
+        if stage.memoize and key in self._memo and (stage.valid is None or stage.valid(self._memo[key])):
+            self.log.append((name, 'memory', time.perf_counter() - start))
+            return self._memo[key]
+
+        path = self._cache_path(name, key)
+        if self.use_cache and os.path.exists(path):
+            with open(path, 'rb') as handle:
+                value = pickle.load(handle)
+            if stage.valid is None or stage.valid(value):
+                if stage.memoize:
+                    self._memo[key] = value
+                self.log.append((name, 'disk', time.perf_counter() - start))
+                return value
+
+        inputs = [self._get(dep) for dep in stage.deps]
+        frames = [value for value in inputs if isinstance(value, pd.DataFrame)]
+        start = time.perf_counter()
+        with self.instrumentation.measure(name, rows_in=frames[0] if frames else None) as record:
+            value = stage.func(self.params, *inputs)
+            if isinstance(value, pd.DataFrame):
+                record['rows_out'] = value
+        self.log.append((name, 'computed', time.perf_counter() - start))
+
+        if stage.memoize:
+            self._memo[key] = value
+        if self.use_cache:
+            self._store(name, key, value)
+        return value
+
+    def get(self, name: str) -> Any:
+        """
+        Output of one stage, computing it and any stale upstream stages.
+
+        Input files are re-fingerprinted on every call, so edits to a workbook or
+        the consolidation rules are picked up by a long-lived Pipeline.
+        """
+        if name not in STAGES:
+            raise KeyError(f"Unknown stage '{name}'; expected one of {list(STAGES)}")
+        self._keys = {}
+        return self._get(name)
+
+    def run(self, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Outputs of several stages (default: export, which writes every artifact)"""
+        return {name: self.get(name) for name in (targets or ['export'])}
+
+    def _cached(self, name: str) -> bool:
+        stage = STAGES[name]
+        key = self.key(name)
+        if stage.memoize and key in self._memo:
+            return True
+        path = self._cache_path(name, key)
+        if not self.use_cache or not os.path.exists(path):
+            return False
+        if stage.valid is None:
+            return True
+        with open(path, 'rb') as handle:
+            return stage.valid(pickle.load(handle))
+
+    def status(self) -> Dict[str, bool]:
+        """Whether each stage has a usable cached output for the current inputs"""
+        self._keys = {}
+        return {name: self._cached(name) for name in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bid analysis stage graph")
+    parser.add_argument('file_path', nargs='?', default=DEFAULT_PARAMS['file_path'],
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--target', action='append', choices=list(STAGES),
+                        help='Stage to produce (repeatable; default: export)')
+    parser.add_argument('--rules', default=RULES_FILE, help='Scope consolidation rules file')
+    parser.add_argument('--dominance-threshold', type=float, default=DEFAULT_PARAMS['dominance_threshold'],
+                        help='Minimum share of scope for a dominant subcontractor')
+    parser.add_argument('--dominance-grid', default=','.join(f"{value:g}" for value in DEFAULT_PARAMS['dominance_thresholds']),
+                        help='Comma-separated share thresholds for the dominance sweep')
+    parser.add_argument('--concentration-ratios', default=','.join(map(str, DEFAULT_PARAMS['concentration_ratios'])),
+                        help='Comma-separated k values for the CR-k concentration ratios')
+    parser.add_argument('--firm-threshold', type=float, default=DEFAULT_PARAMS['firm_threshold'],
+                        help='Trigram similarity at which spelling variants of a firm name merge')
+    parser.add_argument('--trend-window', type=int, default=DEFAULT_PARAMS['trend_window'],
+                        help='Periods (years, or months with --date-column) per rolling trend window')
+    parser.add_argument('--trend-step', type=int, default=DEFAULT_PARAMS['trend_step'],
+                        help='Periods between consecutive trend windows')
+    parser.add_argument('--date-column', default=None, help='Bid date column; trend periods become calendar months')
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_PARAMS['backend'],
+                        help='Engine for the aggregation and HHI stages')
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor write the stage cache')
+    parser.add_argument('--status', action='store_true', help='Show which stages are cached and exit')
+    parser.add_argument('--instrument', nargs='?', const='1', default=None,
+                        help='Write run_report.json (per-stage timing, rows, memory) to the output directory; '
+                             'add "memory" and/or "profile" for tracemalloc and cProfile')
+    args = parser.parse_args()
+
+    pipeline = Pipeline(use_cache=not args.no_cache, instrument=args.instrument, file_path=args.file_path,
+                        rules_path=args.rules, dominance_threshold=args.dominance_threshold,
+                        dominance_thresholds=tuple(float(value) for value in args.dominance_grid.split(',')),
+                        concentration_ratios=tuple(int(value) for value in args.concentration_ratios.split(',')),
+                        firm_threshold=args.firm_threshold, backend=args.backend, trend_window=args.trend_window,
+                        trend_step=args.trend_step, date_column=args.date_column)
+
+    print("=== BID ANALYSIS PIPELINE ===\n")
+    if args.status:
+        for name, cached in pipeline.status().items():
+            print(f"  {name:<12} {pipeline.key(name)}  {'cached' if cached else 'stale'}")
+        return
+
+    try:
+        outputs = pipeline.run(args.target)
+        for name, source, seconds in pipeline.log:
+            print(f"  {name:<12} {source:<9} {seconds:>8.3f}s")
+        for target in ('export', 'dashboard'):
+            if target in outputs:
+                print(f"\n{target.capitalize()} artifacts:")
+                for path in outputs[target]:
+                    print(f"  - {path}")
+    finally:
+        pipeline.instrumentation.finish(pipeline.params['output_dir'])
+
+
+if __name__ == "__main__":
+    main()
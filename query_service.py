@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Market Metrics Query Service
+A small local HTTP/JSON API over the pipeline's aggregates, for ad-hoc questions
+such as "HHI for scope X in year Y", "subcontractors with share >= 0.25 in scope
+X" or "LBE share for firm F" without regenerating or downloading CSVs.
+
+Tables are held in memory with per-column indexes (value -> row positions) on
+scope, subcontractor, year and LBE flag; query results are kept in an LRU cache.
+
+Endpoints (all GET, JSON out, `limit` (>= 1) and `offset` (>= 0) paginate,
+`sort` orders by a column, prefixed with '-' for descending):
+    /markets  scope, year, level, min_hhi, max_hhi
+    /shares   scope, subcontractor, year, lbe, min_share
+    /lbe      scope, min_dollars
+    /firms    subcontractor, lbe, min_dollars
+    /health   table sizes and cache statistics
+"""
+
+import argparse
+import json
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from market_concentration import aggregate_scope_subcontractors, concentration_tables
+from pipeline import Pipeline
+
+
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+CACHE_SIZE = 1024
+
+
+class TableIndex:
+    """
+    A frame with hash indexes on some columns.
+
+    Equality filters intersect the row positions stored for each value; range
+    filters and sorting then only touch the matching rows.
+    """
+
+    def __init__(self, frame: pd.DataFrame, indexed: List[str]):
+        self.frame = frame.reset_index(drop=True)
+        self.indexes: Dict[str, Dict] = {}
+        for col in indexed:
+            groups = self.frame.groupby(col, observed=True, sort=False).indices
+            self.indexes[col] = {self._key(value): positions for value, positions in groups.items()}
+
+    @staticmethod
+    def _key(value):
+        """Index key: text is matched case-insensitively, numbers and flags as-is"""
+        if isinstance(value, (bool, np.bool_)):
+            return bool(value)
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return str(value).strip().lower()
+
+    def select(self, equals: Dict, minimum: Dict, maximum: Dict) -> pd.DataFrame:
+        """Rows matching every equality filter and range bound"""
+        positions: Optional[np.ndarray] = None
+        for col, value in equals.items():
+            matched = self.indexes[col].get(self._key(value), np.empty(0, dtype=np.intp))
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        rows = self.frame if positions is None else self.frame.iloc[np.sort(positions)]
+        for col, bound in minimum.items():
+            rows = rows[rows[col] >= bound]
+        for col, bound in maximum.items():
+            rows = rows[rows[col] <= bound]
+        return rows
+
+
+def _json_records(frame: pd.DataFrame) -> List[Dict]:
+    """Rows as JSON-safe dicts (missing values become null)"""
+    plain = frame.astype(object).where(frame.notna(), None)
+    return plain.to_dict('records')
+
+
+class MetricsStore:
+    """
+    Indexed tables built from a Pipeline, plus the query logic behind each endpoint.
+
+    Args:
+        pipeline: Source of the aggregates (its stage cache makes startup cheap)
+        cache_size: Number of distinct query results kept in the LRU cache
+    """
+
+    # Endpoint -> (table used without a year filter, table used with one, filters)
+    # where filters maps a query parameter to (column, kind)
+    ENDPOINTS = {
+        'markets': ('markets', 'markets_by_year', {
+            'scope': ('ScopeOfWork', 'eq'), 'year': ('Year', 'eq'), 'level': ('ConcentrationLevel', 'eq'),
+            'min_hhi': ('ScopeHHI', 'min'), 'max_hhi': ('ScopeHHI', 'max'),
+        }),
+        'shares': ('shares', 'shares_by_year', {
+            'scope': ('ScopeOfWork', 'eq'), 'subcontractor': ('SubcontractorName', 'eq'), 'year': ('Year', 'eq'),
+            'lbe': ('is_lbe', 'eq'), 'min_share': ('ShareOfScope', 'min'),
+        }),
+        'lbe': ('lbe', None, {
+            'scope': ('Scope of Work', 'eq'), 'min_dollars': ('Total_Dollars', 'min'),
+        }),
+        'firms': ('firms', None, {
+            'subcontractor': ('Contractor Name', 'eq'), 'lbe': ('Is_LBE', 'eq'), 'min_dollars': ('Total_Dollars', 'min'),
+        }),
+    }
+
+    def __init__(self, pipeline: Pipeline, cache_size: int = CACHE_SIZE):
+        start = time.perf_counter()
+        bids = pipeline.get('load')
+        consolidated = pipeline.get('consolidate')
+        concentration = pipeline.get('hhi')
+
+        # A contract's rows share one bid year
+        contract_year = bids.groupby('Contract', observed=True)['Year'].first()
+        by_year = consolidated.assign(Year=consolidated['ContractID'].astype(object).map(contract_year).astype('Int64'))
+        year_agg = aggregate_scope_subcontractors(by_year, ['ScopeOfWork', 'Year'])
+        year_shares, year_markets = concentration_tables(year_agg, ['ScopeOfWork', 'Year'])
+
+        firm_lbe = consolidated.groupby('SubcontractorName', observed=True)['is_lbe'].first()
+
+        def with_lbe(shares: pd.DataFrame) -> pd.DataFrame:
+            return shares.assign(is_lbe=shares['SubcontractorName'].astype(object).map(firm_lbe).astype(bool))
+
+        self.tables = {
+            'markets': TableIndex(concentration['hhi'], ['ScopeOfWork', 'ConcentrationLevel']),
+            'markets_by_year': TableIndex(year_markets, ['ScopeOfWork', 'Year', 'ConcentrationLevel']),
+            'shares': TableIndex(with_lbe(concentration['scope_sub_agg']), ['ScopeOfWork', 'SubcontractorName', 'is_lbe']),
+            'shares_by_year': TableIndex(with_lbe(year_shares),
+                                         ['ScopeOfWork', 'SubcontractorName', 'Year', 'is_lbe']),
+            'lbe': TableIndex(pipeline.get('lbe_consolidated'), ['Scope of Work']),
+            'firms': TableIndex(pipeline.get('lbe')['firm_analysis'].rename_axis('Contractor Name').reset_index(),
+                                ['Contractor Name', 'Is_LBE']),
+        }
+        self.query = lru_cache(maxsize=cache_size)(self._query)
+        self.load_seconds = time.perf_counter() - start
+
+    @staticmethod
+    def _parse(kind: str, column: str, value: str):
+        if column in ('is_lbe', 'Is_LBE'):
+            if value.lower() not in ('true', 'false', '1', '0', 'yes', 'no'):
+                raise ValueError(f"lbe must be true or false, got '{value}'")
+            return value.lower() in ('true', '1', 'yes')
+        if column == 'Year':
+            return int(value)
+        if kind in ('min', 'max'):
+            return float(value)
+        return value
+
+    @staticmethod
+    def _page_param(params: Dict[str, str], name: str, default: int, minimum: int) -> int:
+        """Pop a pagination parameter, rejecting non-integers and values below minimum"""
+        value = params.pop(name, None)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer, got '{value}'") from None
+        if number < minimum:
+            raise ValueError(f"{name} must be at least {minimum}, got {number}")
+        return number
+
+    def _query(self, endpoint: str, params: Tuple[Tuple[str, str], ...]) -> Dict:
+        """Uncached query; params is a sorted tuple of (name, value) pairs"""
+        table_name, year_table, filters = self.ENDPOINTS[endpoint]
+        params = dict(params)
+
+        limit = min(self._page_param(params, 'limit', DEFAULT_LIMIT, minimum=1), MAX_LIMIT)
+        offset = self._page_param(params, 'offset', 0, minimum=0)
+        sort = params.pop('sort', None)
+        unknown = set(params) - set(filters)
+        if unknown:
+            raise ValueError(f"Unknown parameters for /{endpoint}: {sorted(unknown)}; "
+                             f"expected {sorted(filters) + ['limit', 'offset', 'sort']}")
+
+        table = self.tables[year_table if year_table and 'year' in params else table_name]
+        equals, minimum, maximum = {}, {}, {}
+        for name, value in params.items():
+            column, kind = filters[name]
+            {'eq': equals, 'min': minimum, 'max': maximum}[kind][column] = self._parse(kind, column, value)
+
+        rows = table.select(equals, minimum, maximum)
+        if sort:
+            column = sort.lstrip('-')
+            if column not in rows.columns:
+                raise ValueError(f"Cannot sort by '{column}'; columns are {list(rows.columns)}")
+            rows = rows.sort_values(column, ascending=not sort.startswith('-'), kind='stable')
+        return {
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit,
+            'results': _json_records(rows.iloc[offset:offset + limit]),
+        }
+
+    def health(self) -> Dict:
+        info = self.query.cache_info()
+        return {
+            'tables': {name: len(table.frame) for name, table in self.tables.items()},
+            'load_seconds': round(self.load_seconds, 3),
+            'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize},
+        }
+
+
+def make_handler(store: MetricsStore):
+    """Request handler class bound to a MetricsStore"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Dict):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            # The dashboard is served from another local port
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.strip('/')
+            if endpoint == 'health':
+                return self._send(200, store.health())
+            if endpoint not in MetricsStore.ENDPOINTS:
+                return self._send(404, {'error': f"Unknown endpoint '/{endpoint}'",
+                                        'endpoints': [f"/{name}" for name in MetricsStore.ENDPOINTS] + ['/health']})
+            # Single-valued parameters; sorted so equivalent queries share a cache entry
+            params = tuple(sorted((name, values[-1]) for name, values in parse_qs(url.query).items()))
+            try:
+                self._send(200, store.query(endpoint, params))
+            except ValueError as error:
+                self._send(400, {'error': str(error)})
+
+        def log_message(self, format, *args):
+            # Keep the console quiet; per-request logging would dominate latency
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the market metrics as a local JSON API")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Query results kept in the LRU cache')
+    args = parser.parse_args()
+
+    print("=== MARKET METRICS QUERY SERVICE ===\n")
+    store = MetricsStore(Pipeline(file_path=args.file_path), cache_size=args.cache_size)
+    for name, rows in store.health()['tables'].items():
+        print(f"  {name:<16} {rows:>8,} rows")
+    print(f"Indexes built in {store.load_seconds:.2f}s")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    print(f"Listening on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Market Share Scenarios
+Counterfactual reallocations of subcontract dollars within a scope, such as "move
+30% of the top firm's volume in Electrical Work to LBE firms", evaluated in bulk.
+
+A reallocation only changes the source firm and scales the receiving LBE firms
+by a common factor, so its HHI and LBE dollar share follow in closed form from a
+few per-scope sums (dollars, squared dollars, their LBE parts, and the top two
+firms of each LBE class). Scenarios are evaluated as arrays over those sums:
+thousands of them cost a few array operations instead of one aggregation rerun
+each, whatever the number of firms per scope.
+
+A scenario names a scope, the fraction of the source firm's dollars to move and
+where they go:
+    lbe      existing LBE firms of the scope, in proportion to their dollars (a
+             new LBE entrant when the scope has none besides the source)
+    new_lbe  a single new LBE entrant
+The source firm is the scope's largest firm unless one is named.
+"""
+
+import argparse
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_frames
+from market_concentration import Keys, _as_list, classify_concentration_series, group_codes
+
+
+DESTINATIONS = ['lbe', 'new_lbe']
+OUTPUT_FILE = os.path.join('consolidated_analysis', 'scenario_results.csv')
+
+
+def firm_lbe_flags(records: pd.DataFrame, firm_col: str = 'SubcontractorName') -> pd.Series:
+    """LBE flag per firm, taken from its first record as in lbe_analysis's firm table"""
+    return records.groupby(firm_col, observed=True)['is_lbe'].first()
+
+
+def _top_two(codes: np.ndarray, dollars: np.ndarray, mask: np.ndarray,
+             n_markets: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Largest and second-largest dollars among the masked rows of each market.
+
+    Returns:
+        Tuple of (top dollars, row of the top firm or -1, second dollars); 0 where absent
+    """
+    rows = np.flatnonzero(mask)
+    rows = rows[np.lexsort((-dollars[rows], codes[rows]))]
+    row_codes = codes[rows]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = row_codes[1:] != row_codes[:-1]
+    second = np.zeros(len(rows), dtype=bool)
+    second[1:] = first[:-1] & ~first[1:]
+
+    top, top_row, runner_up = np.zeros(n_markets), np.full(n_markets, -1), np.zeros(n_markets)
+    top[row_codes[first]] = dollars[rows[first]]
+    top_row[row_codes[first]] = rows[first]
+    runner_up[row_codes[second]] = dollars[rows[second]]
+    return top, top_row, runner_up
+
+
+class ScenarioEngine:
+    """
+    Vectorized evaluation of share reallocation scenarios.
+
+    Args:
+        agg: One row per scope and firm (see aggregate_scope_subcontractors)
+        firm_lbe: LBE flag per firm name (see firm_lbe_flags); missing firms are non-LBE
+        keys: Column(s) defining a scope
+        firm_col: Firm column
+        amount_col: Dollar column
+    """
+
+    def __init__(self, agg: pd.DataFrame, firm_lbe: pd.Series, keys: Keys = 'ScopeOfWork',
+                 firm_col: str = 'SubcontractorName', amount_col: str = 'TotalSubAmount'):
+        self.keys = _as_list(keys)
+        self.codes, self.markets = group_codes(agg, self.keys)
+        n_markets = len(self.markets)
+        self.firms = agg[firm_col].to_numpy(dtype=object)
+        self.dollars = agg[amount_col].to_numpy(dtype='float64')
+        self.lbe = pd.Series(self.firms).map(firm_lbe).fillna(False).to_numpy(dtype=bool)
+
+        def per_market(values: np.ndarray) -> np.ndarray:
+            return np.bincount(self.codes, weights=values, minlength=n_markets)
+
+        self.totals = per_market(self.dollars)
+        self.squares = per_market(self.dollars ** 2)
+        self.lbe_dollars = per_market(self.dollars * self.lbe)
+        self.lbe_squares = per_market(self.dollars ** 2 * self.lbe)
+        # Top two firms of each LBE class, so the largest firm other than the source is known
+        self.top = {flag: _top_two(self.codes, self.dollars, self.lbe == flag, n_markets) for flag in (False, True)}
+        self.top_row = np.where(self.top[True][0] > self.top[False][0], self.top[True][1], self.top[False][1])
+
+        self._market_index = {key: i for i, key in enumerate(self.markets.itertuples(index=False, name=None))}
+        self._firm_row = {(code, firm): row for row, (code, firm) in enumerate(zip(self.codes, self.firms))}
+
+    def _market_codes(self, scenarios: pd.DataFrame) -> np.ndarray:
+        keys = scenarios[self.keys].itertuples(index=False, name=None)
+        try:
+            return np.array([self._market_index[key] for key in keys], dtype=np.int64)
+        except KeyError as error:
+            raise ValueError(f"Unknown scope {error.args[0]}") from None
+
+    def _source_rows(self, scenarios: pd.DataFrame, codes: np.ndarray) -> np.ndarray:
+        rows = self.top_row[codes]
+        if 'SourceFirm' not in scenarios:
+            return rows
+        for i, (code, firm) in enumerate(zip(codes, scenarios['SourceFirm'])):
+            if isinstance(firm, str) and firm:
+                if (code, firm) not in self._firm_row:
+                    raise ValueError(f"'{firm}' has no dollars in scope {self.markets.iloc[code].tolist()}")
+                rows[i] = self._firm_row[(code, firm)]
+        return rows
+
+    def _largest_other(self, flag: bool, codes: np.ndarray, source: np.ndarray) -> np.ndarray:
+        """Largest firm of an LBE class in each scenario's scope, leaving out the source firm"""
+        top, top_row, runner_up = (values[codes] for values in self.top[flag])
+        return np.where(top_row == source, runner_up, top)
+
+    def evaluate(self, scenarios: pd.DataFrame) -> pd.DataFrame:
+        """
+        HHI, concentration level and LBE dollar share after each scenario.
+
+        Args:
+            scenarios: One row per scenario with the scope key column(s), Fraction
+                (0-1 of the source firm's dollars to move) and optionally
+                Destination (see DESTINATIONS, default 'lbe') and SourceFirm
+                (default the scope's largest firm)
+
+        Returns:
+            The scenarios with SourceFirm, MovedDollars, BaseHHI, ScenarioHHI,
+            HHIChange, BaseLevel, ConcentrationLevel, BaseLBEShare,
+            ScenarioLBEShare and ScenarioTopFirmShare added
+        """
+        fraction = scenarios['Fraction'].to_numpy(dtype='float64')
+        if ((fraction < 0) | (fraction > 1)).any():
+            raise ValueError("Fraction must be between 0 and 1")
+        destination = (scenarios['Destination'].fillna('lbe') if 'Destination' in scenarios
+                       else pd.Series('lbe', index=scenarios.index)).to_numpy(dtype=object)
+        unknown = set(destination) - set(DESTINATIONS)
+        if unknown:
+            raise ValueError(f"Unknown destination(s) {sorted(unknown)}; expected one of {DESTINATIONS}")
+
+        codes = self._market_codes(scenarios)
+        source = self._source_rows(scenarios, codes)
+        source_dollars = self.dollars[source]
+        source_lbe = self.lbe[source]
+        totals = self.totals[codes]
+        moved = fraction * source_dollars
+
+        # LBE firms other than the source receive in proportion to their dollars, each
+        # scaled by (1 + gain); with none to receive, a new LBE entrant takes it all
+        receiving = self.lbe_dollars[codes] - source_lbe * source_dollars
+        receiving_squares = self.lbe_squares[codes] - source_lbe * source_dollars ** 2
+        # (relative to the scope total: when the source is the only LBE firm, what is left is float residue)
+        to_entrant = (destination == 'new_lbe') | (receiving <= totals * 1e-12)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            gain = np.where(to_entrant, 0.0, moved / receiving)
+        entrant = np.where(to_entrant, moved, 0.0)
+
+        squares = (self.squares[codes] - source_dollars ** 2 + (source_dollars - moved) ** 2
+                   + receiving_squares * ((1 + gain) ** 2 - 1) + entrant ** 2)
+        top_firm = np.maximum.reduce([
+            source_dollars - moved,
+            self._largest_other(True, codes, source) * (1 + gain),
+            self._largest_other(False, codes, source),
+            entrant,
+        ])
+
+        # Scopes without dollars keep an HHI of 0 and undefined shares (see concentration_tables)
+        has_dollars = totals > 0
+
+        def per_total(values: np.ndarray, empty: float) -> np.ndarray:
+            return np.divide(values, totals, out=np.full(len(totals), empty), where=has_dollars)
+
+        def hhi(sum_squares: np.ndarray) -> np.ndarray:
+            return per_total(per_total(sum_squares, 0.0), 0.0) * 10000
+
+        result = scenarios.copy()
+        result['Destination'] = destination
+        result['SourceFirm'] = self.firms[source]
+        result['MovedDollars'] = moved
+        result['BaseHHI'] = hhi(self.squares[codes])
+        result['ScenarioHHI'] = hhi(squares)
+        result['HHIChange'] = result['ScenarioHHI'] - result['BaseHHI']
+        result['BaseLevel'] = classify_concentration_series(result['BaseHHI'])
+        result['ConcentrationLevel'] = classify_concentration_series(result['ScenarioHHI'])
+        result['BaseLBEShare'] = per_total(self.lbe_dollars[codes], np.nan)
+        result['ScenarioLBEShare'] = per_total(self.lbe_dollars[codes] + ~source_lbe * moved, np.nan)
+        result['ScenarioTopFirmShare'] = per_total(top_firm, np.nan)
+        return result
+
+
+def scenario_grid(scopes: Sequence, fractions: Sequence[float], destinations: Sequence[str] = ('lbe',),
+                  scope_col: str = 'ScopeOfWork') -> pd.DataFrame:
+    """Every combination of scope, fraction and destination as a scenario frame"""
+    index = pd.MultiIndex.from_product([list(scopes), list(fractions), list(destinations)],
+                                       names=[scope_col, 'Fraction', 'Destination'])
+    return index.to_frame(index=False)
+
+
+def _parse_fractions(spec: str) -> List[float]:
+    """'0.1,0.2' or a start:stop:step range (stop included)"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        return [round(value, 10) for value in np.arange(start, stop + step / 2, step)]
+    return [float(part) for part in spec.split(',')]
+
+
+def _match_scopes(patterns: Optional[List[str]], scopes: pd.Series) -> List[str]:
+    """Scopes whose name contains any pattern (case-insensitive); all scopes when none are given"""
+    names = scopes.astype(str).tolist()
+    if not patterns:
+        return names
+    matched = [name for name in names if any(pattern.lower() in name.lower() for pattern in patterns)]
+    if not matched:
+        raise SystemExit(f"No scope matches {patterns}")
+    return matched
+
+
+def main():
+    from pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Evaluate market share reallocation scenarios")
+    parser.add_argument('file_path', nargs='?', default="2020BidData.xlsx",
+                        help='Bid workbook, or a directory / glob pattern of workbooks')
+    parser.add_argument('--scope', action='append',
+                        help='Consolidated scope (substring, case-insensitive; repeatable; default all scopes)')
+    parser.add_argument('--fractions', default='0:1:0.1',
+                        help="Fractions of the top firm's dollars to move: 'a,b,c' or start:stop:step")
+    parser.add_argument('--destination', choices=DESTINATIONS + ['both'], default='lbe',
+                        help='Where the moved dollars go')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='CSV file for the scenario results')
+    args = parser.parse_args()
+
+    print("=== MARKET SHARE SCENARIOS ===\n")
+    pipeline = Pipeline(file_path=args.file_path)
+    engine = ScenarioEngine(pipeline.get('hhi')['scope_sub_agg'], firm_lbe_flags(pipeline.get('consolidate')))
+    scopes = _match_scopes(args.scope, engine.markets['ScopeOfWork'])
+    destinations = DESTINATIONS if args.destination == 'both' else [args.destination]
+    results = engine.evaluate(scenario_grid(scopes, _parse_fractions(args.fractions), destinations))
+
+    for scope, group in list(results.groupby('ScopeOfWork', sort=False))[:10]:
+        first = group.iloc[0]
+        print(f"{scope}: top firm {first['SourceFirm']}, HHI {first['BaseHHI']:,.0f}, "
+              f"LBE share {first['BaseLBEShare']:.1%}")
+        for _, row in group.iterrows():
+            print(f"  move {row['Fraction']:>4.0%} -> {row['Destination']:<7} HHI {row['ScenarioHHI']:>7,.0f} "
+                  f"({row['ConcentrationLevel']}), LBE share {row['ScenarioLBEShare']:.1%}")
+    if len(scopes) > 10:
+        print(f"... and {len(scopes) - 10} more scopes")
+
+    write_frames({args.output: results})
+    print(f"\n{len(results):,} scenarios written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
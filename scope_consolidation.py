@@ -0,0 +1,317 @@
+"""
+Scope Consolidation Engine
+Compiles the keyword/exclude consolidation rules in scope_consolidation_rules.json
+once and classifies each distinct 'ScopeOfWork' string a single time, broadcasting
+the result back to every row.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import write_frames
+from bid_data import CACHE_DIR
+
+
+UNKNOWN_SCOPE = "Unknown/Unspecified Scope"
+
+RULES_FILE = 'scope_consolidation_rules.json'
+MAPPING_FILE = 'consolidated_analysis/scope_consolidation_mapping.csv'
+
+
+def load_rules(rules_path: str = RULES_FILE) -> Tuple[Dict, str]:
+    """
+    Load the consolidation rules file.
+
+    Categories are checked in file order: the first whose keywords match and whose
+    excludes don't wins, so broader categories must come after the ones they would
+    swallow.
+
+    Returns:
+        Tuple of (rules keyed by category, SHA-256 of the file contents)
+    """
+    with open(rules_path, 'rb') as handle:
+        raw = handle.read()
+    rules = json.loads(raw.decode('utf-8'))['rules']
+    return rules, hashlib.sha256(raw).hexdigest()
+
+
+def classify_scope(original_scope, rules: Dict) -> str:
+    """
+    Determine the consolidated scope category for a single original scope.
+
+    Row-wise reference implementation of the rules; ScopeMatcher produces the
+    same result for whole columns.
+    """
+    # Handle NaN values
+    if pd.isna(original_scope):
+        return UNKNOWN_SCOPE
+
+    scope_lower = str(original_scope).lower().strip()
+
+    for category, rule in rules.items():
+        # Check if any keywords match
+        has_keyword = any(keyword in scope_lower for keyword in rule['keywords'])
+        # Check if any exclude terms match
+        has_exclude = any(exclude in scope_lower for exclude in rule['exclude'])
+
+        if has_keyword and not has_exclude:
+            return rule['consolidated_name']
+
+    # If no consolidation rule matches, keep original (but clean it)
+    return str(original_scope).strip()
+
+
+class ScopeMatcher:
+    """
+    Consolidation rules compiled into a term index.
+
+    Every distinct keyword/exclude term is searched once per distinct scope string
+    (a vectorized substring scan), giving a scope x term presence matrix. Two
+    term x category incidence matrices turn that into keyword and exclude hits per
+    category, and the first category with a keyword hit and no exclude hit wins,
+    exactly as in classify_scope. Results are memoized per scope string, so only
+    strings not seen by an earlier call are scanned.
+    """
+
+    def __init__(self, rules: Dict, rules_hash: Optional[str] = None):
+        self.rules = rules
+        self.rules_hash = rules_hash
+        self.categories: List[str] = list(rules)
+        self.names = np.array([rule['consolidated_name'] for rule in rules.values()], dtype=object)
+
+        self.terms: List[str] = sorted({
+            term for rule in rules.values() for term in rule['keywords'] + rule['exclude']
+        })
+        term_index = {term: i for i, term in enumerate(self.terms)}
+        self.keyword_matrix = np.zeros((len(self.terms), len(self.categories)), dtype=bool)
+        self.exclude_matrix = np.zeros((len(self.terms), len(self.categories)), dtype=bool)
+        for j, rule in enumerate(rules.values()):
+            self.keyword_matrix[[term_index[t] for t in rule['keywords']], j] = True
+            self.exclude_matrix[[term_index[t] for t in rule['exclude']], j] = True
+
+        self._memo: Dict[str, str] = {}
+        self._dirty = False
+
+    def _classify_unique(self, scopes: pd.Series) -> np.ndarray:
+        """Classify distinct, non-null scope values in one vectorized pass"""
+        original = scopes.astype(str)
+        lowered = original.str.lower().str.strip()
+
+        presence = np.zeros((len(lowered), len(self.terms)), dtype=bool)
+        for i, term in enumerate(self.terms):
+            presence[:, i] = lowered.str.contains(term, regex=False).to_numpy(dtype=bool)
+
+        keyword_hit = (presence.astype(np.int32) @ self.keyword_matrix.astype(np.int32)) > 0
+        exclude_hit = (presence.astype(np.int32) @ self.exclude_matrix.astype(np.int32)) > 0
+        matched = keyword_hit & ~exclude_hit
+
+        labels = original.str.strip().to_numpy(dtype=object)
+        has_match = matched.any(axis=1)
+        if len(self.categories):
+            first = matched.argmax(axis=1)
+            labels[has_match] = self.names[first[has_match]]
+        return labels
+
+    def classify(self, scopes: pd.Series) -> pd.Series:
+        """
+        Map a column of original scope strings to consolidated scope names.
+
+        Args:
+            scopes: Original 'ScopeOfWork' values (may contain NaN)
+
+        Returns:
+            Series of consolidated scope names aligned with the input
+        """
+        codes, uniques = pd.factorize(scopes)
+        uniques = pd.Series(uniques, dtype=object)
+
+        keys = uniques.astype(str)
+        unseen = ~keys.isin(self._memo.keys())
+        if unseen.any():
+            new_labels = self._classify_unique(uniques[unseen])
+            self._memo.update(zip(keys[unseen], new_labels))
+            self._dirty = True
+
+        labels = np.append(keys.map(self._memo).to_numpy(dtype=object), UNKNOWN_SCOPE)
+        # factorize codes missing values as -1, which picks the trailing UNKNOWN_SCOPE
+        return pd.Series(labels[codes], index=scopes.index)
+
+
+    def to_state(self) -> Dict:
+        """Return the compiled index and memo as plain data for caching"""
+        return {
+            'rules': self.rules,
+            'rules_hash': self.rules_hash,
+            'terms': self.terms,
+            'keyword_matrix': self.keyword_matrix,
+            'exclude_matrix': self.exclude_matrix,
+            'memo': self._memo,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'ScopeMatcher':
+        """Rebuild a matcher from to_state() output without recompiling the rules"""
+        matcher = cls.__new__(cls)
+        matcher.rules = state['rules']
+        matcher.rules_hash = state['rules_hash']
+        matcher.categories = list(state['rules'])
+        matcher.names = np.array([rule['consolidated_name'] for rule in state['rules'].values()], dtype=object)
+        matcher.terms = state['terms']
+        matcher.keyword_matrix = state['keyword_matrix']
+        matcher.exclude_matrix = state['exclude_matrix']
+        matcher._memo = state['memo']
+        matcher._dirty = False
+        return matcher
+
+    def inherit(self, previous: 'ScopeMatcher') -> List[str]:
+        """
+        Take over another matcher's memo, reclassifying only the scopes a rule change can affect.
+
+        A category that was added, removed or edited can only change the result for
+        scopes containing one of its keywords (old or new version): any other scope
+        fails that category in both versions, and every untouched category behaves
+        the same. If the untouched categories were reordered, everything is redone.
+
+        Returns:
+            Scope strings whose consolidated name changed
+        """
+        old_rules, new_rules = previous.rules, self.rules
+        changed = [c for c in set(old_rules) | set(new_rules) if old_rules.get(c) != new_rules.get(c)]
+        kept_old = [c for c in old_rules if c not in changed]
+        kept_new = [c for c in new_rules if c not in changed]
+
+        scopes = pd.Series(list(previous._memo), dtype=object)
+        if kept_old != kept_new:
+            affected = pd.Series(True, index=scopes.index)
+        else:
+            keywords = {kw for c in changed for rules in (old_rules, new_rules)
+                        if c in rules for kw in rules[c]['keywords']}
+            lowered = scopes.str.lower().str.strip()
+            affected = pd.Series(False, index=scopes.index)
+            for keyword in keywords:
+                affected |= lowered.str.contains(keyword, regex=False)
+
+        self._memo = {key: label for key, label in previous._memo.items()}
+        relabelled = []
+        if affected.any():
+            new_labels = self._classify_unique(scopes[affected])
+            for key, label in zip(scopes[affected], new_labels):
+                if self._memo[key] != label:
+                    relabelled.append(key)
+                self._memo[key] = label
+        self._dirty = True
+        return relabelled
+
+
+def _matcher_cache_path(rules_hash: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"scope_matcher-{rules_hash[:16]}.pkl")
+
+
+def save_matcher(matcher: ScopeMatcher, cache_dir: str = CACHE_DIR):
+    """Persist a compiled matcher (including its memo) keyed by its rules hash"""
+    if matcher.rules_hash is None or not matcher._dirty:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _matcher_cache_path(matcher.rules_hash, cache_dir)
+    with open(f"{path}.tmp", 'wb') as handle:
+        pickle.dump(matcher.to_state(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    with open(os.path.join(cache_dir, 'scope_matcher-latest.txt'), 'w') as handle:
+        handle.write(matcher.rules_hash)
+    matcher._dirty = False
+
+
+def load_matcher(rules_path: str = RULES_FILE, cache_dir: str = CACHE_DIR) -> Tuple[ScopeMatcher, List[str]]:
+    """
+    Return the compiled matcher for a rules file, using the on-disk index when possible.
+
+    On a cache miss the matcher is compiled and, if an index for an earlier version
+    of the rules exists, seeded from it so only the affected scopes are reclassified.
+
+    Returns:
+        Tuple of (matcher, scope strings relabelled by the rule change)
+    """
+    rules, rules_hash = load_rules(rules_path)
+    path = _matcher_cache_path(rules_hash, cache_dir)
+    if os.path.exists(path):
+        with open(path, 'rb') as handle:
+            return ScopeMatcher.from_state(pickle.load(handle)), []
+
+    matcher = ScopeMatcher(rules, rules_hash)
+    relabelled: List[str] = []
+    latest_file = os.path.join(cache_dir, 'scope_matcher-latest.txt')
+    if os.path.exists(latest_file):
+        with open(latest_file) as handle:
+            previous_path = _matcher_cache_path(handle.read().strip(), cache_dir)
+        if os.path.exists(previous_path):
+            with open(previous_path, 'rb') as handle:
+                relabelled = matcher.inherit(ScopeMatcher.from_state(pickle.load(handle)))
+    save_matcher(matcher, cache_dir)
+    return matcher, relabelled
+
+
+_default_matcher: Optional[ScopeMatcher] = None
+_default_rules_stat: Optional[Tuple[int, int]] = None
+
+
+def get_default_matcher(rules_path: str = RULES_FILE) -> ScopeMatcher:
+    """
+    Return the process-wide matcher, reloading it when the rules file changes on disk.
+    """
+    global _default_matcher, _default_rules_stat
+    stat = os.stat(rules_path)
+    rules_stat = (stat.st_mtime_ns, stat.st_size)
+    if _default_matcher is None or rules_stat != _default_rules_stat:
+        if _default_matcher is not None:
+            save_matcher(_default_matcher)
+        _default_matcher, relabelled = load_matcher(rules_path)
+        _default_rules_stat = rules_stat
+        if relabelled:
+            print(f"Consolidation rules changed: {len(relabelled)} scopes reclassified")
+    return _default_matcher
+
+
+def refresh_scope_mapping(mapping_path: str = MAPPING_FILE, rules_path: str = RULES_FILE) -> pd.DataFrame:
+    """
+    Bring the scope consolidation mapping in line with the current rules in place.
+
+    Only rows whose consolidated name changed are rewritten; the file is left
+    untouched when nothing changed.
+
+    Returns:
+        The changed rows with their previous ('PreviousScope') and new names
+    """
+    mapping = pd.read_csv(mapping_path)
+    matcher = get_default_matcher(rules_path)
+    updated = matcher.classify(mapping['OriginalScope'])
+    changed = updated != mapping['ScopeOfWork']
+
+    diff = mapping[changed].rename(columns={'ScopeOfWork': 'PreviousScope'})
+    diff['ScopeOfWork'] = updated[changed]
+    if changed.any():
+        mapping.loc[changed, 'ScopeOfWork'] = updated[changed]
+        mapping = mapping.sort_values('ScopeOfWork', kind='stable')
+        write_frames({mapping_path: mapping})
+    save_matcher(matcher)
+    return diff
+
+
+if __name__ == "__main__":
+    print("=== REFRESHING SCOPE CONSOLIDATION MAPPING ===\n")
+    changes = refresh_scope_mapping()
+    if changes.empty:
+        print(f"{MAPPING_FILE} is up to date")
+    else:
+        print(f"Updated {len(changes)} scopes in {MAPPING_FILE}:")
+        for _, row in changes.iterrows():
+            print(f"  {row['OriginalScope']}: {row['PreviousScope']} -> {row['ScopeOfWork']}")
+        touched = sorted(set(changes['PreviousScope']) | set(changes['ScopeOfWork']))
+        print(f"\nConsolidated scopes needing re-aggregation: {len(touched)}")
+        for scope in touched:
+            print(f"  {scope}")
@@ -0,0 +1,43 @@
+"""
+Artifact Writer Tests
+Rewritten artifacts keep their permissions and new ones get the umask's.
+"""
+
+import os
+import stat
+
+import pandas as pd
+
+from artifacts import ArtifactWriter, write_atomic
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_umask_mode(tmp_path):
+    umask = os.umask(0)
+    os.umask(umask)
+    path = tmp_path / 'table.csv'
+    write_atomic(str(path), b'a\n')
+    assert _mode(path) == 0o666 & ~umask
+
+
+def test_rewrite_keeps_mode(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_bytes(b'old\n')
+    os.chmod(path, 0o640)
+    writer = ArtifactWriter()
+    writer.add(str(path), pd.DataFrame({'a': [1, 2]}))
+    assert writer.write()[str(path)]['written']
+    assert path.read_bytes() == b'a\n1\n2\n'
+    assert _mode(path) == 0o640
+
+
+def test_writer_without_manifest_skips_unchanged(tmp_path):
+    path = tmp_path / 'table.json'
+    for expected in [True, False]:
+        writer = ArtifactWriter(manifest=False)
+        writer.add(str(path), pd.DataFrame({'a': [1, 2]}))
+        assert writer.write()[str(path)]['written'] is expected
+    assert sorted(os.listdir(tmp_path)) == ['table.json']
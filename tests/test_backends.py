@@ -0,0 +1,100 @@
+"""
+Backend Parity Tests
+The DuckDB backend must give the pandas backend's results on small frames
+covering the edge cases the benchmark's synthetic data rarely hits: missing
+keys, scopes with no dollars, single-firm scopes and tied amounts.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backends import PandasBackend, get_backend
+
+pytest.importorskip('duckdb')
+
+
+def _comparable(frame: pd.DataFrame) -> pd.DataFrame:
+    """Text and categorical columns (and the index) as plain objects"""
+    frame = frame.copy()
+    for col in frame.columns:
+        if not (pd.api.types.is_numeric_dtype(frame[col]) or pd.api.types.is_bool_dtype(frame[col])):
+            frame[col] = frame[col].astype(object)
+    if not isinstance(frame.index, pd.RangeIndex):
+        frame.index = frame.index.astype(object)
+    return frame
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(_comparable(actual), _comparable(expected), check_dtype=False,
+                                  check_exact=False, rtol=1e-12)
+
+
+@pytest.fixture(scope='module')
+def duckdb_backend():
+    return get_backend('duckdb', threads=1)
+
+
+@pytest.fixture
+def records() -> pd.DataFrame:
+    """Subcontractor records with one of each edge case"""
+    return pd.DataFrame({
+        'ScopeOfWork': ['Paving', 'Paving', 'Paving', 'Electrical', 'Electrical', 'Signage', 'Signage',
+                        'Landscaping', None, 'Paving', 'Fencing'],
+        'SubcontractorName': ['A Co', 'B Co', 'A Co', 'C Co', 'D Co', 'E Co', 'F Co', 'G Co', 'H Co', None,
+                              'I Co'],
+        # Electrical is a two-way tie, Signage has no dollars, Landscaping one firm
+        'SubAmount': [100.0, 50.0, 25.0, 300.0, 300.0, 0.0, 0.0, 80.0, 40.0, 10.0, np.nan],
+        'ContractID': [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6],
+        'is_lbe': [True, False, True, True, False, False, True, False, True, False, True],
+    })
+
+
+def test_aggregate_scope_subcontractors(records, duckdb_backend):
+    expected = PandasBackend().aggregate_scope_subcontractors(records)
+    actual = duckdb_backend.aggregate_scope_subcontractors(records)
+    assert_same(actual, expected)
+    assert expected['ScopeOfWork'].notna().all() and expected['SubcontractorName'].notna().all()
+
+
+def test_concentration_tables(records, duckdb_backend):
+    agg = PandasBackend().aggregate_scope_subcontractors(records)
+    expected = PandasBackend().concentration_tables(agg)
+    actual = duckdb_backend.concentration_tables(agg)
+    for left, right in zip(actual, expected):
+        assert_same(left, right)
+
+    hhi = expected[1].set_index('ScopeOfWork')
+    assert hhi.loc['Signage', 'ScopeHHI'] == 0
+    assert hhi.loc['Signage', 'ConcentrationLevel'] == 'Unconcentrated'
+    assert hhi.loc['Landscaping', 'ScopeHHI'] == 10000
+    assert hhi.loc['Electrical', 'ScopeHHI'] == pytest.approx(5000)
+    shares = expected[0].set_index(['ScopeOfWork', 'SubcontractorName'])['ShareOfScope']
+    assert shares.loc['Signage'].isna().all()
+
+
+def test_concentration_tables_single_firm(duckdb_backend):
+    agg = pd.DataFrame({'ScopeOfWork': ['Paving'], 'SubcontractorName': ['A Co'], 'TotalSubAmount': [5.0]})
+    for left, right in zip(duckdb_backend.concentration_tables(agg), PandasBackend().concentration_tables(agg)):
+        assert_same(left, right)
+
+
+def test_lbe_breakdown(records, duckdb_backend):
+    records = records.rename(columns={'ScopeOfWork': 'Scope of Work', 'SubAmount': 'SUB $$ '})
+    assert_same(duckdb_backend.lbe_breakdown(records), PandasBackend().lbe_breakdown(records))
+
+
+def test_competitive_scopes_ties(duckdb_backend):
+    breakdown = pd.DataFrame({
+        'Has_LBE': [True, True, True, False],
+        'Has_NonLBE': [True, True, True, True],
+        'Total_Dollars': [500.0, 900.0, 500.0, 700.0],
+        'LBE_Dollar_Share': [0.2, 0.5, 0.4, 0.0],
+        'LBE_Count': [1, 2, 1, 0],
+        'NonLBE_Count': [3, 1, 2, 4],
+    }, index=pd.Index(['Zeta', 'Alpha', 'Beta', 'Gamma'], name='Scope of Work'))
+    expected = PandasBackend().competitive_scopes(breakdown, min_value=100)
+    actual = duckdb_backend.competitive_scopes(breakdown, min_value=100)
+    assert_same(actual, expected)
+    # Tied values keep scope order
+    assert expected['Scope'].tolist() == ['Alpha', 'Zeta', 'Beta']
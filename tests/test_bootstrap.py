@@ -0,0 +1,46 @@
+"""
+Bootstrap Tests
+Every market draws from its own random stream, so the confidence intervals
+must not depend on how many workers share the markets.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_concentration import aggregate_scope_subcontractors, bootstrap_concentration, concentration_tables
+
+
+@pytest.fixture(scope='module')
+def records() -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    n = 400
+    records = pd.DataFrame({
+        'ScopeOfWork': rng.choice([f"Scope {i}" for i in range(15)], n),
+        'SubcontractorName': rng.choice([f"Firm {i}" for i in range(25)], n),
+        'ContractID': rng.integers(0, 60, n),
+        'SubAmount': rng.gamma(2.0, 1000.0, n).round(2),
+    })
+    # One market with a single contract, one with a single firm
+    single = pd.DataFrame({'ScopeOfWork': ['Single Contract'] * 2, 'SubcontractorName': ['Firm 1', 'Firm 2'],
+                           'ContractID': [99, 99], 'SubAmount': [300.0, 100.0]})
+    monopoly = pd.DataFrame({'ScopeOfWork': ['Monopoly'] * 3, 'SubcontractorName': ['Firm 3'] * 3,
+                             'ContractID': [1, 2, 3], 'SubAmount': [10.0, 20.0, 30.0]})
+    return pd.concat([records, single, monopoly], ignore_index=True)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_same_result_for_any_worker_count(records, workers):
+    serial = bootstrap_concentration(records, n_resamples=200, max_workers=1)
+    pooled = bootstrap_concentration(records, n_resamples=200, max_workers=workers)
+    pd.testing.assert_frame_equal(pooled, serial)
+
+
+def test_degenerate_markets_have_point_intervals(records):
+    intervals = bootstrap_concentration(records, n_resamples=200, max_workers=1).set_index('ScopeOfWork')
+    _, hhi = concentration_tables(aggregate_scope_subcontractors(records))
+    hhi = hhi.set_index('ScopeOfWork')['ScopeHHI']
+    for market in ['Single Contract', 'Monopoly']:
+        assert intervals.loc[market, 'ScopeHHI_Lower'] == pytest.approx(hhi[market])
+        assert intervals.loc[market, 'ScopeHHI_Upper'] == pytest.approx(hhi[market])
+    assert intervals.loc['Monopoly', 'P_Highly_Concentrated'] == 1.0
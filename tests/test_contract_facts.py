@@ -0,0 +1,63 @@
+"""
+Contract Fact Table Tests
+The fact tables are built from a small bid sheet, with and without the optional
+bid, award, estimate and requirement columns.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from contract_facts import contract_facts, requirement_attainment
+
+OPTIONAL = ['Contract Amount Bid', 'Contract Award Amount (Awarded)', 'Engineers Estimate', 'lbe_requirement']
+
+
+@pytest.fixture
+def bids() -> pd.DataFrame:
+    """Two contracts in sheet order: C1 has two bids (the second wins), C2 one"""
+    rows = [
+        # Contract, Contractor Name, role, LBE, awarded, SUB $$, bid, award, estimate, requirement
+        ('C1', 'Prime A', 'Prime', False, 'N', np.nan, '$1,000', 900.0, 1000.0, 0.2),
+        ('C1', 'Sub X', 'Sub', True, np.nan, 300.0, np.nan, 900.0, 1000.0, 0.2),
+        ('C1', 'Prime B', 'Prime', True, 'Y', np.nan, '$900', 900.0, 1000.0, 0.2),
+        ('C1', 'Sub Y', 'Sub', True, np.nan, 270.0, np.nan, 900.0, 1000.0, 0.2),
+        ('C1', 'Sub Z', 'Sub', False, np.nan, 90.0, np.nan, 900.0, 1000.0, 0.2),
+        ('C2', 'Prime A', 'Prime', False, 'Y', np.nan, '500', 500.0, np.nan, np.nan),
+    ]
+    frame = pd.DataFrame(rows, columns=['Contract', 'Contractor Name', 'Sub/Prime', 'is_lbe', 'Awarded Contract?',
+                                        'SUB $$ ', *OPTIONAL])
+    return frame.assign(is_prime=frame['Sub/Prime'].eq('Prime'), is_sub=frame['Sub/Prime'].eq('Sub'),
+                        **{'Scope of Work': 'Paving'})
+
+
+def test_contract_metrics(bids):
+    contracts, bid_facts = contract_facts(bids)
+    c1 = contracts.loc['C1']
+    assert c1['WinningPrime'] == 'Prime B'
+    assert c1['NumBids'] == 2 and c1['LowBid'] == 900
+    assert c1['AwardVsEstimate'] == pytest.approx(-0.1)
+    assert c1['LBEAttainment'] == pytest.approx(0.3)
+    assert bool(c1['MeetsRequirement'])
+    assert pd.isna(contracts.loc['C2', 'MeetsRequirement'])
+    assert bid_facts.loc[('C1', 'Prime A'), 'LBESubDollars'] == 300
+
+
+@pytest.mark.parametrize('dropped', OPTIONAL)
+def test_optional_column_missing(bids, dropped):
+    contracts, bid_facts = contract_facts(bids.drop(columns=dropped))
+    assert contracts.loc['C1', 'WinningPrime'] == 'Prime B'
+    assert contracts.loc['C1', 'SubDollars'] == 360
+    derived = {
+        'Contract Amount Bid': ['LowBid', 'WinningBid'],
+        'Contract Award Amount (Awarded)': ['AwardVsEstimate', 'SubShareOfAward', 'LBEAttainment'],
+        'Engineers Estimate': ['AwardVsEstimate', 'LowBidVsEstimate'],
+        'lbe_requirement': ['MeetsRequirement'],
+    }[dropped]
+    assert contracts[derived].isna().all().all()
+    requirement_attainment(contracts)
+
+
+def test_required_column_missing(bids):
+    with pytest.raises(ValueError, match='Awarded Contract'):
+        contract_facts(bids.drop(columns='Awarded Contract?'))
@@ -0,0 +1,48 @@
+"""
+Currency Parsing Tests
+clean_currency_series must give exactly what clean_currency gives cell by cell,
+for every kind of column the workbooks produce.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bid_data import clean_currency, clean_currency_series
+
+
+CELLS = ['$1,200', '(500)', '($1,234.50)', '15%', ' $ 42 ', '', '   ', 'N/A', 'TBD', '1e3', '-7.25', '+3',
+         '.5', '1,2,3', '$', '()', 'nan', 'inf', '-', '0', '$0.00', '12 345', '1.2.3', '$(100)']
+
+
+def assert_matches_rowwise(values: pd.Series):
+    expected = pd.Series([clean_currency(value) for value in values], index=values.index, dtype='float64')
+    pd.testing.assert_series_equal(clean_currency_series(values), expected, check_names=False)
+
+
+@pytest.mark.parametrize('cells', [
+    pytest.param(CELLS, id='text'),
+    pytest.param(CELLS + [1200, 3.5, np.nan, None, -40, np.int64(7), np.float64(2.25)], id='mixed-object'),
+    pytest.param([np.nan, None], id='all-missing'),
+    pytest.param([], id='empty'),
+])
+def test_object_columns(cells):
+    assert_matches_rowwise(pd.Series(cells, dtype=object))
+
+
+def test_string_dtype_column():
+    assert_matches_rowwise(pd.Series(CELLS + [None], dtype='string'))
+
+
+@pytest.mark.parametrize('values', [
+    pd.Series([1, 2, -3], dtype='int64'),
+    pd.Series([1.5, np.nan, -0.0]),
+    pd.Series([True, False]),
+])
+def test_numeric_columns(values):
+    assert_matches_rowwise(values)
+
+
+def test_keeps_index():
+    values = pd.Series(['$5', 6, None], index=[10, 3, 7], dtype=object)
+    assert clean_currency_series(values).index.tolist() == [10, 3, 7]
@@ -0,0 +1,39 @@
+"""
+Dashboard Export Tests
+Missing values must be written as null in every column type, and refreshing the
+CSV-backed tables must keep the JSON-only tables in the manifest.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from dashboard_export import columnar_table, export_csv_directory, export_dashboard, load_dashboard_manifest
+
+
+def test_missing_booleans_are_null():
+    table = columnar_table(pd.DataFrame({
+        'flag': [True, False, True],
+        'nullable': pd.array([True, pd.NA, False], dtype='boolean'),
+        'amount': [1.0, np.nan, 2.5],
+        'name': ['A', None, 'A'],
+    }))
+    columns = {column['name']: column for column in table['columns']}
+    assert columns['flag']['values'] == [True, False, True]
+    assert columns['nullable'] == {'name': 'nullable', 'type': 'boolean', 'values': [True, None, False]}
+    assert columns['amount']['values'] == [1, None, 2.5]
+    assert columns['name']['codes'] == [0, None, 0]
+    json.dumps(table, allow_nan=False)
+
+
+def test_csv_refresh_keeps_json_only_tables(tmp_path):
+    frame = pd.DataFrame({'ScopeOfWork': ['Paving', 'Electrical'], 'ScopeHHI': [5000.0, 2500.0]})
+    frame.to_csv(tmp_path / 'market_concentration_hhi_consolidated.csv', index=False)
+    export_dashboard({'concentration_trends': frame.assign(WindowEnd='2020')}, str(tmp_path))
+
+    export_csv_directory(str(tmp_path))
+    tables = load_dashboard_manifest(str(tmp_path))['tables']
+    assert set(tables) == {'concentration_trends', 'market_concentration_hhi_consolidated'}
+    assert tables['market_concentration_hhi_consolidated']['rows'] == 2
+    assert not (tmp_path / '.artifacts.json').exists()
@@ -0,0 +1,85 @@
+"""
+Consolidated Aggregation Tests
+Streaming the records CSV in chunks, and aggregating it out of core, must give
+what aggregating the loaded records gives, firm name resolution included.
+"""
+
+import pandas as pd
+import pytest
+
+from backends import PandasBackend, consolidated_aggregation, get_backend
+from bid_data import compact_dtypes
+from enhanced_analysis import stream_consolidated_aggregation
+from firm_resolution import FirmResolver, resolve_firm_names
+from scope_consolidation import ScopeMatcher, load_rules
+
+COLUMNS = ['ScopeOfWork', 'SubcontractorName', 'TotalSubAmount', 'ContractsCount']
+
+
+@pytest.fixture
+def matcher(monkeypatch, tmp_path) -> ScopeMatcher:
+    rules, _ = load_rules()
+    # Keep resolver and matcher caches out of the repository
+    monkeypatch.chdir(tmp_path)
+    return ScopeMatcher(rules)
+
+
+@pytest.fixture
+def records_file(tmp_path) -> str:
+    """Records CSV with spelling variants of one firm spread over several chunks"""
+    path = tmp_path / 'records.csv'
+    pd.DataFrame({
+        'ContractID': [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6],
+        'ScopeOfWork': ['AC Paving', 'Electrical', 'AC paving', 'Landscaping', 'AC Paving', 'Electrical',
+                        'Asphalt Paving', 'Electrical', 'Landscaping', None, 'AC Paving'],
+        'SubcontractorName': ['Granite Paving Inc', 'Bright Electric', 'Granite Paving, Inc.', 'Green Tree Care',
+                              'Granite Paving, Inc.', 'Bright Electric', 'Bay Area Asphalt', 'Sparks Electrical',
+                              'Green Tree Care', 'Bay Area Asphalt', 'Granite Paving Inc'],
+        'SubAmount': [100.0, 40.0, 60.0, 25.0, 80.0, 30.0, 20.0, 90.0, 15.0, 5.0, 10.0],
+        'is_lbe': [True, False, True, True, False, False, False, True, True, False, True],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def in_memory(records_file: str, matcher: ScopeMatcher) -> pd.DataFrame:
+    """The aggregation enhanced_analysis computes from the loaded records"""
+    records = resolve_firm_names(compact_dtypes(pd.read_csv(records_file)), column='SubcontractorName',
+                                 resolver=FirmResolver())
+    consolidated = records.assign(OriginalScope=records['ScopeOfWork'],
+                                  ScopeOfWork=matcher.classify(records['ScopeOfWork']))
+    return PandasBackend().aggregate_scope_subcontractors(consolidated)
+
+
+def sorted_table(table: pd.DataFrame) -> pd.DataFrame:
+    table = table[COLUMNS].astype({'ScopeOfWork': object, 'SubcontractorName': object})
+    return table.sort_values(COLUMNS[:2]).reset_index(drop=True)
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(sorted_table(actual), sorted_table(expected), check_dtype=False,
+                                  check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 100])
+def test_streamed_matches_in_memory(records_file, matcher, chunksize):
+    streamed, mapping = stream_consolidated_aggregation(records_file, chunksize, matcher, FirmResolver())
+    expected = in_memory(records_file, matcher)
+    assert_same(streamed, expected)
+    assert {'Granite Paving Inc', 'Granite Paving, Inc.'} & set(streamed['SubcontractorName']) == {'Granite Paving Inc'}
+    scopes = pd.read_csv(records_file)['ScopeOfWork'].drop_duplicates().reset_index(drop=True)
+    pd.testing.assert_series_equal(mapping['OriginalScope'], scopes, check_dtype=False, check_names=False)
+
+
+def test_streaming_empty_records(tmp_path, matcher):
+    path = tmp_path / 'empty.csv'
+    path.write_text('ContractID,ScopeOfWork,SubcontractorName,SubAmount,is_lbe\n')
+    agg, mapping = stream_consolidated_aggregation(str(path), 2, matcher, FirmResolver())
+    assert agg.empty and list(agg.columns) == COLUMNS
+    assert mapping.empty and list(mapping.columns) == ['OriginalScope', 'ScopeOfWork']
+
+
+def test_duckdb_records_file_matches_in_memory(records_file, matcher):
+    pytest.importorskip('duckdb')
+    agg, _ = consolidated_aggregation(get_backend('duckdb', threads=1), records_file, matcher,
+                                      resolver=FirmResolver())
+    assert_same(agg, in_memory(records_file, matcher))
@@ -0,0 +1,97 @@
+"""
+Firm Network Tests
+The sparse prime x sub and sub x scope tables must match the same figures
+computed with pandas groupbys over the links.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from firm_network import FirmNetwork
+
+
+@pytest.fixture(scope='module')
+def links() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    n = 800
+    return pd.DataFrame({
+        'BidID': rng.integers(0, 200, n),
+        'ContractID': rng.integers(0, 60, n),
+        'PrimeName': rng.choice([f"Prime {i}" for i in range(12)], n),
+        'Awarded': rng.random(n) < 0.3,
+        'SubcontractorName': rng.choice([f"Sub {i}" for i in range(40)], n),
+        'ScopeOfWork': rng.choice(['Paving', 'Electrical', 'Trucking', 'Survey', None], n, p=[.3, .3, .2, .15, .05]),
+        'SubAmount': rng.gamma(2.0, 1000.0, n).round(2),
+        # Varies within a firm: the network takes each sub's first subcontract
+        'is_lbe': rng.random(n) < 0.4,
+    })
+
+
+def pair_table(links: pd.DataFrame, first: str, second: str) -> pd.DataFrame:
+    return links.groupby([first, second]).agg(Dollars=('SubAmount', 'sum'), Contracts=('ContractID', 'nunique'))
+
+
+@pytest.mark.parametrize('awarded_only', [False, True])
+def test_prime_concentration_matches_groupby(links, awarded_only):
+    network = FirmNetwork(links, awarded_only)
+    kept = links[links['ScopeOfWork'].notna() & (links['Awarded'] | (not awarded_only))]
+    dominant = {'Sub 1', 'Sub 2', 'Sub 3'}
+    actual = network.prime_concentration(dominant).set_index('PrimeName').sort_index()
+
+    pairs = pair_table(kept, 'PrimeName', 'SubcontractorName')['Dollars']
+    shares = pairs / pairs.groupby(level=0).transform('sum')
+    sub_lbe = kept.groupby('SubcontractorName')['is_lbe'].first()
+    subs = pairs.index.get_level_values(1)
+    expected = pd.DataFrame({
+        'NumSubs': pairs.groupby(level=0).size(),
+        'TotalSubDollars': pairs.groupby(level=0).sum(),
+        'PartnerHHI': (shares ** 2).groupby(level=0).sum() * 10000,
+        'TopSub': pairs.groupby(level=0).idxmax().str[1],
+        'TopSubShare': shares.groupby(level=0).max(),
+        'LBEDollarShare': shares[sub_lbe.reindex(subs).to_numpy()].groupby(level=0).sum()
+                          .reindex(pairs.index.unique(0), fill_value=0.0),
+        'DominantSubShare': shares[np.isin(subs, list(dominant))].groupby(level=0).sum()
+                            .reindex(pairs.index.unique(0), fill_value=0.0),
+    })
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False, check_index_type=False,
+                                  check_names=False, check_exact=False, rtol=1e-9)
+
+
+def test_sub_exclusivity_matches_groupby(links):
+    network = FirmNetwork(links)
+    kept = links[links['ScopeOfWork'].notna()]
+    actual = network.sub_exclusivity().set_index('SubcontractorName').sort_index()
+
+    pairs = pair_table(kept, 'SubcontractorName', 'PrimeName')['Dollars']
+    expected = pd.DataFrame({
+        'is_lbe': kept.groupby('SubcontractorName')['is_lbe'].first(),
+        'NumPrimes': pairs.groupby(level=0).size(),
+        'TotalDollars': pairs.groupby(level=0).sum(),
+        'TopPrime': pairs.groupby(level=0).idxmax().str[1],
+        'ExclusivityRatio': pairs.groupby(level=0).max() / pairs.groupby(level=0).sum(),
+    })
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False, check_index_type=False,
+                                  check_names=False, check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('firm, first, second', [('Prime 4', 'PrimeName', 'SubcontractorName'),
+                                                 ('Sub 7', 'SubcontractorName', 'PrimeName')])
+def test_top_partners_match_groupby(links, firm, first, second):
+    kept = links[links['ScopeOfWork'].notna()]
+    actual = FirmNetwork(links).top_partners(firm, n=5)
+
+    pairs = pair_table(kept[kept[first] == firm], first, second).droplevel(0)
+    expected = pairs.sort_values('Dollars', ascending=False).head(5)
+    assert actual['Partner'].tolist() == expected.index.tolist()
+    np.testing.assert_allclose(actual['Dollars'], expected['Dollars'], rtol=1e-9)
+    assert actual['Contracts'].tolist() == expected['Contracts'].tolist()
+    np.testing.assert_allclose(actual['Share'], expected['Dollars'] / pairs['Dollars'].sum(), rtol=1e-9)
+
+
+def test_sub_scopes_match_groupby(links):
+    kept = links[links['ScopeOfWork'].notna() & (links['SubcontractorName'] == 'Sub 9')]
+    actual = FirmNetwork(links).sub_scopes('Sub 9')
+    expected = kept.groupby('ScopeOfWork')['SubAmount'].sum().sort_values(ascending=False)
+    assert actual['ScopeOfWork'].tolist() == expected.index.tolist()
+    np.testing.assert_allclose(actual['Share'], expected / expected.sum(), rtol=1e-9)
@@ -0,0 +1,50 @@
+"""
+Firm Resolution Tests
+Clusters must not depend on the order names arrive in, including when a
+blocking key becomes too common to compare in.
+"""
+
+import numpy as np
+
+from firm_resolution import FirmResolver
+
+PAIR = ['Abc Granite Paving Construction Services Group', 'Abd Granite Paving Construction Services Group']
+# Every token of PAIR is shared with two of these, so with max_block_size=2 no token block is compared in
+FILLERS = ['Xylo Granite Works', 'Qrst Granite Supply', 'Zed Paving', 'Yot Paving', 'Wu Construction',
+           'Vee Construction', 'Ux Services', 'Ty Services', 'Sa Group', 'Ro Group']
+
+
+def clusters(names, max_block_size: int = 2, batches: int = None):
+    resolver = FirmResolver(max_block_size=max_block_size)
+    for batch in np.array_split(np.asarray(names, dtype=object), batches or len(names)):
+        resolver.add(batch)
+    return sorted(tuple(names) for names in resolver.clusters().values())
+
+
+def test_merges_spelling_variants():
+    assert clusters(['RK Engineering', 'Rk Engineering ', 'Professional Tree Care',
+                     'The Professional Tree Care Co.', 'Unit 1 Electric', 'Unit 2 Electric'], 50) == [
+        ('Professional Tree Care', 'The Professional Tree Care Co.'),
+        ('RK Engineering', 'Rk Engineering '),
+    ]
+
+
+def test_oversized_block_does_not_depend_on_arrival_order():
+    assert clusters(PAIR + FILLERS) == clusters(FILLERS + PAIR)
+
+
+def test_oversized_prefix_block_falls_back_to_longer_prefix():
+    names = ['Pacific Coast Paving General Contractors', 'Pacific Coast Pavng General Contractors',
+             'Pacific Coast Steel General Contractors', 'Pacific Coast Trucking General Contractors']
+    expected = [('Pacific Coast Paving General Contractors', 'Pacific Coast Pavng General Contractors')]
+    assert clusters(names) == expected
+    assert clusters(names[::-1]) == expected
+
+
+def test_shuffled_batches_give_the_same_clusters():
+    rng = np.random.default_rng(0)
+    names = PAIR + FILLERS + ['Pacific Coast Paving General Contractors', 'Pacific Coast Pavng General Contractors',
+                              'Pacific Coast Steel General Contractors', 'RK Engineering', 'Rk Engineering ']
+    expected = clusters(names, 3, 1)
+    for batches in [1, 3, len(names)]:
+        assert clusters([names[i] for i in rng.permutation(len(names))], 3, batches) == expected
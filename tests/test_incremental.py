@@ -0,0 +1,99 @@
+"""
+Incremental Pipeline Tests
+Ingesting bid drops one at a time must give the tables a full recompute over
+all of them gives, including when a later drop changes which spelling of a firm
+is canonical.
+"""
+
+import pandas as pd
+import pytest
+
+from backends import PandasBackend
+from bid_data import clean_contract_info, subcontractor_records
+from firm_resolution import FirmResolver, resolve_firm_names
+from incremental import derive_outputs, load_state, merge_batch, merge_bids, refresh_outputs
+from market_concentration import concentration_tables
+from scope_consolidation import ScopeMatcher, load_rules
+
+
+def bid_sheet(rows) -> pd.DataFrame:
+    """Cleaned "Contract Info" rows from (contract, scope, firm, role, LBE, sub dollars) tuples"""
+    raw = pd.DataFrame(rows, columns=['Contract', 'Scope of Work', 'Contractor Name', 'Sub/Prime', 'LBE? ',
+                                      'SUB $$ '])
+    raw['LBE Requirement'] = 20
+    return clean_contract_info(raw)
+
+
+FIRST = bid_sheet([
+    (1, 'Asphalt Paving', 'Granite Paving Inc', 'Sub', 'Y', 100.0),
+    (1, 'Electrical', 'Bright Electric', 'Sub', 'N', 40.0),
+    (1, None, 'Main Street Builders', 'Prime', 'N', None),
+    (2, 'Asphalt Paving', 'Bay Area Asphalt', 'Sub', 'N', 60.0),
+    (2, 'Landscaping', 'Green Tree Care', 'Sub', 'Y', 25.0),
+    (2, None, 'Main Street Builders', 'Prime', 'N', None),
+])
+# 'Granite Paving, Inc.' now outnumbers the spelling the first drop stored
+SECOND = bid_sheet([
+    (3, 'Asphalt Paving', 'Granite Paving, Inc.', 'Sub', 'Y', 80.0),
+    (3, 'Electrical', 'Bright Electric', 'Sub', 'N', 30.0),
+    (3, None, 'Granite Paving, Inc.', 'Prime', 'N', None),
+    (4, 'Asphalt Paving', 'Granite Paving, Inc.', 'Sub', 'N', 20.0),
+    (4, 'Electrical', 'Sparks Electrical Contractors', 'Sub', 'Y', 90.0),
+])
+
+
+@pytest.fixture
+def matcher(monkeypatch, tmp_path) -> ScopeMatcher:
+    rules, _ = load_rules()
+    # Keep resolver and matcher caches out of the repository
+    monkeypatch.chdir(tmp_path)
+    return ScopeMatcher(rules)
+
+
+def full_recompute(bids: pd.DataFrame, matcher: ScopeMatcher) -> pd.DataFrame:
+    """scope_sub_agg as pipeline.py derives it from every bid row at once"""
+    records = subcontractor_records(resolve_firm_names(bids, resolver=FirmResolver()))
+    records = records.assign(ScopeOfWork=matcher.classify(records['ScopeOfWork']))
+    scope_sub_agg, _ = concentration_tables(PandasBackend().aggregate_scope_subcontractors(records), 'ScopeOfWork')
+    return scope_sub_agg
+
+
+def ingest(batches, matcher: ScopeMatcher, state_dir) -> pd.DataFrame:
+    state = load_state(str(state_dir))
+    resolver = FirmResolver()
+    for bids in batches:
+        touched = merge_bids(state, bids, matcher, resolver)
+        refresh_outputs(state, touched, matcher)
+    return state['scope_sub_agg']
+
+
+def sorted_table(table: pd.DataFrame) -> pd.DataFrame:
+    columns = ['ScopeOfWork', 'SubcontractorName', 'TotalSubAmount', 'ContractsCount', 'ShareOfScope']
+    table = table[columns].astype({'ScopeOfWork': object, 'SubcontractorName': object})
+    return table.sort_values(['ScopeOfWork', 'SubcontractorName']).reset_index(drop=True)
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame):
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=False, rtol=1e-12)
+
+
+def test_incremental_matches_full_recompute(matcher, tmp_path):
+    incremental = ingest([FIRST, SECOND], matcher, tmp_path / 'state')
+    expected = full_recompute(pd.concat([FIRST, SECOND], ignore_index=True), matcher)
+    assert_same(sorted_table(incremental), sorted_table(expected))
+    assert 'Granite Paving, Inc.' in set(incremental['SubcontractorName'])
+    assert 'Granite Paving Inc' not in set(incremental['SubcontractorName'])
+
+
+def test_batch_order_does_not_matter(matcher, tmp_path):
+    forward = ingest([FIRST, SECOND], matcher, tmp_path / 'forward')
+    backward = ingest([SECOND, FIRST], matcher, tmp_path / 'backward')
+    assert_same(sorted_table(forward), sorted_table(backward))
+
+
+def test_zero_dollar_scope_has_zero_lbe_share(matcher, tmp_path):
+    state = load_state(str(tmp_path / 'state'))
+    records = subcontractor_records(FIRST).assign(SubAmount=0.0)
+    merge_batch(state, records, matcher)
+    lbe = derive_outputs(state['partitions'])['lbe']
+    assert (lbe['LBE_Dollar_Share'] == 0.0).all()
@@ -0,0 +1,37 @@
+"""
+Instrumentation Tests
+Memory tracing must leave a caller's tracemalloc session running, and a nested
+section must not hide the enclosing section's earlier peak.
+"""
+
+import tracemalloc
+
+from instrumentation import Run
+
+
+def test_keeps_tracing_started_elsewhere(tmp_path):
+    tracemalloc.start()
+    try:
+        Run('outer tracing', memory=True).finish(str(tmp_path))
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+    Run('own tracing', memory=True).finish(str(tmp_path))
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_section_keeps_outer_peak(tmp_path):
+    size = 20_000_000
+    run = Run('nested', memory=True)
+    with run.measure('outer'):
+        block = bytearray(size)
+        del block
+        with run.measure('inner'):
+            small = bytearray(1000)
+            del small
+    run.finish(str(tmp_path))
+
+    sections = {section['name']: section for section in run.sections}
+    assert sections['inner']['peak_allocated_bytes'] < size
+    assert sections['outer']['peak_allocated_bytes'] >= size
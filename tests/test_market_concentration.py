@@ -0,0 +1,53 @@
+"""
+Market Concentration Tests
+Ranks, cumulative shares and the dominance sweep must be computed per market,
+so a market with no dollars (NaN shares) does not affect the others.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_concentration import concentration_tables, dominance_sweep, rank_within_markets
+
+
+@pytest.fixture
+def agg() -> pd.DataFrame:
+    # Scope A has no dollars and sorts before the others
+    return pd.DataFrame({
+        'ScopeOfWork': ['A', 'A', 'B', 'C', 'C'],
+        'SubcontractorName': ['F1', 'F2', 'F3', 'F4', 'F5'],
+        'TotalSubAmount': [0.0, 0.0, 5.0, 3.0, 1.0],
+    })
+
+
+def test_zero_dollar_scope_does_not_leak(agg):
+    with_shares, hhi = concentration_tables(agg)
+    ranked = rank_within_markets(with_shares)
+    cumulative = ranked.set_index('SubcontractorName')['CumulativeShare']
+    assert cumulative['F3'] == pytest.approx(1.0)
+    assert cumulative['F4'] == pytest.approx(0.75)
+    assert cumulative['F5'] == pytest.approx(1.0)
+    assert (cumulative[['F1', 'F2']] == 0).all()
+
+    sweep = dominance_sweep(ranked, thresholds=[0.5], ratios=[1, 2]).set_index('ScopeOfWork')
+    assert sweep.loc['B', 'CR1'] == pytest.approx(1.0)
+    assert sweep.loc['C', 'CR1'] == pytest.approx(0.75)
+    assert sweep.loc['C', 'CR2'] == pytest.approx(1.0)
+    assert sweep.loc['C', 'DominantShare_50'] == pytest.approx(0.75)
+    assert sweep.loc['A', 'Dominant_50'] == 0 and sweep.loc['A', 'CR2'] == 0
+    assert not sweep.drop(index='A').isna().any().any()
+
+
+def test_matches_per_market_groupby():
+    rng = np.random.default_rng(3)
+    agg = pd.DataFrame({
+        'ScopeOfWork': rng.choice(list('PQRST'), 60),
+        'SubcontractorName': [f"F{i}" for i in range(60)],
+        'TotalSubAmount': rng.integers(0, 5, 60).astype(float),
+    })
+    agg.loc[agg['ScopeOfWork'] == 'Q', 'TotalSubAmount'] = 0.0
+    ranked = rank_within_markets(concentration_tables(agg)[0])
+    expected = ranked.groupby('ScopeOfWork', sort=False)['ShareOfScope'].transform(
+        lambda shares: shares.fillna(0).cumsum())
+    np.testing.assert_allclose(ranked['CumulativeShare'], expected, rtol=1e-12, atol=1e-15)
@@ -0,0 +1,76 @@
+"""
+Scenario Engine Tests
+The closed-form scenario metrics must match moving the dollars firm by firm and
+recomputing the scope's HHI, LBE share and top firm share.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_concentration import concentration_tables
+from scenarios import ScenarioEngine, scenario_grid
+
+
+@pytest.fixture(scope='module')
+def agg() -> pd.DataFrame:
+    return pd.DataFrame({
+        'ScopeOfWork': ['Mixed'] * 4 + ['Sole LBE'] * 3 + ['No LBE'] * 2 + ['LBE Only'] * 2 + ['No Dollars'] * 2,
+        'SubcontractorName': ['A', 'B', 'L1', 'L2', 'C', 'L3', 'D', 'E', 'F', 'L4', 'L5', 'G', 'L6'],
+        'TotalSubAmount': [500.0, 200.0, 150.0, 50.0, 300.0, 100.0, 300.0, 80.0, 20.0, 60.0, 40.0, 0.0, 0.0],
+    })
+
+
+@pytest.fixture(scope='module')
+def firm_lbe(agg) -> pd.Series:
+    return pd.Series(agg['SubcontractorName'].str.startswith('L').to_numpy(), index=agg['SubcontractorName'])
+
+
+def brute_force(agg: pd.DataFrame, firm_lbe: pd.Series, scenario) -> dict:
+    """Edit the scope's firm dollars and recompute its metrics"""
+    scope = agg[agg['ScopeOfWork'] == scenario.ScopeOfWork]
+    firms = scope['SubcontractorName'].tolist()
+    amounts = scope['TotalSubAmount'].to_numpy().copy()
+    is_lbe = scope['SubcontractorName'].map(firm_lbe).to_numpy(dtype=bool)
+    source = firms.index(scenario.SourceFirm) if isinstance(scenario.SourceFirm, str) else int(amounts.argmax())
+
+    moved = scenario.Fraction * amounts[source]
+    receivers = is_lbe.copy()
+    receivers[source] = False
+    amounts[source] -= moved
+    if scenario.Destination == 'lbe' and amounts[receivers].sum() > 0:
+        amounts[receivers] += moved * amounts[receivers] / amounts[receivers].sum()
+    else:
+        amounts, is_lbe = np.append(amounts, moved), np.append(is_lbe, True)
+
+    _, hhi = concentration_tables(pd.DataFrame({'ScopeOfWork': scenario.ScopeOfWork, 'TotalSubAmount': amounts}))
+    total = amounts.sum()
+    return {
+        'SourceFirm': firms[source],
+        'ScenarioHHI': hhi['ScopeHHI'].iloc[0],
+        'ScenarioLBEShare': amounts[is_lbe].sum() / total if total > 0 else np.nan,
+        'ScenarioTopFirmShare': amounts.max() / total if total > 0 else np.nan,
+    }
+
+
+def test_matches_brute_force(agg, firm_lbe):
+    scenarios = scenario_grid(agg['ScopeOfWork'].unique(), [0.0, 0.3, 1.0], ['lbe', 'new_lbe'])
+    named = pd.DataFrame({'ScopeOfWork': ['Mixed', 'Mixed', 'Sole LBE', 'LBE Only'], 'Fraction': [0.5, 0.8, 0.4, 1.0],
+                          'Destination': ['lbe', 'lbe', 'lbe', 'lbe'], 'SourceFirm': ['L1', 'B', 'L3', 'L5']})
+    scenarios = pd.concat([scenarios, named], ignore_index=True)
+
+    results = ScenarioEngine(agg, firm_lbe).evaluate(scenarios)
+    expected = pd.DataFrame([brute_force(agg, firm_lbe, scenario) for scenario in scenarios.itertuples()])
+    assert results['SourceFirm'].tolist() == expected['SourceFirm'].tolist()
+    for col in ['ScenarioHHI', 'ScenarioLBEShare', 'ScenarioTopFirmShare']:
+        np.testing.assert_allclose(results[col], expected[col], rtol=1e-9, atol=1e-9, err_msg=col)
+
+
+def test_rejects_bad_scenarios(agg, firm_lbe):
+    engine = ScenarioEngine(agg, firm_lbe)
+    with pytest.raises(ValueError):
+        engine.evaluate(pd.DataFrame({'ScopeOfWork': ['Unknown'], 'Fraction': [0.5]}))
+    with pytest.raises(ValueError):
+        engine.evaluate(pd.DataFrame({'ScopeOfWork': ['Mixed'], 'Fraction': [1.5]}))
+    with pytest.raises(ValueError):
+        engine.evaluate(pd.DataFrame({'ScopeOfWork': ['Mixed'], 'Fraction': [0.5], 'SourceFirm': ['C']}))
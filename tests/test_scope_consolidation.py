@@ -0,0 +1,87 @@
+"""
+Scope Consolidation Tests
+ScopeMatcher must label every scope exactly as the row-wise classify_scope does,
+whether a string is classified fresh or served from the memo.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scope_consolidation import UNKNOWN_SCOPE, ScopeMatcher, classify_scope, load_rules
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return load_rules()[0]
+
+
+def scope_strings(rules) -> list:
+    """Every keyword alone, padded, upper-cased and next to every exclude term, plus unmatched values"""
+    keywords = [kw for rule in rules.values() for kw in rule['keywords']]
+    excludes = [ex for rule in rules.values() for ex in rule['exclude']]
+    scopes = keywords + [f"  {kw.upper()} " for kw in keywords]
+    scopes += [f"{kw} {ex}" for kw in keywords for ex in excludes]
+    return scopes + ['Survey', 'Misc. Work ', '', '   ', 'Dewatering', np.nan, None, 42, 'AC PAVING & CONCRETE']
+
+
+def classify_rowwise(scopes: pd.Series, rules) -> pd.Series:
+    return scopes.apply(classify_scope, rules=rules).astype(object)
+
+
+def test_matches_classify_scope(rules):
+    scopes = pd.Series(scope_strings(rules), dtype=object)
+    actual = ScopeMatcher(rules).classify(scopes)
+    pd.testing.assert_series_equal(actual, classify_rowwise(scopes, rules), check_dtype=False)
+
+
+def test_memoized_labels_match_classify_scope(rules):
+    scopes = pd.Series(scope_strings(rules), dtype=object)
+    matcher = ScopeMatcher(rules)
+    matcher.classify(scopes.iloc[::2])
+    # Half the strings come from the memo, in another order and with repeats
+    shuffled = scopes.sample(frac=3, replace=True, random_state=0).reset_index(drop=True)
+    pd.testing.assert_series_equal(matcher.classify(shuffled), classify_rowwise(shuffled, rules),
+                                   check_dtype=False)
+
+
+def test_categorical_input_and_missing_values(rules):
+    scopes = pd.Series(['AC Paving', None, 'Traffic Control', 'AC Paving'], dtype='category')
+    labels = ScopeMatcher(rules).classify(scopes)
+    assert labels.tolist() == classify_rowwise(scopes.astype(object), rules).tolist()
+    assert labels.iloc[1] == UNKNOWN_SCOPE
+
+
+def edited_rules(rules, edit: str):
+    """A copy of the rules with one kind of change applied"""
+    rules = {category: dict(rule) for category, rule in rules.items()}
+    categories = list(rules)
+    if edit == 'keyword':
+        rules[categories[0]]['keywords'] = rules[categories[0]]['keywords'] + ['concrete']
+    elif edit == 'exclude':
+        rules[categories[2]]['exclude'] = rules[categories[2]]['exclude'][:-1]
+    elif edit == 'added_first':
+        rules = {'SURVEY_WORK': {'keywords': ['survey'], 'exclude': [], 'consolidated_name': 'Survey (Consolidated)'},
+                 **rules}
+    elif edit == 'removed':
+        del rules[categories[1]]
+    elif edit == 'reordered':
+        rules = {category: rules[category] for category in categories[::-1]}
+    return rules
+
+
+@pytest.mark.parametrize('edit', ['keyword', 'exclude', 'added_first', 'removed', 'reordered'])
+def test_inherit_matches_fresh_matcher(rules, edit):
+    scopes = pd.Series(scope_strings(rules), dtype=object)
+    previous = ScopeMatcher(rules)
+    before = previous.classify(scopes)
+
+    new_rules = edited_rules(rules, edit)
+    matcher = ScopeMatcher(new_rules)
+    relabelled = matcher.inherit(previous)
+    after = matcher.classify(scopes)
+
+    pd.testing.assert_series_equal(after, classify_rowwise(scopes, new_rules), check_dtype=False)
+    changed = scopes[(before != after).to_numpy()].dropna().astype(str)
+    assert sorted(relabelled) == sorted(set(changed))
+    assert relabelled
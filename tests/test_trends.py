@@ -0,0 +1,59 @@
+"""
+Rolling Trend Tests
+Windows updated incrementally (adding and removing one period at a time) must
+match each window's metrics computed from scratch.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from trends import rolling_concentration
+
+
+@pytest.fixture(scope='module')
+def records() -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    n = 600
+    records = pd.DataFrame({
+        'ScopeOfWork': rng.choice([f"Scope {i}" for i in range(8)], n),
+        'SubcontractorName': rng.choice([f"Firm {i}" for i in range(20)], n),
+        'SubAmount': rng.gamma(2.0, 500.0, n).round(2),
+        'is_lbe': rng.random(n) < 0.3,
+        # Period 5 has no records; some records have no period
+        'Period': rng.choice([0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11, np.nan], n),
+    })
+    # A market active only in the first period drops out of later windows
+    records.loc[records['Period'] == 0, 'ScopeOfWork'] = 'Early Scope'
+    return records
+
+
+def from_scratch(records: pd.DataFrame, start: int, end: int, threshold: float) -> pd.DataFrame:
+    """One window's metrics from its own records"""
+    window = records[records['Period'].between(start, end)]
+    window = window.assign(LBEAmount=window['SubAmount'].where(window['is_lbe'], 0.0))
+    firms = window.groupby(['ScopeOfWork', 'SubcontractorName'])[['SubAmount', 'LBEAmount']].sum().reset_index()
+    firms['Share'] = firms['SubAmount'] / firms.groupby('ScopeOfWork')['SubAmount'].transform('sum')
+    markets = firms.groupby('ScopeOfWork').agg(
+        TotalSubAmount=('SubAmount', 'sum'),
+        NumSubcontractors=('SubcontractorName', 'size'),
+        ScopeHHI=('Share', lambda shares: (shares ** 2).sum() * 10000),
+        TopFirmShare=('Share', 'max'),
+        DominantFirms=('Share', lambda shares: (shares >= threshold).sum()),
+        LBEAmount=('LBEAmount', 'sum'),
+    ).reset_index()
+    markets['LBE_Dollar_Share'] = markets.pop('LBEAmount') / markets['TotalSubAmount']
+    return markets.assign(WindowStart=str(start), WindowEnd=str(end))
+
+
+@pytest.mark.parametrize('window, step', [(1, 1), (3, 1), (4, 3), (20, 1)])
+def test_matches_windows_from_scratch(records, window, step):
+    trends = rolling_concentration(records, records['Period'], window, step, dominance_threshold=0.25)
+
+    last = int(records['Period'].max())
+    ends = list(range(window - 1, last + 1, step)) or [last]
+    expected = pd.concat([from_scratch(records, end - window + 1, end, 0.25) for end in ends], ignore_index=True)
+    columns = ['WindowStart', 'WindowEnd', 'ScopeOfWork', 'TotalSubAmount', 'NumSubcontractors', 'ScopeHHI',
+               'TopFirmShare', 'DominantFirms', 'LBE_Dollar_Share']
+    pd.testing.assert_frame_equal(trends[columns].astype({'ScopeOfWork': object}), expected[columns],
+                                  check_dtype=False, check_exact=False, rtol=1e-9)
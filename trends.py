@@ -0,0 +1,209 @@
+"""
+Concentration Trends
+HHI, top-firm share, dominant firms and LBE dollar share per consolidated scope
+over rolling time windows, as one tidy table (one row per window and scope) for
+the dashboard to plot.
+
+The window slides by adding the per-(scope, subcontractor) sums of the period
+entering it and subtracting those of the period leaving it. Scope totals, LBE
+dollars and the sum of squared firm dollars behind the HHI are updated from
+those deltas; only scopes touched by a step have their top firm re-derived.
+
+Periods are bid years by default. Given a date column, they are calendar months
+and a window of 12 with step 1 is a trailing year stepped monthly.
+"""
+
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_concentration import Keys, _as_list, classify_concentration_series, group_codes
+
+
+# Per-pair dollars closer to zero than this after a removal are float residue
+_ZERO_DOLLARS = 1e-6
+
+
+def record_periods(bids: pd.DataFrame, records: pd.DataFrame,
+                   date_column: Optional[str] = None) -> Tuple[pd.Series, Callable[[int], str]]:
+    """
+    Integer period of each subcontract record, taken from its contract.
+
+    Args:
+        bids: Cleaned bid rows (output of bid_data.load_bid_data)
+        records: Subcontract records with a ContractID column
+        date_column: Date column of the bid rows; months are used when given,
+            otherwise the 'Year' column
+
+    Returns:
+        Tuple of (period per record, nullable integer; function labelling a period)
+    """
+    if date_column:
+        dates = pd.to_datetime(bids[date_column], errors='coerce')
+        values = dates.dt.year * 12 + dates.dt.month - 1
+
+        def label(period: int) -> str:
+            return f"{period // 12}-{period % 12 + 1:02d}"
+    else:
+        values = bids['Year']
+
+        def label(period: int) -> str:
+            return str(period)
+
+    # A contract's rows share one bid date
+    contract_period = values.groupby(bids['Contract'], observed=True).first()
+    periods = records['ContractID'].astype(object).map(contract_period).astype('Int64')
+    return periods, label
+
+
+def rolling_concentration(records: pd.DataFrame, periods: pd.Series, window: int, step: int = 1,
+                          keys: Keys = 'ScopeOfWork', firm_col: str = 'SubcontractorName',
+                          amount_col: str = 'SubAmount', lbe_col: str = 'is_lbe',
+                          dominance_threshold: float = 0.25,
+                          label: Callable[[int], str] = str) -> pd.DataFrame:
+    """
+    Concentration metrics per market over sliding windows of periods.
+
+    Windows cover `window` consecutive periods and end at the first full window,
+    then every `step` periods up to the last period (one window ending at the
+    last period when the data spans fewer than `window` periods).
+
+    Args:
+        records: One row per subcontract (e.g. consolidated subcontractor records)
+        periods: Integer period of each record (records without one are left out)
+        window: Periods per window
+        step: Periods between consecutive window ends
+        keys: Column(s) defining a market
+        firm_col: Firm column
+        amount_col: Dollar column
+        lbe_col: Boolean LBE flag column
+        dominance_threshold: Minimum share for a dominant firm (as dominant_subcontractors)
+        label: Formats a period for the WindowStart / WindowEnd columns
+
+    Returns:
+        DataFrame with WindowStart, WindowEnd, the market keys, TotalSubAmount,
+        NumSubcontractors, ScopeHHI, ConcentrationLevel, TopFirmShare,
+        DominantFirms and LBE_Dollar_Share, one row per window and market with
+        dollars in that window
+    """
+    key_list = _as_list(keys)
+    # Like aggregate_scope_subcontractors, rows missing a key or firm are left out
+    kept = (periods.notna() & records[key_list + [firm_col]].notna().all(axis=1)).to_numpy()
+    records = records[kept]
+    record_period = periods[kept].to_numpy(dtype='int64')
+
+    pair_codes, pairs = group_codes(records, key_list + [firm_col])
+    # Pairs are sorted by market, so each market's pairs are one contiguous run
+    scope_of_pair, markets = group_codes(pairs, key_list)
+    n_pairs, n_markets = len(pairs), len(markets)
+    market_starts = np.searchsorted(scope_of_pair, np.arange(n_markets + 1))
+
+    # Per (period, pair) dollar and LBE-dollar sums, ordered by period
+    amounts = records[amount_col].to_numpy(dtype='float64')
+    cells = pd.DataFrame({
+        'period': record_period,
+        'pair': pair_codes,
+        'amount': amounts,
+        'lbe_amount': np.where(records[lbe_col].to_numpy(dtype=bool), amounts, 0.0),
+    }).groupby(['period', 'pair'], sort=True).sum().reset_index()
+    cell_period = cells['period'].to_numpy()
+    cell_pair = cells['pair'].to_numpy()
+    cell_amount = cells['amount'].to_numpy()
+    cell_lbe = cells['lbe_amount'].to_numpy()
+
+    def period_slice(period: int) -> slice:
+        return slice(np.searchsorted(cell_period, period, 'left'), np.searchsorted(cell_period, period, 'right'))
+
+    pair_amount = np.zeros(n_pairs)
+    total = np.zeros(n_markets)
+    sum_squares = np.zeros(n_markets)
+    lbe_dollars = np.zeros(n_markets)
+    n_firms = np.zeros(n_markets, dtype=np.int64)
+    top_firm = np.zeros(n_markets)
+    dominant = np.zeros(n_markets, dtype=np.int64)
+
+    def apply(period: int, sign: float) -> np.ndarray:
+        """Add (sign=1) or remove (sign=-1) one period; returns the markets it touched"""
+        rows = period_slice(period)
+        pair = cell_pair[rows]
+        market = scope_of_pair[pair]
+        old = pair_amount[pair]
+        new = old + sign * cell_amount[rows]
+        new[np.abs(new) < _ZERO_DOLLARS] = 0.0
+        pair_amount[pair] = new
+        np.add.at(total, market, new - old)
+        np.add.at(sum_squares, market, new ** 2 - old ** 2)
+        np.add.at(lbe_dollars, market, sign * cell_lbe[rows])
+        np.add.at(n_firms, market, (new > 0).astype(np.int64) - (old > 0))
+        return np.unique(market)
+
+    def refresh_top(touched: np.ndarray):
+        """Re-derive the top firm and dominant firm count of the touched markets"""
+        empty = n_firms[touched] == 0
+        total[touched[empty]] = sum_squares[touched[empty]] = lbe_dollars[touched[empty]] = 0.0
+        lengths = market_starts[touched + 1] - market_starts[touched]
+        offsets = np.repeat(market_starts[touched] - np.cumsum(lengths) + lengths, lengths)
+        pair = np.arange(lengths.sum()) + offsets
+        market = scope_of_pair[pair]
+        top_firm[touched] = 0.0
+        dominant[touched] = 0
+        np.maximum.at(top_firm, market, pair_amount[pair])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            is_dominant = (pair_amount[pair] > 0) & (pair_amount[pair] / total[market] >= dominance_threshold)
+        np.add.at(dominant, market, is_dominant.astype(np.int64))
+
+    first, last = int(cell_period.min()), int(cell_period.max())
+    ends = list(range(first + window - 1, last + 1, step)) or [last]
+    columns = {name: [] for name in ['market', 'start', 'end', 'TotalSubAmount', 'NumSubcontractors', 'ScopeHHI',
+                                     'TopFirmShare', 'DominantFirms', 'LBE_Dollar_Share']}
+    current: set = set()
+    for end in ends:
+        wanted = set(range(end - window + 1, end + 1))
+        touched = [apply(period, -1.0) for period in sorted(current - wanted)]
+        touched += [apply(period, 1.0) for period in sorted(wanted - current)]
+        current = wanted
+        if touched:
+            refresh_top(np.unique(np.concatenate(touched)))
+
+        active = np.flatnonzero(n_firms > 0)
+        columns['market'].append(active)
+        columns['start'].append(np.full(len(active), end - window + 1))
+        columns['end'].append(np.full(len(active), end))
+        columns['TotalSubAmount'].append(total[active])
+        columns['NumSubcontractors'].append(n_firms[active])
+        columns['ScopeHHI'].append(sum_squares[active] / total[active] ** 2 * 10000)
+        columns['TopFirmShare'].append(top_firm[active] / total[active])
+        columns['DominantFirms'].append(dominant[active])
+        columns['LBE_Dollar_Share'].append(lbe_dollars[active] / total[active])
+
+    columns = {name: np.concatenate(values) for name, values in columns.items()}
+    labels = {period: label(period) for period in np.unique(np.concatenate([columns['start'], columns['end']]))}
+    trends = markets.iloc[columns.pop('market')].reset_index(drop=True)
+    trends.insert(0, 'WindowEnd', [labels[period] for period in columns.pop('end')])
+    trends.insert(0, 'WindowStart', [labels[period] for period in columns.pop('start')])
+    for name, values in columns.items():
+        trends[name] = values
+    trends.insert(trends.columns.get_loc('ScopeHHI') + 1, 'ConcentrationLevel',
+                  classify_concentration_series(trends['ScopeHHI']))
+    return trends
+
+
+def concentration_trends(bids: pd.DataFrame, consolidated: pd.DataFrame, window: int = 1, step: int = 1,
+                         date_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    Rolling concentration per consolidated scope.
+
+    Args:
+        bids: Cleaned bid rows (supplies each contract's period)
+        consolidated: Consolidated subcontractor records
+        window: Periods (years, or months with date_column) per window
+        step: Periods between window ends
+        date_column: Bid date column for monthly periods
+
+    Returns:
+        Output of rolling_concentration
+    """
+    periods, label = record_periods(bids, consolidated, date_column)
+    return rolling_concentration(consolidated, periods, window, step, label=label)
+